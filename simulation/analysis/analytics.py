@@ -0,0 +1,182 @@
+"""
+Analytics of trip records (see analysis.trips) with NumPy.
+
+Percentiles use linear interpolation, as np.percentile. Breakdowns sort the trips once by (group, value)
+and read the percentiles of every group from the sorted array, so the cost stays O(n log n) in the number
+of trips whatever the number of groups.
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from simulation.analysis.schema import DistributionSummary, GroupSummary, TimeBucket, TripAnalytics
+
+PERCENTILES = (50, 90, 95, 99)
+SERVICE_LEVEL_STEPS = (30, 60, 120)
+TIME_BUCKET_STEPS = 1000
+
+
+def trip_times(trips: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: waiting, travel and journey time (in steps) of every trip
+    """
+    appear = trips["appear_step"].astype(np.int64)
+    board = trips["board_step"].astype(np.int64)
+    alight = trips["alight_step"].astype(np.int64)
+    return board - appear, alight - board, alight - appear
+
+
+def mean_time_per_floor(journey_time: np.ndarray, origin: np.ndarray, destination: np.ndarray) -> float:
+    """
+    Mean journey time per floor travelled. Trips with the same origin and destination travel no floors
+    and are left out (NaN if no trip travelled).
+    """
+    distance = np.abs(origin.astype(np.int64) - destination)
+    travelled = distance > 0
+    if not travelled.any():
+        return float("nan")
+    return float((journey_time[travelled] / distance[travelled]).mean())
+
+
+def distribution(values: np.ndarray) -> DistributionSummary:
+    if not len(values):
+        nan = float("nan")
+        return DistributionSummary(mean=nan, p50=nan, p90=nan, p95=nan, p99=nan, max=nan)
+    p50, p90, p95, p99 = np.percentile(values, PERCENTILES).tolist()
+    return DistributionSummary(mean=float(values.mean()), p50=p50, p90=p90, p95=p95, p99=p99,
+                               max=float(values.max()))
+
+
+def _sort_by_group(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: keys and values sorted by (key, value)
+    """
+    keys = keys.astype(np.int64)
+    if np.issubdtype(values.dtype, np.integer) and len(values):
+        # integer times: one sort of key * span + value instead of a (much slower) lexsort
+        k_min, v_min = int(keys.min()), int(values.min())
+        span = int(values.max()) - v_min + 1
+        if (int(keys.max()) - k_min + 1) * span < 2 ** 62:
+            composite = (keys - k_min) * span + (values.astype(np.int64) - v_min)
+            composite.sort()
+            sorted_keys = composite // span
+            return sorted_keys + k_min, composite - sorted_keys * span + v_min
+    order = np.lexsort((values, keys))
+    return keys[order], values[order]
+
+
+def grouped_distribution(keys: np.ndarray, values: np.ndarray, percentiles: Sequence[float]):
+    """
+    Percentiles and means of values within every group of equal keys.
+    :return: (group keys, group sizes, (n_groups, len(percentiles)) percentiles, group means)
+    """
+    sorted_keys, sorted_values = _sort_by_group(keys, values)
+    sorted_values = sorted_values.astype(np.float64)
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, len(sorted_keys)])
+    groups = sorted_keys[starts]
+
+    positions = starts[:, None] + (counts[:, None] - 1) * (np.asarray(percentiles, dtype=np.float64) / 100)
+    low = np.floor(positions).astype(np.int64)
+    high = np.minimum(low + 1, (starts + counts - 1)[:, None])
+    fraction = positions - low
+    result = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * fraction
+    means = np.add.reduceat(sorted_values, starts) / counts
+    return groups, counts, result, means
+
+
+def breakdown(keys: np.ndarray, waiting_time: np.ndarray, journey_time: np.ndarray):
+    """
+    :return: GroupSummary of every key
+    """
+    if not len(keys):
+        return []
+    # percentiles with the maximum as the 100th one
+    levels = (*PERCENTILES, 100)
+    groups, counts, waiting, waiting_mean = grouped_distribution(keys, waiting_time, levels)
+    _, _, journey, journey_mean = grouped_distribution(keys, journey_time, levels)
+
+    names = ("p50", "p90", "p95", "p99", "max")
+    return [GroupSummary(key=key,
+                         n_passengers=count,
+                         waiting_time=DistributionSummary(mean=w_mean, **dict(zip(names, w))),
+                         journey_time=DistributionSummary(mean=j_mean, **dict(zip(names, j))))
+            for key, count, w, w_mean, j, j_mean in zip(groups.tolist(), counts.tolist(), waiting.tolist(),
+                                                        waiting_mean.tolist(), journey.tolist(),
+                                                        journey_mean.tolist())]
+
+
+def time_series(appear_step: np.ndarray, waiting_time: np.ndarray, journey_time: np.ndarray, bucket_steps: int):
+    """
+    :return: TimeBucket of every bucket of bucket_steps steps with at least one passenger appearing in it
+    """
+    if not len(appear_step):
+        return []
+    buckets = appear_step.astype(np.int64) // bucket_steps
+    groups, counts, waiting_p95, waiting_mean = grouped_distribution(buckets, waiting_time, (95,))
+    # means need no sorting
+    journey_mean = np.bincount(buckets - groups[0], weights=journey_time)[groups - groups[0]] / counts
+    return [TimeBucket(start_step=bucket * bucket_steps,
+                       n_passengers=count,
+                       mean_waiting_time=w_mean,
+                       p95_waiting_time=w_p95,
+                       mean_journey_time=j_mean)
+            for bucket, count, w_mean, w_p95, j_mean in zip(groups.tolist(), counts.tolist(), waiting_mean.tolist(),
+                                                            waiting_p95[:, 0].tolist(), journey_mean.tolist())]
+
+
+def analyse_trips(trips: Dict[str, np.ndarray], service_level_steps: Sequence[int] = SERVICE_LEVEL_STEPS,
+                  bucket_steps: int = TIME_BUCKET_STEPS) -> TripAnalytics:
+    """
+    :param trips: trip columns (analysis.trips.TRIP_COLUMNS), "id" is not needed
+    :param service_level_steps: waiting time limits of the service levels
+    :param bucket_steps: length of the buckets of the time series (by the step the passenger appeared)
+    :return: TripAnalytics
+    """
+    waiting_time, travel_time, journey_time = trip_times(trips)
+    n_passengers = len(waiting_time)
+
+    service_level = {}
+    if n_passengers:
+        # share of passengers who waited less than every limit: one sort, one binary search per limit
+        sorted_waiting = np.sort(waiting_time)
+        limits = np.asarray(service_level_steps)
+        shares = np.searchsorted(sorted_waiting, limits, side="left") / n_passengers
+        service_level = {int(limit): float(share) for limit, share in zip(limits.tolist(), shares.tolist())}
+
+    return TripAnalytics(
+        n_passengers=n_passengers,
+        waiting_time=distribution(waiting_time),
+        travel_time=distribution(travel_time),
+        journey_time=distribution(journey_time),
+        mean_j_time_dist=mean_time_per_floor(journey_time, trips["origin"], trips["destination"]),
+        service_level=service_level,
+        per_floor=breakdown(trips["origin"], waiting_time, journey_time),
+        per_car=breakdown(trips["car"], waiting_time, journey_time),
+        bucket_steps=bucket_steps,
+        time_series=time_series(trips["appear_step"], waiting_time, journey_time, bucket_steps),
+    )
+
+
+def analytics_report(analytics: TripAnalytics) -> str:
+    """Plain text tables of the analytics (e.g. for the advanced analysis dialog of the results page)."""
+    def row(name, d: DistributionSummary):
+        return f"{name:<14}{d.mean:>9.2f}{d.p50:>9.1f}{d.p90:>9.1f}{d.p95:>9.1f}{d.p99:>9.1f}{d.max:>9.1f}"
+
+    header = f"{'':<14}{'mean':>9}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    lines = [f"Passengers: {analytics.n_passengers}", "", header,
+             row("waiting", analytics.waiting_time),
+             row("travel", analytics.travel_time),
+             row("journey", analytics.journey_time),
+             "", f"Journey time per floor: {analytics.mean_j_time_dist:.3f}", "", "Service level:"]
+    lines += [f"  waiting < {limit} steps: {share:.1%}" for limit, share in analytics.service_level.items()]
+
+    for title, groups in (("Floor of origin", analytics.per_floor), ("Car", analytics.per_car)):
+        lines += ["", f"{title:<10}{'passengers':>12}{'wait mean':>11}{'wait p95':>10}{'journey mean':>14}"]
+        lines += [f"{g.key:<10}{g.n_passengers:>12}{g.waiting_time.mean:>11.2f}{g.waiting_time.p95:>10.1f}"
+                  f"{g.journey_time.mean:>14.2f}" for g in groups]
+
+    lines += ["", f"{'From step':<10}{'passengers':>12}{'wait mean':>11}{'wait p95':>10}{'journey mean':>14}"]
+    lines += [f"{b.start_step:<10}{b.n_passengers:>12}{b.mean_waiting_time:>11.2f}{b.p95_waiting_time:>10.1f}"
+              f"{b.mean_journey_time:>14.2f}" for b in analytics.time_series]
+    return "\n".join(lines)
@@ -0,0 +1,178 @@
+"""
+Run catalog: SQLite index of the runs in database/logs.
+
+Every run (its trips file, or the pickled system of older logs) has one row with its config summary, key
+metrics, size and mtime of the file and the full ResultsInfoForGui as JSON. Runs are recorded when they
+finish (SimulationLogger.save_run), so the results page lists, filters and sorts them with one query,
+and the summary of a run is computed once per version of its file (size and mtime) instead of on every click.
+"""
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List
+
+from simulation.analysis import result_analyse
+from simulation.analysis.schema import CatalogEntry, ResultsInfoForGui
+from simulation.analysis.trips import TRIPS_SUFFIX
+
+CATALOG_FILENAME = "catalog.sqlite"
+LEGACY_SUFFIX = ".pkl"  # pickled {"system", "config"} of logs written before trip files
+
+ENTRY_COLUMNS = list(CatalogEntry.model_fields)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    algorithm TEXT NOT NULL,
+    generator TEXT NOT NULL,
+    seed INTEGER,
+    steps INTEGER NOT NULL,
+    floors INTEGER NOT NULL,
+    elevators INTEGER NOT NULL,
+    n_passengers INTEGER NOT NULL,
+    mean_waiting_time REAL NOT NULL,
+    mean_journey_time REAL NOT NULL,
+    mean_travel_time REAL NOT NULL,
+    mean_j_time_dist REAL,
+    p95_waiting_time REAL,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_mtime ON runs (mtime);
+CREATE INDEX IF NOT EXISTS runs_algorithm ON runs (algorithm, generator);
+"""
+
+
+def is_run_file(filename: str) -> bool:
+    """True for the file a run is listed by: its trips file or the pickled system of older logs."""
+    return filename.endswith(TRIPS_SUFFIX) or filename.endswith(LEGACY_SUFFIX)
+
+
+class RunCatalog:
+    def __init__(self, log_dir=None):
+        """
+        :param log_dir: directory of the logs (default: database/logs), the catalog is kept in it
+        """
+        self.log_dir = Path(log_dir if log_dir is not None else result_analyse.LOG_DIR)
+        self.path = self.log_dir / CATALOG_FILENAME
+        self._summaries: Dict[str, tuple] = {}  # filename -> (size, mtime_ns, ResultsInfoForGui)
+        os.makedirs(self.log_dir, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # several simulations (e.g. a sweep) may finish at once, writers wait for each other
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __len__(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def record(self, filename: str, stat: os.stat_result | None = None) -> ResultsInfoForGui:
+        """
+        Analyses the run and stores (or replaces) its row.
+        :param filename: trips file (or a pickled older log) in the logs directory
+        :param stat: os.stat() of the file, if known
+        """
+        stat = stat if stat is not None else os.stat(self.log_dir / filename)
+        ri = result_analyse.analyse_from_file(filename, log_dir=self.log_dir)
+        p95 = ri.analytics.waiting_time.p95 if ri.analytics is not None else None
+        row = (filename, stat.st_size, stat.st_mtime_ns, stat.st_mtime,
+               ri.info.algorithm.value, ri.info.traffic.generator_type.value, ri.info.traffic.seed, ri.info.steps,
+               ri.info.floors, len(ri.info.elevators), ri.results.n_passengers, ri.results.mean_waiting_time,
+               ri.results.mean_journey_time, ri.results.mean_travel_time, ri.results.mean_j_time_dist, p95,
+               ri.model_dump_json())
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"INSERT OR REPLACE INTO runs VALUES ({', '.join('?' * len(row))})", row)
+        self._summaries[filename] = (stat.st_size, stat.st_mtime_ns, ri)
+        return ri
+
+    def summary(self, filename: str) -> ResultsInfoForGui:
+        """
+        Results of the run, memoized: analysed again only if its file changed (size or mtime) since it was
+        recorded.
+        """
+        stat = os.stat(self.log_dir / filename)
+        cached = self._summaries.get(filename)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT size, mtime_ns, summary FROM runs WHERE filename = ?",
+                               (filename,)).fetchone()
+        if row is None or tuple(row[:2]) != (stat.st_size, stat.st_mtime_ns):
+            return self.record(filename, stat)
+
+        ri = ResultsInfoForGui.model_validate_json(row[2])
+        self._summaries[filename] = (stat.st_size, stat.st_mtime_ns, ri)
+        return ri
+
+    def runs(self, search: str = "", order_by: str = "mtime", descending: bool = True,
+             **equal) -> List[CatalogEntry]:
+        """
+        :param search: text the file name, algorithm or generator of the run contains (case-insensitive)
+        :param order_by: column of CatalogEntry to sort by
+        :param descending: sort order
+        :param equal: column of CatalogEntry -> required value, e.g. algorithm="collective"
+        """
+        if order_by not in ENTRY_COLUMNS:
+            raise ValueError(f"Unknown column to sort runs by: {order_by}")
+        conditions, params = [], []
+        if search:
+            conditions.append("(filename LIKE ? OR algorithm LIKE ? OR generator LIKE ?)")
+            params += [f"%{search}%"] * 3
+        for column, value in equal.items():
+            if column not in ENTRY_COLUMNS:
+                raise ValueError(f"Unknown column to filter runs by: {column}")
+            conditions.append(f"{column} = ?")
+            params.append(value)
+
+        query = f"SELECT {', '.join(ENTRY_COLUMNS)} FROM runs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}, filename"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [CatalogEntry(**dict(zip(ENTRY_COLUMNS, row))) for row in rows]
+
+    def rename(self, old_filename: str, new_filename: str):
+        """Moves the row of a renamed run (renaming keeps the mtime, so the summary stays valid)."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE runs SET filename = ? WHERE filename = ?", (new_filename, old_filename))
+        if old_filename in self._summaries:
+            self._summaries[new_filename] = self._summaries.pop(old_filename)
+
+    def sync(self) -> int:
+        """
+        Brings the catalog up to date with the logs directory: records new and changed runs and drops the
+        rows of deleted ones. Needed only for runs the catalog missed (older logs, files copied in).
+        :return: number of recorded runs
+        """
+        with closing(self._connect()) as conn:
+            known = {filename: (size, mtime_ns)
+                     for filename, size, mtime_ns in conn.execute("SELECT filename, size, mtime_ns FROM runs")}
+
+        recorded = 0
+        present = set()
+        with os.scandir(self.log_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_run_file(entry.name):
+                    continue
+                present.add(entry.name)
+                stat = entry.stat()
+                if known.get(entry.name) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                try:
+                    self.record(entry.name, stat)
+                    recorded += 1
+                except Exception as e:
+                    print(f"[CATALOG] Skipping {entry.name}: {e}")
+
+        removed = [(filename,) for filename in known if filename not in present]
+        if removed:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("DELETE FROM runs WHERE filename = ?", removed)
+        return recorded
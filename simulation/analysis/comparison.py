@@ -0,0 +1,233 @@
+"""
+Comparison of stored runs (see analysis.catalog).
+
+load_runs() builds a table with one row per run: its algorithm, generator, building, scenario and the
+requested metrics. Metrics kept in the catalog need no run files at all. Any other metric is computed from
+the trips file, reading only the columns it needs, one run at a time, so memory holds a single run however
+many runs are compared.
+
+Metrics:
+    catalog: CATALOG_METRICS
+    trips:   {mean|max|p<q>}_{waiting_time|travel_time|journey_time}, e.g. p99_journey_time
+             service_level_<steps> - share of passengers who waited less than <steps> steps
+
+compare_groups() summarises the runs of every (algorithm, generator, building) group with means and
+confidence intervals, paired_deltas() compares policies with a baseline on identical scenarios.
+"""
+import hashlib
+import json
+import pickle
+import re
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from simulation.analysis.catalog import RunCatalog
+from simulation.analysis.trips import (read_trips, load_run_config, run_base, trip_table, TRIPS_SUFFIX,
+                                       CONFIG_SUFFIX)
+from simulation.enums import TrafficGeneratorEnum
+from simulation.schema import ConfigSchema
+
+GROUP_COLUMNS = ("algorithm", "generator", "building")
+CATALOG_METRICS = ("mean_waiting_time", "mean_journey_time", "mean_travel_time", "mean_j_time_dist",
+                   "n_passengers", "p95_waiting_time")
+DEFAULT_METRICS = ("mean_waiting_time", "mean_journey_time", "mean_travel_time")
+
+TIME_COLUMNS = {
+    "waiting_time": ("appear_step", "board_step"),
+    "travel_time": ("board_step", "alight_step"),
+    "journey_time": ("appear_step", "alight_step"),
+}
+TIME_METRIC = re.compile(r"^(mean|max|p(\d{1,2}))_(waiting_time|travel_time|journey_time)$")
+SERVICE_LEVEL_METRIC = re.compile(r"^service_level_(\d+)$")
+
+
+def metric_columns(metric: str) -> tuple:
+    """Trip columns a metric is computed from (nothing for catalog metrics)."""
+    if metric in CATALOG_METRICS:
+        return ()
+    match = TIME_METRIC.match(metric)
+    if match:
+        return TIME_COLUMNS[match.group(3)]
+    if SERVICE_LEVEL_METRIC.match(metric):
+        return TIME_COLUMNS["waiting_time"]
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def trip_metric(trips: Dict[str, np.ndarray], metric: str) -> float:
+    """
+    :param trips: trip columns, at least metric_columns(metric)
+    """
+    match = TIME_METRIC.match(metric)
+    if match:
+        start, end = TIME_COLUMNS[match.group(3)]
+        times = trips[end].astype(np.int64) - trips[start]
+        if not len(times):
+            return float("nan")
+        if match.group(1) == "mean":
+            return float(times.mean())
+        if match.group(1) == "max":
+            return float(times.max())
+        return float(np.percentile(times, int(match.group(2))))
+
+    limit = int(SERVICE_LEVEL_METRIC.match(metric).group(1))
+    waiting_time = trips["board_step"].astype(np.int64) - trips["appear_step"]
+    return float((waiting_time < limit).mean()) if len(waiting_time) else float("nan")
+
+
+def building_key(config: ConfigSchema) -> str:
+    """Building parameters of a run, e.g. '10 floors, 3 x (capacity 8, speed 1)'."""
+    cars = [(e.max_people, e.speed) for e in config.elevators]
+    if len(set(cars)) == 1:
+        max_people, speed = cars[0]
+        cars_text = f"{len(cars)} x (capacity {max_people}, speed {speed})"
+    else:
+        cars_text = ", ".join(f"(capacity {max_people}, speed {speed})" for max_people, speed in cars)
+    return f"{config.floors} floors, {cars_text}"
+
+
+def scenario_key(config: ConfigSchema) -> str | None:
+    """
+    Passenger stream of a run: runs with the same key (and building) served identical passengers.
+    Scenario files are identified by their name, generated traffic by its whole config including the seed.
+    None for unseeded generated traffic, which never repeats.
+    """
+    traffic = config.traffic
+    if traffic.generator_type == TrafficGeneratorEnum.FROM_FILE and traffic.from_file_params is not None:
+        return f"{traffic.from_file_params.filename}, {config.steps} steps"
+    if traffic.seed is None:
+        return None
+    digest = hashlib.sha1(json.dumps([traffic.model_dump(mode="json"), config.floors, config.steps],
+                                     sort_keys=True).encode()).hexdigest()[:8]
+    return f"{traffic.generator_type.value} seed {traffic.seed} ({digest})"
+
+
+def _run_config(catalog: RunCatalog, filename: str) -> ConfigSchema:
+    if filename.endswith(TRIPS_SUFFIX):
+        return load_run_config(catalog.log_dir / (run_base(filename) + CONFIG_SUFFIX))
+    return catalog.summary(filename).info
+
+
+def _run_trips(catalog: RunCatalog, filename: str, columns: List[str]) -> Dict[str, np.ndarray]:
+    if filename.endswith(TRIPS_SUFFIX):
+        return read_trips(catalog.log_dir / filename, columns=columns)
+    # older logs keep the whole pickled building
+    with open(catalog.log_dir / filename, "rb") as file:
+        return trip_table(pickle.load(file)["system"])
+
+
+def load_runs(filenames: Iterable[str] | None = None, metrics: Sequence[str] = DEFAULT_METRICS,
+              catalog: RunCatalog | None = None, search: str = "") -> pd.DataFrame:
+    """
+    :param filenames: runs to load (default: every run of the catalog matching search)
+    :param metrics: metric columns of the table
+    :param catalog: run catalog (default: the one of database/logs)
+    :param search: text filter of the catalog runs (RunCatalog.runs)
+    :return: one row per run: filename, algorithm, generator, building, scenario, steps, seed and the metrics
+    """
+    catalog = catalog if catalog is not None else RunCatalog()
+    columns = sorted({column for metric in metrics for column in metric_columns(metric)})
+    trips_metrics = [metric for metric in metrics if metric not in CATALOG_METRICS]
+
+    entries = catalog.runs(search=search, order_by="filename", descending=False)
+    if filenames is not None:
+        wanted = set(filenames)
+        entries = [entry for entry in entries if entry.filename in wanted]
+
+    rows = []
+    for entry in entries:
+        config = _run_config(catalog, entry.filename)
+        row = {
+            "filename": entry.filename,
+            "algorithm": entry.algorithm,
+            "generator": entry.generator,
+            "building": building_key(config),
+            "scenario": scenario_key(config),
+            "steps": entry.steps,
+            "seed": entry.seed,
+        }
+        for metric in metrics:
+            if metric in CATALOG_METRICS:
+                value = getattr(entry, metric)
+                row[metric] = float("nan") if value is None else value
+        if trips_metrics:
+            trips = _run_trips(catalog, entry.filename, columns)
+            for metric in trips_metrics:
+                row[metric] = trip_metric(trips, metric)
+            del trips
+        rows.append(row)
+
+    table = pd.DataFrame(rows, columns=["filename", "algorithm", "generator", "building", "scenario", "steps",
+                                        "seed", *metrics])
+    return table.astype({"seed": "Int64"})
+
+
+def compare_groups(runs: pd.DataFrame, metrics: Sequence[str] = DEFAULT_METRICS,
+                   by: Sequence[str] = GROUP_COLUMNS, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Mean, standard deviation and confidence interval (normal approximation, as in aggregate_results)
+    of every metric over the runs of every group. Groups of a single run have no std nor interval (NaN).
+    :param runs: table of load_runs()
+    :return: one row per group: the group columns, n_runs and {metric}_mean/_std/_ci_low/_ci_high
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    grouped = runs.groupby(list(by), sort=True)
+    table = grouped.size().rename("n_runs").to_frame()
+    for metric in metrics:
+        stats = grouped[metric].agg(["mean", "std"])
+        half_width = z * stats["std"] / np.sqrt(table["n_runs"])
+        table[f"{metric}_mean"] = stats["mean"]
+        table[f"{metric}_std"] = stats["std"]
+        table[f"{metric}_ci_low"] = stats["mean"] - half_width
+        table[f"{metric}_ci_high"] = stats["mean"] + half_width
+    return table.reset_index()
+
+
+def paired_deltas(runs: pd.DataFrame, metric: str, baseline: str, by: Sequence[str] = ("generator", "building"),
+                  confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Differences of a metric between every algorithm and the baseline algorithm on identical scenarios.
+    Runs are paired by (building, scenario), several runs of one algorithm on one scenario count as their mean.
+    Runs without a scenario key (unseeded traffic) are left out.
+    :param runs: table of load_runs()
+    :param baseline: algorithm the others are compared with
+    :return: one row per group and algorithm: n_pairs, delta_mean (algorithm - baseline), delta_std,
+        ci_low, ci_high (NaN for a single pair) and relative_delta (delta_mean / mean of the baseline on the
+        paired scenarios). Empty if no scenario of the baseline was run by another algorithm.
+    """
+    columns = [*by, "algorithm", "baseline", "n_pairs", "delta_mean", "delta_std", "ci_low", "ci_high",
+               "relative_delta"]
+    if baseline not in set(runs["algorithm"]):
+        raise ValueError(f"No runs of the baseline algorithm: {baseline}")
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    keys = list(dict.fromkeys([*by, "building", "scenario"]))
+    per_scenario = (runs.dropna(subset=["scenario"])
+                    .groupby([*keys, "algorithm"])[metric].mean()
+                    .unstack("algorithm"))
+    if baseline not in per_scenario.columns:
+        # no baseline run with a repeatable scenario
+        return pd.DataFrame(columns=columns)
+    base = per_scenario[baseline]
+
+    rows = []
+    for algorithm in per_scenario.columns:
+        if algorithm == baseline:
+            continue
+        delta = (per_scenario[algorithm] - base).dropna()
+        if delta.empty:
+            continue
+        for group, group_delta in delta.groupby(level=list(by)):
+            group = group if isinstance(group, tuple) else (group,)
+            n = len(group_delta)
+            mean = float(group_delta.mean())
+            std = float(group_delta.std(ddof=1)) if n > 1 else float("nan")
+            half_width = z * std / np.sqrt(n)
+            base_mean = float(base[group_delta.index].mean())
+            rows.append({**dict(zip(by, group)), "algorithm": algorithm, "baseline": baseline, "n_pairs": n,
+                         "delta_mean": mean, "delta_std": std, "ci_low": mean - half_width,
+                         "ci_high": mean + half_width,
+                         "relative_delta": mean / base_mean if base_mean else float("nan")})
+    return pd.DataFrame(rows, columns=columns)
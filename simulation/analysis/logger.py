@@ -1,8 +1,10 @@
 from pathlib import Path
 import os
 from datetime import datetime
-import pickle
 
+from simulation.analysis.catalog import RunCatalog
+from simulation.analysis.trace import StepTracer
+from simulation.analysis.trips import TripRecorder, save_run_config, TRIPS_SUFFIX, CONFIG_SUFFIX, TRACE_SUFFIX
 from simulation.core.elevator_system import ElevatorSystem
 from simulation import config
 
@@ -15,19 +17,56 @@ class SimulationLogger:
     def __init__(self, filename_prefix="run"):
         os.makedirs(LOG_DIR, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.output_path = os.path.join(LOG_DIR,
-                                        f"{filename_prefix}_{timestamp}.parquet")
-        self.system_path = os.path.join(LOG_DIR, f"{filename_prefix}_{timestamp}_system.pkl")
-        self.buffer = []
+        base = f"{filename_prefix}_{timestamp}"
+        self.output_path = os.path.join(LOG_DIR, base + TRACE_SUFFIX)
+        self.trips_path = os.path.join(LOG_DIR, base + TRIPS_SUFFIX)
+        self.config_path = os.path.join(LOG_DIR, base + CONFIG_SUFFIX)
+        self.tracer = None
+        self.trips = None
 
-    def save_system_state(self, system: ElevatorSystem):
-        """Saves system object to pickle."""
+    def start_trips(self) -> TripRecorder:
+        """Opens the trip records of the run (trips_path), fed by TripRecorder.collect()."""
+        self.trips = TripRecorder(self.trips_path)
+        return self.trips
+
+    def start_trace(self, system: ElevatorSystem, trace=None) -> StepTracer | None:
+        """
+        Opens the per-step trace of the run (output_path) if the config asks for one.
+        :param system: building of the run
+        :param trace: TraceSchema (default: trace of the config)
+        :return: StepTracer or None if the run is not traced
+        """
+        trace = trace if trace is not None else CONFIG.trace
+        if trace is None:
+            return None
+        self.tracer = StepTracer.from_config(self.output_path, len(system.elevators), trace)
+        return self.tracer
+
+    def close_trace(self):
+        if self.tracer is not None:
+            self.tracer.close()
+            self.tracer = None
+
+    def save_run(self, system: ElevatorSystem, steps: int | None = None):
+        """
+        Writes the trips not collected yet, closes the trip file, saves the config sidecar and records the run
+        in the run catalog.
+        :param system: building at the end of the run
+        :param steps: number of simulated steps
+        """
         try:
-            with open(self.system_path, "wb") as f:
-                pickle.dump(
-                    {"system": system,
-                     "config": CONFIG},
-                     f)
-            print(f"[LOG] Saved system to file: {self.system_path}")
+            trips = self.trips if self.trips is not None else self.start_trips()
+            trips.collect(system)
+            trips.close()
+            self.trips = None
+            save_run_config(self.config_path, CONFIG, steps=steps if steps is not None else CONFIG.steps,
+                            n_trips=trips.collected)
+            print(f"[LOG] Saved {trips.collected} trips to file: {self.trips_path}")
         except Exception as e:
             print(f"[LOG] Error while saving: {e}")
+            return
+
+        try:
+            RunCatalog(LOG_DIR).record(os.path.basename(self.trips_path))
+        except Exception as e:
+            print(f"[LOG] Error while adding the run to the catalog: {e}")
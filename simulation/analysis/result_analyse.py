@@ -1,11 +1,15 @@
-from simulation.core.person import Person
 from simulation.core.elevator_system import ElevatorSystem
 from simulation.config import ConfigSchema
 
-from simulation.analysis.schema import Results, ResultsInfoForGui
+from simulation.analysis.schema import Results, ResultsInfoForGui, MetricSummary, AggregatedResults
+from simulation.analysis.analytics import analyse_trips, mean_time_per_floor, trip_times
+from simulation.analysis.trips import (run_base, read_trips, load_run_config, trip_table, TRIPS_SUFFIX,
+                                       CONFIG_SUFFIX)
 
-from typing import List
+from typing import Dict, List
+from statistics import NormalDist
 import pickle
+import numpy as np
 
 from pathlib import Path
 import os
@@ -14,39 +18,48 @@ REPO_DIR = Path(__file__).resolve().parents[2]
 LOG_DIR = REPO_DIR / "database" / "logs"
 
 
-def analyse_from_file(filename: str) -> ResultsInfoForGui:
-    with open(os.path.join(LOG_DIR, filename), "rb") as file:
-        data = pickle.load(file)
+def analyse_from_file(filename: str, log_dir=None) -> ResultsInfoForGui:
+    """
+    Results of a run from its trips file (or any other file of the run) in the logs directory.
+    Logs written before trip files existed (any .pkl with a pickled {"system", "config"}) are still read.
+    :param log_dir: directory of the run files (default: database/logs)
+    """
+    log_dir = log_dir if log_dir is not None else LOG_DIR
+    if filename.endswith(".pkl"):
+        with open(os.path.join(log_dir, filename), "rb") as file:
+            data = pickle.load(file)
 
-    system: ElevatorSystem = data['system']
-    config: ConfigSchema = data['config']
+        system: ElevatorSystem = data['system']
+        config: ConfigSchema = data['config']
+        trips = trip_table(system)
+    else:
+        base = run_base(filename)
+        config = load_run_config(os.path.join(log_dir, base + CONFIG_SUFFIX))
+        trips = read_trips(os.path.join(log_dir, base + TRIPS_SUFFIX),
+                           columns=["origin", "destination", "appear_step", "board_step", "alight_step", "car"])
 
-    results = summarize_simulation(system)
+    return ResultsInfoForGui(info=config, results=summarize_trips(trips), analytics=analyse_trips(trips))
 
-    return ResultsInfoForGui(info=config, results=results)
 
+def summarize_simulation(elevator_system: ElevatorSystem, verbose: bool = True):
+    return summarize_trips(trip_table(elevator_system), verbose=verbose)
 
-def summarize_simulation(elevator_system: ElevatorSystem):
-    passengers: List[Person] = elevator_system.passengers_at_dest
-    n_passengers = len(passengers)
 
-    if not passengers:
+def summarize_trips(trips: Dict[str, np.ndarray], verbose: bool = True) -> Results:
+    """
+    :param trips: trip columns (see analysis.trips.TRIP_COLUMNS) of the passengers at destination
+    """
+    n_passengers = len(trips["alight_step"])
+
+    if not n_passengers:
         raise ValueError("No passengers at destination")
 
-    mean_journey_time = 0
-    mean_j_time_dist = 0
-    mean_waiting_time = 0
-    mean_travel_time = 0
-    for passenger in passengers:
-        mean_journey_time += passenger.journey_time
-        mean_j_time_dist += passenger.journey_time / abs(passenger.starting_floor - passenger.desired_floor)
-        mean_waiting_time += passenger.waiting_time
-        mean_travel_time += passenger.travel_time
-
-    mean_journey_time /= n_passengers
-    mean_waiting_time /= n_passengers
-    mean_travel_time /= n_passengers
-    mean_j_time_dist /= n_passengers
+    waiting_time, travel_time, journey_time = trip_times(trips)
+
+    mean_journey_time = float(journey_time.mean())
+    mean_waiting_time = float(waiting_time.mean())
+    mean_travel_time = float(travel_time.mean())
+    mean_j_time_dist = mean_time_per_floor(journey_time, trips["origin"], trips["destination"])
 
     results = Results(
         mean_waiting_time=mean_waiting_time,
@@ -56,9 +69,38 @@ def summarize_simulation(elevator_system: ElevatorSystem):
         n_passengers=n_passengers
     )
 
-    print("Średnia długość całkowitej podróży: ", mean_journey_time)
-    print("Średnia długość oczekiwania na przybycie windy: ", mean_waiting_time)
-    print("Średnia długość podróży windą: ", mean_travel_time)
-    print("Średnia długość całkowitej podróży na piętro: ", mean_j_time_dist)
+    if verbose:
+        print("Średnia długość całkowitej podróży: ", mean_journey_time)
+        print("Średnia długość oczekiwania na przybycie windy: ", mean_waiting_time)
+        print("Średnia długość podróży windą: ", mean_travel_time)
+        print("Średnia długość całkowitej podróży na piętro: ", mean_j_time_dist)
 
     return results
+
+
+def aggregate_results(results: List[Results], seeds: List[int], confidence: float = 0.95) -> AggregatedResults:
+    """
+    Mean, standard deviation and confidence interval (normal approximation) of every metric over replications.
+    :param results: Results of the single replications
+    :param seeds: traffic seeds of the replications
+    :param confidence: confidence level of the intervals
+    """
+    if not results:
+        raise ValueError("No replications to aggregate")
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    summaries = {}
+    for field in Results.model_fields:
+        values = np.array([getattr(r, field) for r in results], dtype=float)
+        mean = float(values.mean())
+        std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+        half_width = z * std / np.sqrt(len(values))
+        summaries[field] = MetricSummary(mean=mean, std=std, ci_low=mean - half_width, ci_high=mean + half_width)
+
+    return AggregatedResults(
+        n_replications=len(results),
+        confidence=confidence,
+        seeds=seeds,
+        runs=results,
+        **summaries
+    )
@@ -1,9 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, List, Optional
 
 from simulation.schema import ConfigSchema
 
 
+# metrics are NaN when undefined (e.g. time per floor if no passenger changed floors), JSON keeps them as NaN
+
 class Results(BaseModel):
+    model_config = ConfigDict(ser_json_inf_nan="constants")
     mean_journey_time: float
     mean_waiting_time: float
     mean_travel_time: float
@@ -11,6 +15,90 @@ class Results(BaseModel):
     n_passengers: int
 
 
+class DistributionSummary(BaseModel):
+    """Distribution of a time (in steps) over passengers"""
+    model_config = ConfigDict(ser_json_inf_nan="constants")
+    mean: float
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+    max: float
+
+
+class GroupSummary(BaseModel):
+    """Times of the passengers of one group (floor of origin, car)"""
+    key: int
+    n_passengers: int
+    waiting_time: DistributionSummary
+    journey_time: DistributionSummary
+
+
+class TimeBucket(BaseModel):
+    """Passengers who appeared in steps [start_step, start_step + bucket length)"""
+    model_config = ConfigDict(ser_json_inf_nan="constants")
+    start_step: int
+    n_passengers: int
+    mean_waiting_time: float
+    p95_waiting_time: float
+    mean_journey_time: float
+
+
+class TripAnalytics(BaseModel):
+    model_config = ConfigDict(ser_json_inf_nan="constants")
+    n_passengers: int
+    waiting_time: DistributionSummary
+    travel_time: DistributionSummary
+    journey_time: DistributionSummary
+    mean_j_time_dist: float
+    service_level: Dict[int, float]  # waiting time limit (steps) -> share of passengers who waited less
+    per_floor: List[GroupSummary]
+    per_car: List[GroupSummary]
+    bucket_steps: int
+    time_series: List[TimeBucket]
+
+
 class ResultsInfoForGui(BaseModel):
     info: ConfigSchema
     results: Results
+    analytics: Optional[TripAnalytics] = None
+
+
+class MetricSummary(BaseModel):
+    mean: float
+    std: float
+    ci_low: float
+    ci_high: float
+
+
+class AggregatedResults(BaseModel):
+    """Results of independent replications of one configuration"""
+    n_replications: int
+    confidence: float
+    seeds: List[int]
+    runs: List[Results]
+
+    mean_journey_time: MetricSummary
+    mean_waiting_time: MetricSummary
+    mean_travel_time: MetricSummary
+    mean_j_time_dist: MetricSummary
+    n_passengers: MetricSummary
+
+
+class CatalogEntry(BaseModel):
+    """Run of the run catalog (analysis.catalog): its file, config summary and key metrics"""
+    filename: str
+    size: int
+    mtime: float
+    algorithm: str
+    generator: str
+    seed: Optional[int]
+    steps: int
+    floors: int
+    elevators: int
+    n_passengers: int
+    mean_waiting_time: float
+    mean_journey_time: float
+    mean_travel_time: float
+    mean_j_time_dist: Optional[float]
+    p95_waiting_time: Optional[float]
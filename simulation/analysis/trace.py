@@ -0,0 +1,225 @@
+"""
+Per-step trace of a simulation run, streamed into a Parquet file.
+
+Every step adds one row per elevator: step, elevator_id and the traced fields (TraceFieldEnum).
+Rows are written into preallocated NumPy columns. When flush_every steps are buffered the columns are
+handed to a background thread, which writes them as one Parquet row group, while the simulation continues
+into a second set of columns. Memory therefore stays at two row groups, however long the run is.
+"""
+import queue
+import threading
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from simulation.enums import TraceFieldEnum
+
+STATES = ["UP", "DOWN", "STANDING"]
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+FIELD_DTYPES = {
+    TraceFieldEnum.FLOOR: np.int16,
+    TraceFieldEnum.STATE: np.int8,
+    TraceFieldEnum.ACTION: np.int8,
+    TraceFieldEnum.DELAY: np.int32,
+    TraceFieldEnum.NUM_INSIDE: np.int32,
+    TraceFieldEnum.REQUESTED_FLOORS: np.int32,
+    TraceFieldEnum.WAITING_TOTAL: np.int32,
+}
+CATEGORICAL_FIELDS = (TraceFieldEnum.STATE, TraceFieldEnum.ACTION)  # stored as codes of STATES
+
+
+def waiting_total(system) -> int:
+    """Number of passengers waiting on all floors (object and columnar buildings)."""
+    occupied_slots = system.passengers.occupied_slots if hasattr(system, "passengers") else system.occupied_slots
+    return sum(mask.bit_count() for mask in occupied_slots)
+
+
+# writers of the rows of one step into a column, starting at row i
+
+def _write_floor(column, i, system, actions):
+    for elevator in system.elevators:
+        column[i] = elevator.current_floor
+        i += 1
+
+
+def _write_state(column, i, system, actions):
+    for elevator in system.elevators:
+        column[i] = STATE_CODES[elevator.state]
+        i += 1
+
+
+def _write_action(column, i, system, actions):
+    for j in range(len(system.elevators)):
+        column[i + j] = STATE_CODES[actions[j]] if actions is not None else -1
+
+
+def _write_delay(column, i, system, actions):
+    for elevator in system.elevators:
+        column[i] = elevator.delay
+        i += 1
+
+
+def _write_num_inside(column, i, system, actions):
+    for elevator in system.elevators:
+        column[i] = elevator.people_inside_int
+        i += 1
+
+
+def _write_requested_floors(column, i, system, actions):
+    requested = system.requested_mask.bit_count()
+    for j in range(len(system.elevators)):
+        column[i + j] = requested
+
+
+def _write_waiting_total(column, i, system, actions):
+    waiting = waiting_total(system)
+    for j in range(len(system.elevators)):
+        column[i + j] = waiting
+
+
+FIELD_WRITERS = {
+    TraceFieldEnum.FLOOR: _write_floor,
+    TraceFieldEnum.STATE: _write_state,
+    TraceFieldEnum.ACTION: _write_action,
+    TraceFieldEnum.DELAY: _write_delay,
+    TraceFieldEnum.NUM_INSIDE: _write_num_inside,
+    TraceFieldEnum.REQUESTED_FLOORS: _write_requested_floors,
+    TraceFieldEnum.WAITING_TOTAL: _write_waiting_total,
+}
+
+
+class StepTracer:
+    """
+    Writer of the per-step trace. Use record() after every step and close() at the end of the run
+    (or use it as a context manager).
+    """
+
+    def __init__(self, path, n_elevators: int, fields: List[TraceFieldEnum] | None = None, flush_every=10_000):
+        """
+        :param path: output .parquet file
+        :param n_elevators: number of elevators (rows per step)
+        :param fields: traced fields (default: all of TraceFieldEnum)
+        :param flush_every: steps per row group
+        """
+        fields = list(TraceFieldEnum) if fields is None else [TraceFieldEnum(f) for f in fields]
+        self.path = Path(path)
+        self.n_elevators = n_elevators
+        self.fields = [f for f in TraceFieldEnum if f in fields]
+        self.writers = [(field.value, FIELD_WRITERS[field]) for field in self.fields]
+        self.capacity = flush_every * n_elevators
+
+        columns = [pa.field("step", pa.int64()), pa.field("elevator_id", pa.int16())]
+        for field in self.fields:
+            if field in CATEGORICAL_FIELDS:
+                columns.append(pa.field(field.value, pa.dictionary(pa.int8(), pa.string())))
+            else:
+                columns.append(pa.field(field.value, pa.from_numpy_dtype(FIELD_DTYPES[field])))
+        self.schema = pa.schema(columns)
+        self.writer = pq.ParquetWriter(self.path, self.schema, compression="snappy")
+
+        # two sets of columns: one is filled while the other one is written
+        self.free = queue.Queue()
+        for _ in range(2):
+            self.free.put(self._new_columns())
+        self.pending = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+        self.thread.start()
+
+        self.columns = self.free.get()
+        self.size = 0
+        self.rows_written = 0
+
+    @classmethod
+    def from_config(cls, path, n_elevators: int, trace) -> "StepTracer":
+        """
+        :param trace: TraceSchema of the run config
+        """
+        return cls(path, n_elevators, fields=trace.fields, flush_every=trace.flush_every)
+
+    def _new_columns(self) -> dict:
+        columns = {"step": np.empty(self.capacity, dtype=np.int64),
+                   "elevator_id": np.empty(self.capacity, dtype=np.int16)}
+        for field in self.fields:
+            columns[field.value] = np.empty(self.capacity, dtype=FIELD_DTYPES[field])
+        return columns
+
+    def record(self, step: int, system, actions=None):
+        """
+        Adds the rows of one step.
+        :param step: step index
+        :param system: building after the step
+        :param actions: actions the policy chose in the step (needed only if ACTION is traced)
+        """
+        columns = self.columns
+        i = self.size
+        n = len(system.elevators)
+        step_column, id_column = columns["step"], columns["elevator_id"]
+        for j in range(n):
+            step_column[i + j] = step
+            id_column[i + j] = j
+
+        for name, write in self.writers:
+            write(columns[name], i, system, actions)
+
+        self.size = i + n
+        if self.size + n > self.capacity:
+            self.flush()
+
+    def flush(self):
+        """Hands the buffered rows to the writer thread and continues into the other set of columns."""
+        if self.error is not None:
+            raise self.error
+        if self.size == 0:
+            return
+        self.pending.put((self.columns, self.size))
+        self.rows_written += self.size
+        self.columns = self.free.get()
+        self.size = 0
+
+    def _write_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            columns, size = item
+            try:
+                if self.error is None:
+                    self.writer.write_table(self._table(columns, size))
+            except Exception as e:
+                self.error = e
+            self.free.put(columns)
+
+    def _table(self, columns: dict, size: int) -> pa.Table:
+        arrays = []
+        for field in self.schema:
+            values = columns[field.name][:size]
+            if pa.types.is_dictionary(field.type):
+                # -1 (no action recorded) becomes null
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(values, mask=values < 0), pa.array(STATES)))
+            else:
+                arrays.append(pa.array(values))
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+    def close(self) -> Path:
+        """Writes the remaining rows and closes the file."""
+        try:
+            self.flush()
+        finally:
+            self.pending.put(None)
+            self.thread.join()
+            self.writer.close()
+        if self.error is not None:
+            raise self.error
+        print(f"[LOG] Saved {self.rows_written} trace rows to file: {self.path}")
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,154 @@
+"""
+Trip records of a simulation run: one row per passenger who reached their destination, appended to a Parquet
+file as passengers alight. A small JSON sidecar keeps the config of the run.
+
+Files of one run in database/logs share a base name:
+    {base}_trips.parquet - trip records (TRIP_COLUMNS)
+    {base}_config.json   - sidecar with the run config
+    {base}.parquet       - optional per-step trace (analysis.trace)
+"""
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from simulation.core.elevator_system import ElevatorSystem
+from simulation.schema import ConfigSchema
+
+TRIPS_SUFFIX = "_trips.parquet"
+CONFIG_SUFFIX = "_config.json"
+TRACE_SUFFIX = ".parquet"
+
+TRIP_COLUMNS = {
+    "id": np.int64,
+    "origin": np.int16,
+    "destination": np.int16,
+    "appear_step": np.int64,
+    "board_step": np.int64,
+    "alight_step": np.int64,
+    "car": np.int16,
+}
+TRIPS_SCHEMA = pa.schema([pa.field(name, pa.from_numpy_dtype(dtype)) for name, dtype in TRIP_COLUMNS.items()])
+
+
+def run_base(filename: str) -> str:
+    """Base name of a run from the name of any of its files."""
+    for suffix in (TRIPS_SUFFIX, CONFIG_SUFFIX, TRACE_SUFFIX):
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def run_files(log_dir, base: str) -> List[Path]:
+    """Existing files of the run."""
+    log_dir = Path(log_dir)
+    return [log_dir / (base + suffix) for suffix in (TRIPS_SUFFIX, CONFIG_SUFFIX, TRACE_SUFFIX)
+            if (log_dir / (base + suffix)).exists()]
+
+
+def delivered_trips(system: ElevatorSystem, start=0) -> Dict[str, np.ndarray]:
+    """
+    Trip columns of the passengers who reached their destination, from the start-th delivered one on.
+    Columnar buildings are read straight from their PassengerTable, without building Person objects.
+    """
+    table = getattr(system, "passengers", None)
+    if table is not None:
+        ids = np.asarray(table.delivered_ids[start:], dtype=np.int64)
+        return {
+            "id": ids,
+            "origin": table.starting_floor[ids],
+            "destination": table.desired_floor[ids],
+            "appear_step": table.appearing_time[ids],
+            "board_step": table.boarding_time[ids],
+            "alight_step": table.leaving_time[ids],
+            "car": table.elevator[ids],
+        }
+
+    people = system.passengers_at_dest[start:]
+    return {
+        "id": [-1 if p.id is None else p.id for p in people],
+        "origin": [p.starting_floor for p in people],
+        "destination": [p.desired_floor for p in people],
+        "appear_step": [p.appearing_time for p in people],
+        "board_step": [p.boarding_time for p in people],
+        "alight_step": [p.leaving_time for p in people],
+        "car": [-1 if p.elevator is None else p.elevator for p in people],
+    }
+
+
+def trip_table(system: ElevatorSystem) -> Dict[str, np.ndarray]:
+    """All trips of the building as NumPy columns (TRIP_COLUMNS)."""
+    return {name: np.asarray(values, dtype=TRIP_COLUMNS[name]) for name, values in delivered_trips(system).items()}
+
+
+class TripRecorder:
+    """
+    Appends trips of a running simulation to a Parquet file. Call collect() after steps (every step or
+    every few steps) and close() at the end. Trips are buffered and written as row groups of flush_rows rows.
+    """
+
+    def __init__(self, path, flush_rows=65_536):
+        self.path = Path(path)
+        self.flush_rows = flush_rows
+        self.writer = pq.ParquetWriter(self.path, TRIPS_SCHEMA, compression="snappy")
+        self.columns = {name: np.empty(flush_rows, dtype=dtype) for name, dtype in TRIP_COLUMNS.items()}
+        self.size = 0
+        self.collected = 0  # delivered passengers of the building already collected
+
+    def collect(self, system: ElevatorSystem):
+        """Takes the passengers who reached their destination since the last call."""
+        delivered = len(system.passengers.delivered_ids) if hasattr(system, "passengers") \
+            else len(system.passengers_at_dest)
+        if delivered == self.collected:
+            return
+
+        trips = delivered_trips(system, self.collected)
+        self.collected = delivered
+        n = len(trips["id"])
+        start = 0
+        while start < n:
+            take = min(n - start, self.flush_rows - self.size)
+            for name, column in self.columns.items():
+                column[self.size:self.size + take] = trips[name][start:start + take]
+            self.size += take
+            start += take
+            if self.size == self.flush_rows:
+                self.flush()
+
+    def flush(self):
+        if self.size == 0:
+            return
+        arrays = [pa.array(self.columns[name][:self.size]) for name in TRIP_COLUMNS]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=TRIPS_SCHEMA))
+        self.size = 0
+
+    def close(self) -> Path:
+        self.flush()
+        self.writer.close()
+        return self.path
+
+
+def save_run_config(path, config: ConfigSchema, **metadata) -> Path:
+    """Writes the sidecar of a run: the config and any metadata (steps, passengers, ...)."""
+    path = Path(path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"config": config.model_dump(mode="json"), **metadata}, f, indent=2)
+    return path
+
+
+def load_run_config(path) -> ConfigSchema:
+    with open(path, encoding="utf-8") as f:
+        return ConfigSchema(**json.load(f)["config"])
+
+
+def read_trips(path, columns: List[str] | None = None) -> Dict[str, np.ndarray]:
+    """
+    :param path: trips file of a run
+    :param columns: columns to read (default: all)
+    :return: {column: NumPy array}
+    """
+    table = pq.read_table(path, columns=columns)
+    return {name: table.column(name).to_numpy() for name in table.column_names}
@@ -0,0 +1,327 @@
+"""
+Headless benchmarks of the simulation engine.
+
+Usage:
+    python -m simulation.benchmarks.benchmark --matrix quick --threshold 0.2
+    python -m simulation.benchmarks.benchmark --matrix full --update-baseline
+
+Every case is timed on a matrix of building sizes (floors x cars x max_people_floor), operator_step on every
+simulation backend and full_run on every backend and engine of the matrix. Results are saved
+as JSON (seconds per call and noise of every case, see time_per_call) and compared against the baseline
+(results/baseline.json by default). A case slower than baseline * (1 + threshold + NOISE_SIGMAS * noise)
+is reported as a regression and the script exits with code 1.
+
+Timings depend on the machine, so the baseline is not kept in the repository: create it with
+--update-baseline on the machine (or CI runner) that checks for regressions. Results of another machine
+or another Python/NumPy (see machine_info) are not compared unless --force is given.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from functools import partial
+from itertools import product
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from simulation.schema import ConfigSchema, ElevatorConfigSchema, TrafficConfigSchema
+from simulation.enums import (AlgorithmEnum, TrafficGeneratorEnum, UpPeakParams, DownPeakParams,
+                              MixedPeakParams, SimulationBackendEnum, EngineModeEnum)
+from simulation.core.elevator_system import ElevatorSystem
+from simulation.core.person import Person
+from simulation.engine.traffic_generator import generate_passengers
+from simulation.engine.presampled_traffic import PresampledTraffic
+from simulation.engine.replications import simulate
+from simulation.engine.utils import visiting_floor
+from simulation.training.scripts.utils import get_state, encode_state, decode_state, reward_function, IncrementalReward
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+BASELINE_PATH = RESULTS_DIR / "baseline.json"
+
+MATRICES = {
+    "quick": {"floors": [3, 10, 40], "cars": [1, 4], "max_people_floor": [12, 100],
+              "backend": ["object", "columnar"], "engine": ["tick", "event"]},
+    "full": {"floors": [3, 10, 40, 100], "cars": [1, 4, 8, 16], "max_people_floor": [12, 100, 500],
+             "backend": ["object", "columnar"], "engine": ["tick", "event"]},
+}
+
+NOISE_SIGMAS = 3  # noise widths a case may be slower than the baseline by, besides the threshold
+
+WARMUP_STEPS = 500
+TIMED_STEPS = 1000
+FULL_RUN_STEPS = 2000
+
+
+def benchmark_config(floors: int, cars: int, max_people_floor: int,
+                     generator_type: TrafficGeneratorEnum = TrafficGeneratorEnum.MIXED_PEAK,
+                     steps: int = FULL_RUN_STEPS,
+                     backend: SimulationBackendEnum = SimulationBackendEnum.OBJECT,
+                     engine: EngineModeEnum = EngineModeEnum.TICK) -> ConfigSchema:
+    return ConfigSchema(
+        floors=floors,
+        max_people_floor=max_people_floor,
+        steps=steps,
+        visualisation=False,
+        elevators=[ElevatorConfigSchema(max_people=8, speed=5, starting_floor=0) for _ in range(cars)],
+        algorithm=AlgorithmEnum.COLLECTIVE_CONTROL,
+        traffic=TrafficConfigSchema(
+            generator_type=generator_type,
+            intensity=0.5,
+            seed=0,
+            up_peak_params=UpPeakParams(),
+            down_peak_params=DownPeakParams(),
+            mixed_peak_params=MixedPeakParams(),
+        ),
+        backend=backend,
+        engine=engine,
+    )
+
+
+def time_per_call(fn: Callable, calls: int, repeats: int = 5) -> Tuple[float, float]:
+    """
+    :return: best of `repeats` mean times of `calls` calls of fn, in seconds, and the noise of the
+        measurement: relative distance of the median round from the best one
+    """
+    return _best_and_noise([_mean_time(fn, calls) for _ in range(repeats)])
+
+
+def _mean_time(fn: Callable, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def _best_and_noise(timings) -> Tuple[float, float]:
+    best = min(timings)
+    return best, (float(np.median(timings)) - best) / best if best > 0 else 0.0
+
+
+def warmed_system(config: ConfigSchema, steps: int = WARMUP_STEPS) -> ElevatorSystem:
+    """Building after `steps` steps of the collective control policy."""
+    policy = config.algorithm.get_controller()
+    generate = partial(generate_passengers, config=config)
+    system = config.backend.build_system(config)
+    operator = config.backend.get_operator()
+    for step in range(steps):
+        system = operator(policy(system), system, step, generate=generate)
+    return system
+
+
+# ------------------ cases ------------------
+
+def bench_operator(config: ConfigSchema) -> Tuple[float, float]:
+    policy = config.algorithm.get_controller()
+    generate = partial(generate_passengers, config=config)
+    system = warmed_system(config)
+    operator = config.backend.get_operator()
+    steps = iter(range(WARMUP_STEPS, WARMUP_STEPS + 10 * TIMED_STEPS))
+
+    def step():
+        operator(policy(system), system, next(steps), generate=generate)
+
+    return time_per_call(step, TIMED_STEPS)
+
+
+def bench_full_run(config: ConfigSchema) -> Tuple[float, float]:
+    """Whole run of config.steps steps, as run_simulation without rendering and logging."""
+    return time_per_call(partial(simulate, config), 1, repeats=3)
+
+
+def bench_state_and_reward(config: ConfigSchema) -> Dict[str, Tuple[float, float]]:
+    system = warmed_system(config)
+    state = get_state(system)
+    decoded = decode_state(state, system)
+    actions = ["STANDING"] * len(system.elevators)
+    step_reward = IncrementalReward()
+    step_reward.reset(system)
+    return {
+        "get_state": time_per_call(partial(get_state, system), TIMED_STEPS),
+        "encode_state": time_per_call(partial(encode_state, system), TIMED_STEPS),
+        "decode_state": time_per_call(partial(decode_state, state, system), TIMED_STEPS),
+        "reward_function": time_per_call(partial(reward_function, decoded, decoded, actions), TIMED_STEPS),
+        "incremental_reward": time_per_call(partial(step_reward, system), TIMED_STEPS),
+    }
+
+
+def bench_visiting_floor(config: ConfigSchema) -> Tuple[float, float]:
+    """Stop of an empty car at a lobby filled with passengers."""
+    timings = []
+    for _ in range(50):
+        system = config.backend.build_system(config)
+        for _ in range(config.max_people_floor):
+            system.insert_person(Person(step=0, starting_floor=0, desired_floor=config.floors))
+        system.add_floor_to_requested_queue(0)
+        elevator = system.elevators[0]
+
+        start = time.perf_counter()
+        visiting_floor(0, elevator, system, 1)
+        timings.append(time.perf_counter() - start)
+    # single calls are too short for the best of: the median, with the interquartile range as noise
+    q1, median, q3 = np.percentile(timings, [25, 50, 75])
+    return float(median), float((q3 - q1) / median) if median > 0 else 0.0
+
+
+def bench_generators(config: ConfigSchema, repeats: int = 3) -> Dict[str, Tuple[float, float]]:
+    results = {}
+    for generator_type in (TrafficGeneratorEnum.UP_PEAK, TrafficGeneratorEnum.DOWN_PEAK,
+                           TrafficGeneratorEnum.MIXED_PEAK):
+        gen_config = benchmark_config(config.floors, len(config.elevators), config.max_people_floor,
+                                      generator_type=generator_type)
+        totals = []
+        for _ in range(repeats):
+            system = ElevatorSystem(gen_config.floors, gen_config.max_people_floor)
+            total = 0.0
+            for step in range(TIMED_STEPS):
+                start = time.perf_counter()
+                generate_passengers(system, step, config=gen_config)
+                total += time.perf_counter() - start
+                if step % 50 == 0:  # empty the building outside the timed region, so floors never fill up
+                    system = ElevatorSystem(gen_config.floors, gen_config.max_people_floor)
+            totals.append(total / TIMED_STEPS)
+        results[f"generator_{generator_type.value}"] = _best_and_noise(totals)
+
+        sample = partial(PresampledTraffic.sample, gen_config, TIMED_STEPS)
+        seconds, noise = time_per_call(sample, 3)
+        results[f"presampled_{generator_type.value}"] = (seconds / TIMED_STEPS, noise)
+    return results
+
+
+def run_benchmarks(matrix: Dict) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    :return: dicts "case|floors=F|cars=C|max_people_floor=M" -> seconds per call, and -> noise,
+        operator_step keyed also by "backend=B" and full_run by "backend=B|engine=E"
+    """
+    backends = [SimulationBackendEnum(backend) for backend in matrix.get("backend", ["object"])]
+    engines = [EngineModeEnum(engine) for engine in matrix.get("engine", ["tick"])]
+    results, noise = {}, {}
+    for floors, cars, max_people_floor in product(matrix["floors"], matrix["cars"], matrix["max_people_floor"]):
+        config = benchmark_config(floors, cars, max_people_floor)
+        size = f"floors={floors}|cars={cars}|max_people_floor={max_people_floor}"
+        print(f"[BENCH] {size}")
+
+        cases = {}
+        for backend in backends:
+            cases[f"operator_step|backend={backend.value}"] = bench_operator(
+                benchmark_config(floors, cars, max_people_floor, backend=backend))
+            for engine in engines:
+                cases[f"full_run|backend={backend.value}|engine={engine.value}"] = bench_full_run(
+                    benchmark_config(floors, cars, max_people_floor, backend=backend, engine=engine))
+        cases.update({
+            "visiting_floor": bench_visiting_floor(config),
+            **bench_state_and_reward(config),
+            **bench_generators(config),
+        })
+        for case, (seconds, case_noise) in cases.items():
+            results[f"{case}|{size}"] = seconds
+            noise[f"{case}|{size}"] = case_noise
+    return results, noise
+
+
+# ------------------ baseline comparison ------------------
+
+def machine_info() -> Dict:
+    """Machine and environment the timings are comparable within."""
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "system": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> Dict[str, float]:
+    """
+    :param current: saved results (see save_results)
+    :param baseline: saved baseline results
+    :return: dict case -> current / baseline ratio of the cases slower than
+        baseline * (1 + threshold + NOISE_SIGMAS * noise), noise - the larger one of both measurements
+    """
+    regressions = {}
+    baseline_seconds, baseline_noise = baseline["results"], baseline.get("noise", {})
+    for case, seconds in current["results"].items():
+        if case not in baseline_seconds or baseline_seconds[case] <= 0:
+            continue
+        noise = max(current["noise"].get(case, 0.0), baseline_noise.get(case, 0.0))
+        ratio = seconds / baseline_seconds[case]
+        if ratio > 1 + threshold + NOISE_SIGMAS * noise:
+            regressions[case] = ratio
+    return regressions
+
+
+def save_results(results: Dict[str, float], noise: Dict[str, float], path: Path, matrix_name: str) -> Dict:
+    os.makedirs(path.parent, exist_ok=True)
+    payload = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "matrix": matrix_name,
+            **machine_info(),
+        },
+        "results": results,
+        "noise": noise,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"[BENCH] Saved {len(results)} results to {path}")
+    return payload
+
+
+def load_results(path: Path) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of the elevator simulation engine")
+    parser.add_argument("--matrix", choices=MATRICES, default="quick")
+    parser.add_argument("--output", type=Path,
+                        default=RESULTS_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative slowdown on top of the measurement noise")
+    parser.add_argument("--update-baseline", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--force", action="store_true",
+                        help="Compare with a baseline of another machine or environment")
+    args = parser.parse_args(argv)
+
+    results, noise = run_benchmarks(MATRICES[args.matrix])
+    current = save_results(results, noise, args.output, args.matrix)
+
+    if args.update_baseline:
+        save_results(results, noise, args.baseline, args.matrix)
+        return 0
+    if not args.baseline.exists():
+        print(f"[BENCH] No baseline at {args.baseline}, skipping comparison (create it with --update-baseline)")
+        return 0
+
+    baseline = load_results(args.baseline)
+    differences = {key: (baseline["meta"].get(key), value) for key, value in machine_info().items()
+                   if baseline["meta"].get(key) != value}
+    if differences:
+        for key, (baseline_value, value) in differences.items():
+            print(f"[BENCH] Baseline {key}: {baseline_value}, this run: {value}")
+        if not args.force:
+            print("[BENCH] Baseline comes from another machine or environment, skipping comparison "
+                  "(refresh it with --update-baseline or compare anyway with --force)")
+            return 0
+
+    regressions = compare(current, baseline, args.threshold)
+    for case, ratio in sorted(regressions.items(), key=lambda item: -item[1]):
+        print(f"[BENCH] REGRESSION {case}: {ratio:.2f}x baseline")
+    if regressions:
+        return 1
+    print("[BENCH] No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,12 +14,13 @@ def collective_control_policy(elevator_system: ElevatorSystem):
         current_floor = elevator.current_floor
         direction = elevator.state
 
+        # target floors as bitmaps: bit f set when floor f is a target
         if elevator.people_inside_int >= elevator.max_people_inside:
-            targets = set(elevator.chosen_floors)
+            targets = elevator.chosen_mask
         else:
-            targets = set(elevator.chosen_floors).union(elevator_system.requested_floors)
+            targets = elevator.chosen_mask | elevator_system.requested_mask
 
-        if current_floor in targets:
+        if targets >> current_floor & 1:
             actions[i] = "STANDING"
             continue
 
@@ -27,8 +28,8 @@ def collective_control_policy(elevator_system: ElevatorSystem):
             actions[i] = "STANDING"
             continue
 
-        above = [f for f in targets if f > current_floor]
-        below = [f for f in targets if f < current_floor]
+        above = targets >> (current_floor + 1)
+        below = targets & ((1 << current_floor) - 1)
 
         if direction == "UP":
             actions[i] = "UP" if above else ("DOWN" if below else "STANDING")
@@ -36,8 +37,8 @@ def collective_control_policy(elevator_system: ElevatorSystem):
             actions[i] = "DOWN" if below else ("UP" if above else "STANDING")
         else:
             if above and below:
-                nearest_above = min(above) - current_floor
-                nearest_below = current_floor - max(below)
+                nearest_above = (above & -above).bit_length()
+                nearest_below = current_floor - (below.bit_length() - 1)
                 actions[i] = "UP" if nearest_above <= nearest_below else "DOWN"
             elif above:
                 actions[i] = "UP"
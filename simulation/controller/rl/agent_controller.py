@@ -1,12 +1,18 @@
+from simulation.controller.classical.collective_control_policy import collective_control_policy
+from simulation.controller.rl.greedy_policy import GreedyPolicy
 from simulation.training.agents.q_learning_agent import QLearningAgent, QLearningAgentsGroup
-from simulation.training.scripts.utils import get_state
 from simulation.core.elevator_system import ElevatorSystem
 
 
 class AgentsGroupController:
-    def __init__(self, model_path):
+    def __init__(self, model_path, fallback=collective_control_policy):
+        """
+        :param model_path: .qlm or .pkl model of the agents
+        :param fallback: policy deciding in states the agents have never seen
+        """
         try:
-            group = QLearningAgentsGroup.load(model_path)
+            # evaluation only: the Q-tables are memory-mapped read-only
+            group = QLearningAgentsGroup.load(model_path, mmap=True)
             self.agents = group.agents
 
         except Exception as e:
@@ -15,20 +21,7 @@ class AgentsGroupController:
             self.agents = [agent]
         for agent in self.agents:
             agent.epsilon = 0
+        self.policy = GreedyPolicy(self.agents, fallback)
 
     def use_agents(self, elevator_system: ElevatorSystem):
-        state = get_state(elevator_system)
-
-        if len(self.agents) == 1:
-            idx = self.agents[0].choose_action(state)
-            return [self.agents[0].actions[idx]]
-
-        actions = []
-        for i, agent in enumerate(self.agents):
-            if elevator_system.elevators[i].delay == 0:
-                idx = agent.choose_action(state)
-                actions.append(agent.actions[idx])
-            else:
-                actions.append("STANDING")
-
-        return actions
+        return self.policy(elevator_system)
@@ -0,0 +1,87 @@
+from typing import Callable, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+from simulation.core.elevator_system import ElevatorSystem
+from simulation.training.agents.model_format import MappedQTable
+from simulation.training.agents.q_learning_agent import QLearningAgent
+from simulation.training.scripts.utils import encode_state
+
+
+def _q_matrix(q_table, n_actions: int) -> Tuple[List[Hashable], np.ndarray]:
+    """
+    :return: states of the Q-table and the (n_states, n_actions) matrix of their Q-values
+    """
+    if isinstance(q_table, MappedQTable):
+        return q_table.keys(), np.asarray(q_table.values)
+    items = list(q_table.items())
+    if not items:
+        return [], np.zeros((0, n_actions))
+    states, q_values = zip(*items)
+    return list(states), np.array(q_values)
+
+
+class GreedyPolicy:
+    """
+    Frozen greedy policy of trained agents for evaluation runs.
+
+    The argmax action of every agent is computed once for every state the agents know. The lookup maps a state
+    to a tuple of action names, and tuples are shared between states with the same actions. A step is one
+    encode_state() and one dict lookup: no epsilon, no random numbers and no new Q-table rows.
+    States no agent knows are delegated to the fallback policy (e.g. collective_control_policy). A state some
+    agents do not know takes the fallback actions of their elevators only. A row of zeros counts as unknown,
+    as it was never updated.
+    Actions of delayed elevators are not replaced with "STANDING", the operators ignore them anyway.
+    """
+
+    def __init__(self, agents: List[QLearningAgent], fallback: Callable[[ElevatorSystem], List[str]]):
+        self.fallback = fallback
+        self.lookup: Dict[Hashable, Tuple[str, ...]] = {}
+        self.partial: Dict[Hashable, Tuple[str | None, ...]] = {}  # states unknown to some of the agents
+        self.misses = 0  # steps decided (at least partly) by the fallback policy
+
+        actions = agents[0].actions
+        n_agents = len(agents)
+        matrices = [_q_matrix(agent.q_table, len(actions)) for agent in agents]
+        states = sorted(set().union(*(agent_states for agent_states, _ in matrices)))
+        rows = {state: row for row, state in enumerate(states)}
+
+        # action of every agent in every state, -1 - unknown
+        codes = np.full((len(states), n_agents), -1, dtype=np.int8)
+        for i, (agent_states, q_values) in enumerate(matrices):
+            if not agent_states:
+                continue
+            known = np.any(q_values != 0, axis=1)
+            agent_rows = np.array([rows[state] for state in agent_states], dtype=np.int64)
+            codes[agent_rows[known], i] = q_values[known].argmax(axis=1)
+
+        # one integer per combination of actions, every combination becomes one shared tuple
+        combination = ((codes.astype(np.int64) + 1) * (len(actions) + 1) ** np.arange(n_agents)).sum(axis=1)
+        unique, inverse = np.unique(combination, return_inverse=True)
+        tuples = []
+        for code in unique.tolist():
+            agent_codes = [(code // (len(actions) + 1) ** i) % (len(actions) + 1) - 1 for i in range(n_agents)]
+            tuples.append(tuple(actions[c] if c >= 0 else None for c in agent_codes))
+
+        for state, combo in zip(states, inverse.tolist()):
+            decided = tuples[combo]
+            if None not in decided:
+                self.lookup[state] = decided
+            elif any(a is not None for a in decided):
+                self.partial[state] = decided
+
+    def __len__(self):
+        return len(self.lookup) + len(self.partial)
+
+    def __call__(self, elevator_system: ElevatorSystem):
+        state = encode_state(elevator_system)
+        actions = self.lookup.get(state)
+        if actions is not None:
+            return actions
+
+        self.misses += 1
+        fallback_actions = self.fallback(elevator_system)
+        decided = self.partial.get(state)
+        if decided is None:
+            return fallback_actions
+        return [a if a is not None else fallback_actions[i] for i, a in enumerate(decided)]
@@ -0,0 +1,111 @@
+import numpy as np
+
+from simulation.schema import ConfigSchema
+
+MAX_BATCHED_FLOOR = 62  # floor bitmaps are int64
+
+
+class BatchedElevatorSystems:
+    """
+    n_envs buildings of the same layout kept in NumPy arrays with the building as the first axis,
+    so one batched_operator call steps all of them. Passengers are not kept as Person records, only what
+    the simulation step needs: the destinations of the people waiting on every floor (a ring buffer
+    in order of arrival) and the number of people in every car bound for every floor.
+
+    Chosen and requested floors are bitmaps, as Elevator.chosen_mask and ElevatorSystem.requested_mask.
+    Directions are -1 (DOWN), 0 (STANDING) and 1 (UP), as in get_system_state.
+    """
+
+    def __init__(self, n_envs, max_floor, max_people_floor, max_people_inside, speed,
+                 time_at_floor=10, acceleration_factor=0.05, max_speed=5):
+        """
+        :param max_people_inside: capacity of every car
+        :param speed: speed of every car
+        The other parameters are the same for every car, with the defaults of Elevator.
+        """
+        if max_floor > MAX_BATCHED_FLOOR:
+            raise ValueError(f"Batched buildings have at most {MAX_BATCHED_FLOOR + 1} floors.")
+        n_cars = len(max_people_inside)
+        n_floors = max_floor + 1
+
+        self.n_envs = n_envs
+        self.max_floor = max_floor
+        self.max_people_floor = max_people_floor
+        self.max_people_inside = np.asarray(max_people_inside, dtype=np.int64)
+        self.speed = np.asarray(speed, dtype=np.float64)
+        self.time_at_floor = time_at_floor
+        self.acc_factor = acceleration_factor
+        self.max_speed = max_speed
+
+        # cars, (n_envs, n_cars)
+        self.current_floor = np.zeros((n_envs, n_cars), dtype=np.int64)
+        self.direction = np.zeros((n_envs, n_cars), dtype=np.int64)
+        self.delay = np.zeros((n_envs, n_cars), dtype=np.int64)
+        self.current_acc = np.zeros((n_envs, n_cars), dtype=np.float64)
+        self.people_inside = np.zeros((n_envs, n_cars), dtype=np.int64)
+        self.chosen_mask = np.zeros((n_envs, n_cars), dtype=np.int64)
+        self.floor_counts = np.zeros((n_envs, n_cars, n_floors), dtype=np.int64)  # people inside bound for a floor
+
+        # floors
+        self.requested_mask = np.zeros(n_envs, dtype=np.int64)
+        self.queue = np.zeros((n_envs, n_floors, max_people_floor), dtype=np.int64)  # destinations of the waiting
+        self.queue_head = np.zeros((n_envs, n_floors), dtype=np.int64)
+        self.queue_len = np.zeros((n_envs, n_floors), dtype=np.int64)
+
+    @classmethod
+    def from_config(cls, config: ConfigSchema, n_envs: int) -> "BatchedElevatorSystems":
+        """n_envs empty buildings as built by SimulationBackendEnum.build_system."""
+        return cls(n_envs, config.floors, config.max_people_floor,
+                   max_people_inside=[elevator.max_people for elevator in config.elevators],
+                   speed=[elevator.speed for elevator in config.elevators])
+
+    @property
+    def n_cars(self):
+        return self.current_floor.shape[1]
+
+    def increase_delay_for_movement(self, moving: np.ndarray):
+        """
+        Elevator.increase_delay_for_movement of the cars where moving is True
+        :param moving: (n_envs, n_cars) bool
+        """
+        d = (self.speed - self.current_acc) / (1 + self.acc_factor)
+        slow = d + self.delay < self.max_speed
+        self.delay += np.where(moving, np.where(slow, self.max_speed, np.rint(d).astype(np.int64)), 0)
+        self.current_acc = np.where(moving & ~slow, self.speed - d, self.current_acc)
+
+    def add_waiting(self, envs: np.ndarray, floors: np.ndarray, desired_floors: np.ndarray):
+        """
+        Puts people at the end of the queues of their floors and requests the floors. The people are sorted
+        by building and floor, and come in order of arrival within a floor.
+        As in insert_person, people who find their floor full (max_people_floor waiting) are dropped.
+        """
+        np.bitwise_or.at(self.requested_mask, envs, np.int64(1) << floors)
+
+        # rank of every person in the group of arrivals to the same queue
+        index = np.arange(len(envs))
+        first = np.ones(len(envs), dtype=bool)
+        first[1:] = (envs[1:] != envs[:-1]) | (floors[1:] != floors[:-1])
+        last = np.ones(len(envs), dtype=bool)
+        last[:-1] = first[1:]
+        rank = index - np.maximum.accumulate(np.where(first, index, 0))
+
+        position = self.queue_len[envs, floors] + rank
+        kept = position < self.max_people_floor
+        slots = (self.queue_head[envs, floors] + position) % self.max_people_floor
+        self.queue[envs[kept], floors[kept], slots[kept]] = desired_floors[kept]
+        self.queue_len[envs[last], floors[last]] = np.minimum(position[last] + 1, self.max_people_floor)
+
+    def pop_waiting(self, envs: np.ndarray, floors: np.ndarray, n: np.ndarray):
+        """
+        Takes up to n[i] people waiting the longest on floors[i] of building envs[i] (one floor per building).
+        :return: number of people taken from every floor and (building, destination) of every person taken
+        """
+        n = np.minimum(n, self.queue_len[envs, floors])
+        offsets = np.arange(self.max_people_floor)
+        taken = offsets < n[:, None]
+        slots = (self.queue_head[envs, floors][:, None] + offsets) % self.max_people_floor
+        destinations = self.queue[envs[:, None], floors[:, None], slots][taken]
+
+        self.queue_head[envs, floors] = (self.queue_head[envs, floors] + n) % self.max_people_floor
+        self.queue_len[envs, floors] -= n
+        return n, np.repeat(envs, n), destinations
@@ -0,0 +1,97 @@
+import numpy as np
+
+from simulation.core.elevator import Elevator
+from simulation.core.elevator_system import ElevatorSystem
+from simulation.core.passenger_table import PassengerTable
+
+
+class ColumnarElevator(Elevator):
+    """
+    Elevator whose passengers live in a PassengerTable. The car only keeps the row ids
+    of the people inside, grouped by their destination floor, Person objects are built on demand.
+    """
+
+    def __init__(self, table: PassengerTable, index, *args, **kwargs):
+        self.table = table
+        self.index = index
+        self._inside = {}  # row ids inside in the order of entering (dict as an ordered set)
+        super().__init__(*args, **kwargs)
+        self.riders = [[] for _ in range(self.max_possible_floor + 1)]  # row ids inside bound for every floor
+
+    @property
+    def passenger_ids(self):
+        return np.fromiter(self._inside, dtype=np.int64, count=len(self._inside))
+
+    @property
+    def people_inside_arr(self):
+        return [self.table.person(pid) for pid in self._inside]
+
+    @people_inside_arr.setter
+    def people_inside_arr(self, value):
+        if len(value):
+            raise AttributeError("Passengers of a columnar elevator are stored in the PassengerTable")
+
+    def enter_ids(self, ids, step):
+        """
+        :param ids: row ids of the people entering, taken from their floor with PassengerTable.pop_waiting
+        :param step: current simulation step
+        :return:
+        """
+        self.table.board(ids, self.index, step)
+        for pid, floor in zip(ids, self.table.desired_floor[ids].tolist()):
+            self._inside[pid] = None
+            self.riders[floor].append(pid)
+            self.add_passenger_floor(floor)
+        self.update_people_inside()
+
+    def leave_at(self, floor, step):
+        """
+        Lets out everybody bound for the floor
+        :param floor: floor index
+        :param step: current simulation step
+        :return:
+        """
+        ids = self.riders[floor]
+        if not ids:
+            return
+        self.riders[floor] = []
+        self.table.alight(ids, step)
+        for pid in ids:
+            del self._inside[pid]
+            self.remove_passenger_floor(floor)
+        self.update_people_inside()
+
+    def update_people_inside(self):
+        self.people_inside_int = len(self._inside)
+
+
+class ColumnarElevatorSystem(ElevatorSystem):
+    """
+    ElevatorSystem backed by a PassengerTable instead of an object array of Person instances.
+    people_array and passengers_at_dest are built lazily, only when somebody asks for them.
+    """
+
+    def __init__(self, max_floor, max_people_per_floor):
+        self.max_floor = max_floor
+        self.max_people_floor = max_people_per_floor
+
+        self.elevators = []
+        self.passengers = PassengerTable(max_floor, max_people_per_floor)
+        self._requested = {}
+        self.requested_mask = 0
+
+    @property
+    def people_array(self):
+        return self.passengers.people_matrix()
+
+    @property
+    def passengers_at_dest(self):
+        return [self.passengers.person(pid) for pid in self.passengers.delivered_ids]
+
+    def add_elevator(self, max_people_inside, **kwargs) -> ColumnarElevator:
+        elevator = ColumnarElevator(self.passengers, len(self.elevators),
+                                    max_people_inside=max_people_inside,
+                                    max_possible_floor=self.max_floor,
+                                    **kwargs)
+        self.elevators.append(elevator)
+        return elevator
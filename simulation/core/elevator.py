@@ -16,7 +16,10 @@ class Elevator:
         self.max_people_inside = max_people_inside
         self.max_possible_floor = max_possible_floor
 
-        self.chosen_floors = []
+        # passengers inside bound for each floor, and the same as a bitmap of floors with at least one
+        self.floor_counts = [0] * (max_possible_floor + 1)
+        self.chosen_mask = 0
+        self._chosen = {}  # chosen floors in the order they were chosen (dict as an ordered set)
 
         self.state = "STANDING"
         self.people_inside_arr = []
@@ -32,40 +35,67 @@ class Elevator:
         self.max_speed = max_speed
         self.current_acc = 0
 
-    def enter(self, people_entering_arr):
+    def enter(self, people_entering_arr, step, elevator_idx=None):
         """
         :param people_entering_arr: list of Person objects
+        :param step: current simulation step
+        :param elevator_idx: index of this elevator in the building, recorded on the people
         :return:
         """
         for person in people_entering_arr:
-            person.enter_elevator()
+            person.enter_elevator(step, elevator_idx)
             self.people_inside_arr.append(person)
+            self.add_passenger_floor(person.desired_floor)
         self.update_people_inside()
 
-    def leave(self, people_leaving_arr):
+    def leave(self, people_leaving_arr, step):
         """
         :param people_leaving_arr: list of Person objects
+        :param step: current simulation step
         :return:
         """
         for person in people_leaving_arr:
-            person.leave_elevator()
+            person.leave_elevator(step)
             self.people_inside_arr.remove(person)
+            self.remove_passenger_floor(person.desired_floor)
         self.update_people_inside()
 
     def update_people_inside(self):
         """
-        Updates the people inside the elevator
+        Updates the number of people inside the elevator (chosen floors are kept up to date by enter and leave)
         :return:
         """
         self.people_inside_int = len(self.people_inside_arr)
-        arr = []
-        for person in self.people_inside_arr:
-            arr.append(person.desired_floor)
-            if person.desired_floor not in self.chosen_floors:
-                self.add_floor_to_chosen_queue(person.desired_floor)
-        for chosen_floor in self.chosen_floors:
-            if chosen_floor not in arr:
-                self.remove_floor_from_chosen(chosen_floor)
+
+    def add_passenger_floor(self, floor):
+        """
+        Counts a passenger bound for the floor, choosing the floor for the first one
+        :param floor: floor index
+        :return:
+        """
+        self.floor_counts[floor] += 1
+        if self.floor_counts[floor] == 1:
+            self.add_floor_to_chosen_queue(floor)
+
+    def remove_passenger_floor(self, floor):
+        """
+        Uncounts a passenger bound for the floor, releasing the floor after the last one
+        :param floor: floor index
+        :return:
+        """
+        self.floor_counts[floor] -= 1
+        if self.floor_counts[floor] == 0:
+            self.remove_floor_from_chosen(floor)
+
+    @property
+    def chosen_floors(self):
+        """
+        :return: list of chosen floors, in the order they were chosen
+        """
+        return list(self._chosen)
+
+    def is_chosen(self, floor):
+        return bool(self.chosen_mask >> floor & 1)
 
     def state_up(self):
         """
@@ -94,7 +124,9 @@ class Elevator:
         :param new_floor: floor index
         :return:
         """
-        self.chosen_floors.append(new_floor)
+        if not self.is_chosen(new_floor):
+            self._chosen[new_floor] = None
+            self.chosen_mask |= 1 << new_floor
 
     def remove_floor_from_chosen(self, floor):
         """
@@ -102,8 +134,9 @@ class Elevator:
         :param floor: floor index
         :return:
         """
-        if floor in self.chosen_floors:
-            self.chosen_floors.remove(floor)
+        if self.is_chosen(floor):
+            del self._chosen[floor]
+            self.chosen_mask &= ~(1 << floor)
 
     def decide_if_stop(self, elevator_system: ElevatorSystem):
         """
@@ -111,9 +144,9 @@ class Elevator:
         :param elevator_system: ElevatorSystem object
         :return: True or False
         """
-        if self.current_floor in elevator_system.requested_floors:
+        if elevator_system.is_requested(self.current_floor):
             return True
-        if self.current_floor in self.chosen_floors:
+        if self.is_chosen(self.current_floor):
             return True
         return None
 
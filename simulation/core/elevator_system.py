@@ -1,4 +1,5 @@
 import numpy as np
+from collections import deque
 
 
 class ElevatorSystem:
@@ -8,8 +9,13 @@ class ElevatorSystem:
 
         self.elevators = []  # list of elevator objects
         self.people_array = np.full((max_floor + 1, self.max_people_floor), None, dtype=object)
+        self.occupied_slots = [0] * (max_floor + 1)  # per floor bitmap of taken slots in people_array
+        # per floor queue of (slot, person) in order of arrival, people are appended as they appear
+        self.waiting_queues = [deque() for _ in range(max_floor + 1)]
         self.passengers_at_dest = []  # list of passengers who got to their destination
-        self.requested_floors = []  # floors requested from outside
+        self.n_people = 0  # people who got a slot so far, the next one gets this id
+        self._requested = {}  # floors requested from outside, in the order of calling (dict as an ordered set)
+        self.requested_mask = 0  # the same floors as a bitmap
 
     def __str__(self):
         info = [f"ElevatorSystem status:", f"Max floor: {self.max_floor}", f"Requested floors: {self.requested_floors}",
@@ -24,10 +30,56 @@ class ElevatorSystem:
                 info.append(f"  Floor {floor}: {len(waiting)} people waiting")
         return "\n".join(info)
 
+    def insert_person(self, person):
+        """
+        Puts a person into the first free slot of their starting floor
+        :param person: Person object
+        :return: slot index or None if the floor is full
+        """
+        floor = person.starting_floor
+        occupied = self.occupied_slots[floor]
+        slot = (~occupied & (occupied + 1)).bit_length() - 1  # lowest free bit
+        if slot >= self.max_people_floor:
+            return None
+        self.occupied_slots[floor] = occupied | (1 << slot)
+        person.id = self.n_people
+        self.n_people += 1
+        self.people_array[floor, slot] = person
+        self.waiting_queues[floor].append((slot, person))
+        return slot
+
+    def pop_waiting(self, floor, n):
+        """
+        Takes up to n people waiting the longest on the floor and frees their slots
+        :param floor: floor index
+        :param n: maximal number of people
+        :return: list of Person objects, from the longest waiting
+        """
+        queue = self.waiting_queues[floor]
+        people = []
+        for _ in range(min(n, len(queue))):
+            slot, person = queue.popleft()
+            self.people_array[floor, slot] = None
+            self.occupied_slots[floor] &= ~(1 << slot)
+            people.append(person)
+        return people
+
+    @property
+    def requested_floors(self):
+        """
+        :return: list of floors requested from outside, in the order of calling
+        """
+        return list(self._requested)
+
+    def is_requested(self, floor):
+        return bool(self.requested_mask >> floor & 1)
+
     def add_floor_to_requested_queue(self, new_floor):
-        if new_floor not in self.requested_floors:
-            self.requested_floors.append(new_floor)
+        if not self.is_requested(new_floor):
+            self._requested[new_floor] = None
+            self.requested_mask |= 1 << new_floor
 
     def remove_floor_from_requested(self, floor):
-        if floor in self.requested_floors:
-            self.requested_floors.remove(floor)
+        if self.is_requested(floor):
+            del self._requested[floor]
+            self.requested_mask &= ~(1 << floor)
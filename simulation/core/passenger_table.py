@@ -0,0 +1,144 @@
+from collections import deque
+
+import numpy as np
+
+from simulation.core.person import Person
+
+# passenger states stored in the "state" column
+WAITING = 0
+IN_ELEVATOR = 1
+AT_DESTINATION = 2
+
+STATE_NAMES = ("WAITING FOR ELEVATOR", "IN ELEVATOR", "AT DESTINATION")
+
+
+class PassengerTable:
+    """
+    Columnar (struct-of-arrays) storage of every passenger of a simulation run.
+
+    A passenger is a row id. As in ElevatorSystem, waiting passengers take a slot of their floor
+    (max_people_floor per floor) and are kept in a queue of (slot, row id) of every floor in order of arrival.
+    Boarding and leaving steps are -1 until the transition happens.
+    """
+    COLUMNS = {
+        "starting_floor": np.int32,
+        "desired_floor": np.int32,
+        "appearing_time": np.int64,
+        "boarding_time": np.int64,
+        "leaving_time": np.int64,
+        "state": np.int8,
+        "elevator": np.int32,
+    }
+
+    def __init__(self, max_floor, max_people_floor, capacity=1024):
+        self.max_floor = max_floor
+        self.max_people_floor = max_people_floor
+
+        self.size = 0
+        self.capacity = capacity
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+        self.occupied_slots = [0] * (max_floor + 1)  # per floor bitmap of taken slots
+        self.waiting_queues = [deque() for _ in range(max_floor + 1)]  # (slot, row id) in order of arrival
+
+        self.delivered_ids = []  # row ids in the order passengers reached their destination
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, step, starting_floor, desired_floor):
+        """
+        Adds a passenger waiting on starting_floor in the first free slot of the floor.
+        :return: row id of the passenger or None if the floor is full
+        """
+        occupied = self.occupied_slots[starting_floor]
+        slot = (~occupied & (occupied + 1)).bit_length() - 1  # lowest free bit
+        if slot >= self.max_people_floor:
+            return None
+
+        if self.size == self.capacity:
+            self._grow()
+        pid = self.size
+        self.size += 1
+
+        self.starting_floor[pid] = starting_floor
+        self.desired_floor[pid] = desired_floor
+        self.appearing_time[pid] = step
+        self.boarding_time[pid] = -1
+        self.leaving_time[pid] = -1
+        self.state[pid] = WAITING
+        self.elevator[pid] = -1
+
+        self.occupied_slots[starting_floor] = occupied | (1 << slot)
+        self.waiting_queues[starting_floor].append((slot, pid))
+        return pid
+
+    def waiting_ids(self, floor_int):
+        """
+        :return: row ids waiting on the floor, from the longest to the shortest waiting
+        """
+        return [pid for _, pid in self.waiting_queues[floor_int]]
+
+    def count_waiting(self, floor_int=None):
+        if floor_int is None:
+            return sum(len(queue) for queue in self.waiting_queues)
+        return len(self.waiting_queues[floor_int])
+
+    def pop_waiting(self, floor_int, n):
+        """
+        Takes up to n passengers waiting the longest on the floor and frees their slots, as ElevatorSystem.pop_waiting
+        :return: list of row ids, from the longest waiting
+        """
+        queue = self.waiting_queues[floor_int]
+        ids = []
+        for _ in range(min(n, len(queue))):
+            slot, pid = queue.popleft()
+            self.occupied_slots[floor_int] &= ~(1 << slot)
+            ids.append(pid)
+        return ids
+
+    def board(self, ids, elevator_idx, step):
+        """
+        Marks passengers taken from their floor (see pop_waiting) as riding the elevator with index elevator_idx.
+        """
+        self.state[ids] = IN_ELEVATOR
+        self.elevator[ids] = elevator_idx
+        self.boarding_time[ids] = step
+
+    def alight(self, ids, step):
+        self.state[ids] = AT_DESTINATION
+        self.leaving_time[ids] = step
+        self.delivered_ids.extend(ids)
+
+    def person(self, pid) -> Person:
+        """
+        Builds a Person snapshot of the row. Changes to the returned object are not written back.
+        """
+        person = Person(step=int(self.appearing_time[pid]),
+                        desired_floor=int(self.desired_floor[pid]),
+                        starting_floor=int(self.starting_floor[pid]))
+        person.id = int(pid)
+        if self.elevator[pid] >= 0:
+            person.elevator = int(self.elevator[pid])
+        if self.boarding_time[pid] >= 0:
+            person.boarding_time = int(self.boarding_time[pid])
+        if self.leaving_time[pid] >= 0:
+            person.leaving_time = int(self.leaving_time[pid])
+        person.state = STATE_NAMES[self.state[pid]]
+        return person
+
+    def people_matrix(self):
+        """
+        :return: object array in the layout of ElevatorSystem.people_array
+        """
+        matrix = np.full((self.max_floor + 1, self.max_people_floor), None, dtype=object)
+        for floor_int, queue in enumerate(self.waiting_queues):
+            for slot, pid in queue:
+                matrix[floor_int, slot] = self.person(pid)
+        return matrix
@@ -3,33 +3,66 @@ class Person:
         self.starting_floor = starting_floor
         self.desired_floor = desired_floor
         self.appearing_time = step
+        self.id = None  # order of appearance in the building, set when the person gets a slot on a floor
+        self.elevator = None  # index of the elevator the person rides in
 
-        self.journey_time = 0
-        self.waiting_time = 0
-        self.travel_time = 0
+        # steps of the state transitions, None until they happen
+        self.boarding_time = None
+        self.leaving_time = None
 
         self.state = "WAITING FOR ELEVATOR"  # POSSIBLE STATES ["WAITING FOR ELEVATOR", "IN ELEVATOR", "AT DESTINATION"]
 
     def __str__(self):
         return f"{self.journey_time, self.waiting_time, self.travel_time}"
 
-    def increase_waiting_time(self, step=1):
+    def __setstate__(self, state):
         """
-        Increase time of a person waiting
-        :param step: How many steps
-        :return:
+        Converts persons pickled with per-step counters into the timestamp representation.
         """
-        match self.state:
-            case "WAITING FOR ELEVATOR":
-                self.journey_time += step
-                self.waiting_time += step
-            case "IN ELEVATOR":
-                self.journey_time += step
-                self.travel_time += step
+        if "boarding_time" not in state:
+            waiting_time = state.pop("waiting_time", 0)
+            travel_time = state.pop("travel_time", 0)
+            state.pop("journey_time", None)
+            boarded = state.get("state") != "WAITING FOR ELEVATOR"
+            left = state.get("state") == "AT DESTINATION"
+            state["boarding_time"] = state["appearing_time"] + waiting_time if boarded else None
+            state["leaving_time"] = state["boarding_time"] + travel_time if left else None
+        state.setdefault("id", None)
+        state.setdefault("elevator", None)
+        self.__dict__.update(state)
 
+    @property
+    def waiting_time(self):
+        """
+        Steps spent waiting for the elevator (None while still waiting)
+        """
+        if self.boarding_time is None:
+            return None
+        return self.boarding_time - self.appearing_time
+
+    @property
+    def travel_time(self):
+        """
+        Steps spent inside the elevator (None until the person leaves it)
+        """
+        if self.leaving_time is None:
+            return None
+        return self.leaving_time - self.boarding_time
+
+    @property
+    def journey_time(self):
+        """
+        Steps from appearing on the floor to reaching the destination (None until then)
+        """
+        if self.leaving_time is None:
+            return None
+        return self.leaving_time - self.appearing_time
 
-    def enter_elevator(self):
+    def enter_elevator(self, step, elevator=None):
         self.state = "IN ELEVATOR"
+        self.boarding_time = step
+        self.elevator = elevator
 
-    def leave_elevator(self):
+    def leave_elevator(self, step):
         self.state = "AT DESTINATION"
+        self.leaving_time = step
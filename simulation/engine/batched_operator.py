@@ -0,0 +1,108 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from simulation.core.batched_system import BatchedElevatorSystems
+from simulation.engine.presampled_traffic import PresampledTraffic
+from simulation.enums import TrafficGeneratorEnum
+from simulation.schema import ConfigSchema
+
+
+class BatchedTraffic:
+    """
+    Arrival processes of the buildings of a batch, drawn at once with PresampledTraffic.sample
+    (the distributions of the per-step generators, scenario files are replayed as they are).
+    Called with a step, it returns the arrivals of every building in that step.
+    """
+
+    def __init__(self, configs: List[ConfigSchema], n_steps: int):
+        """
+        :param configs: config of every building (e.g. with its own traffic seed)
+        :param n_steps: horizon of the arrival processes
+        """
+        scenarios = {}  # a scenario file is read once for all the buildings replaying it
+        arrivals = []
+        for config in configs:
+            traffic = config.traffic
+            if traffic.generator_type != TrafficGeneratorEnum.FROM_FILE:
+                arrivals.append(PresampledTraffic.sample(config, n_steps).arrays())
+                continue
+            if traffic.from_file_params.filename not in scenarios:
+                scenarios[traffic.from_file_params.filename] = PresampledTraffic.sample(config, n_steps).arrays()
+            arrivals.append(scenarios[traffic.from_file_params.filename])
+        steps = np.concatenate([a[0] for a in arrivals])
+        envs = np.repeat(np.arange(len(configs)), [len(a[0]) for a in arrivals])
+        starting_floors = np.concatenate([a[1] for a in arrivals])
+        # sorted by (step, building, floor) as add_waiting takes them, stable: people of one floor
+        # keep their order of arrival
+        order = np.lexsort((starting_floors, envs, steps))
+
+        self.envs = envs[order]
+        self.starting_floors = starting_floors[order]
+        self.desired_floors = np.concatenate([a[2] for a in arrivals])[order]
+        self.bounds = np.searchsorted(steps[order], np.arange(n_steps + 1)).tolist()
+
+    def __call__(self, step: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: building, starting floor and desired floor of every passenger appearing in the step,
+                 sorted by building and starting floor
+        """
+        lo, hi = self.bounds[step], self.bounds[step + 1]
+        return self.envs[lo:hi], self.starting_floors[lo:hi], self.desired_floors[lo:hi]
+
+
+def batched_operator(moves: np.ndarray, systems: BatchedElevatorSystems, step: int,
+                     traffic: BatchedTraffic) -> BatchedElevatorSystems:
+    """
+    Same simulation step as step_operator.operator, for every building of the batch at once.
+    :param moves: (n_envs, n_cars) action of every car: 1 (UP), -1 (DOWN), 0 (STANDING),
+                  ignored for delayed cars
+    :param step: current simulation step
+    :param traffic: arrivals of the buildings
+    """
+    s = systems
+
+    # --- taking an action ---
+    idle = s.delay == 0
+    up, down = idle & (moves == 1), idle & (moves == -1)
+    s.current_acc[(up & (s.direction != 1)) | (down & (s.direction != -1))] = 0
+    s.direction = np.where(idle, moves, s.direction)
+    s.current_floor = np.maximum(np.minimum(s.current_floor + up, s.max_floor) - down, 0)
+    s.increase_delay_for_movement(up | down)
+
+    # --- check doors and serve passengers ---
+    # car after car, as in operator: a car sees the requests and queues the previous ones left
+    stopping = (s.direction == 0) & (s.delay == 0)
+    for car in np.flatnonzero(stopping.any(axis=0)):
+        floors = s.current_floor[:, car]
+        stops = stopping[:, car] & ((s.requested_mask | s.chosen_mask[:, car]) >> floors & 1).astype(bool)
+        if not stops.any():
+            continue
+        envs = np.flatnonzero(stops)
+        floors = floors[envs]
+        bits = np.int64(1) << floors
+
+        # passengers leaving
+        s.people_inside[envs, car] -= s.floor_counts[envs, car, floors]
+        s.floor_counts[envs, car, floors] = 0
+        s.chosen_mask[envs, car] &= ~bits
+
+        # passengers getting in
+        entered, people_envs, destinations = s.pop_waiting(envs, floors,
+                                                           s.max_people_inside[car] - s.people_inside[envs, car])
+        np.add.at(s.floor_counts[:, car], (people_envs, destinations), 1)
+        np.bitwise_or.at(s.chosen_mask[:, car], people_envs, np.int64(1) << destinations)
+        s.people_inside[envs, car] += entered
+        s.requested_mask[envs] &= ~np.where(entered > 0, bits, 0)
+
+        s.delay[envs, car] += s.time_at_floor
+
+    # --- serve passengers spawning ---
+    envs, starting_floors, desired_floors = traffic(step)
+    if len(envs):
+        s.add_waiting(envs, starting_floors, desired_floors)
+
+    # --- decrease delay ---
+    s.delay -= s.delay > 0
+
+    return s
@@ -0,0 +1,53 @@
+from simulation.core.columnar_system import ColumnarElevator, ColumnarElevatorSystem
+from simulation.engine.step_operator import apply_actions_to_elevators
+from simulation.engine.traffic_generator import generate_passengers
+
+
+def columnar_visiting_floor(floor_int, elevator: ColumnarElevator, elevator_system: ColumnarElevatorSystem,
+                            step: int):
+    """
+    Execute actions when stopping at a floor, on the PassengerTable
+    :param floor_int: Current floor
+    :param elevator: ColumnarElevator class object
+    :param elevator_system: ColumnarElevatorSystem class object
+    :param step: Current simulation step
+    :return:
+    """
+    # --- PASSENGERS LEAVING ---
+    elevator.leave_at(floor_int, step)
+
+    # --- PASSENGERS GETTING IN ---
+    entering = elevator_system.passengers.pop_waiting(floor_int, elevator.how_much_space_left())
+
+    if entering:
+        elevator_system.remove_floor_from_requested(floor_int)
+        elevator.enter_ids(entering, step)
+
+    elevator.delay += elevator.time_at_floor
+
+
+def columnar_operator(actions, elevator_system: ColumnarElevatorSystem, step: int,
+                      generate=generate_passengers) -> ColumnarElevatorSystem:
+    """
+    Same simulation step as step_operator.operator, with passengers kept as rows of a PassengerTable.
+    """
+    # --- taking an action ---
+    apply_actions_to_elevators(elevator_system.elevators, actions)
+
+    # --- check doors and serve passengers ---
+    for lift in elevator_system.elevators:
+        if lift.state == "STANDING" and lift.delay == 0:
+            if lift.decide_if_stop(elevator_system):
+                columnar_visiting_floor(lift.current_floor, lift, elevator_system, step)
+
+    # --- serve passengers spawning ---
+    new_floors_arr = generate(elevator_system, step)
+    for new_floor in new_floors_arr:
+        elevator_system.add_floor_to_requested_queue(new_floor)
+
+    # --- decrease delay ---
+    for lift in elevator_system.elevators:
+        if lift.delay > 0:
+            lift.delay -= 1
+
+    return elevator_system
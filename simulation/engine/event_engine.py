@@ -0,0 +1,61 @@
+import heapq
+
+from simulation.core.elevator_system import ElevatorSystem
+from simulation.engine.step_operator import operator
+from simulation.engine.presampled_traffic import PresampledTraffic
+from simulation.schema import ConfigSchema
+
+
+def _snapshot(elevator_system: ElevatorSystem):
+    cars = [(e.current_floor, e.state, e.people_inside_int, e.chosen_mask)
+            for e in elevator_system.elevators]
+    return cars, elevator_system.requested_mask
+
+
+def run_event_driven(steps: int, system: ElevatorSystem, policy, step_operator=operator,
+                     config: ConfigSchema = None) -> ElevatorSystem:
+    """
+    Next-event time advance version of the tick loop
+    for step in range(steps): system = step_operator(policy(system), system, step)
+
+    Passenger arrivals are sampled up front (PresampledTraffic) and kept, together with the steps at which delayed
+    elevators become ready, in a priority queue. After a quiet step (no arrivals, no elevator moved,
+    stopped or changed its passengers) nothing can happen before the next event, so the engine
+    jumps straight to it and only counts the skipped steps off the delays.
+
+    The policy must depend only on the building state (as the classical policies and agents
+    with epsilon 0 do), the results are then the same as for the tick loop with the same seed.
+    """
+    traffic = PresampledTraffic.for_config(config, steps)
+
+    events = list(traffic.arrival_steps)
+    heapq.heapify(events)
+
+    step = 0
+    while step < steps:
+        delays_before = [e.delay for e in system.elevators]
+        snapshot_before = _snapshot(system)
+
+        system = step_operator(policy(system), system, step, generate=traffic)
+
+        for elevator, delay_before in zip(system.elevators, delays_before):
+            if elevator.delay > 0 or delay_before > 0:
+                heapq.heappush(events, step + 1 + elevator.delay)  # step at which the elevator is ready
+        while events and events[0] <= step:
+            heapq.heappop(events)
+
+        quiet = (not traffic.has_arrivals(step)
+                 and _snapshot(system) == snapshot_before
+                 and all(e.delay == max(d - 1, 0) for e, d in zip(system.elevators, delays_before)))
+        if not quiet:
+            step += 1
+            continue
+
+        next_step = min(events[0], steps) if events else steps
+        skipped = next_step - step - 1
+        for elevator in system.elevators:
+            if elevator.delay > 0:
+                elevator.delay -= skipped
+        step = next_step
+
+    return system
@@ -0,0 +1,150 @@
+from functools import lru_cache, partial
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from simulation.core.elevator_system import ElevatorSystem
+from simulation.engine.traffic_generator import (CONFIG, generate_passengers, normalize_distribution,
+                                                 presample_arrivals, spawn_passenger)
+from simulation.enums import TrafficGeneratorEnum
+from simulation.schema import ConfigSchema
+
+
+@lru_cache(maxsize=None)
+def cumulative_distribution(dist: Tuple[float, ...], expected_len: int, name: str) -> np.ndarray:
+    """Normalized cumulative floor distribution, computed once per distinct distribution."""
+    return np.cumsum(normalize_distribution(list(dist), expected_len, name))
+
+
+def sample_floors(rng: np.random.Generator, n: int, dist: Optional[List[float]], max_floor: int,
+                  name: str) -> np.ndarray:
+    """Draws n floors from the distribution (uniform if None)."""
+    if dist is None:
+        return rng.integers(0, max_floor + 1, n)
+    cdf = cumulative_distribution(tuple(dist), max_floor + 1, name)
+    return np.minimum(np.searchsorted(cdf, rng.random(n), side="right"), max_floor)
+
+
+class PresampledTraffic:
+    """
+    Arrival process of a whole horizon kept in three arrays sorted by step.
+    Called like generate_passengers, it spawns the passengers of the given step.
+    """
+
+    def __init__(self, steps: np.ndarray, starting_floors: np.ndarray, desired_floors: np.ndarray):
+        self.starting_floors = starting_floors.tolist()
+        self.desired_floors = desired_floors.tolist()
+
+        arrival_steps, first = np.unique(steps, return_index=True)
+        last = np.append(first[1:], len(steps))
+        self.arrival_steps = arrival_steps.tolist()
+        self.index = dict(zip(self.arrival_steps, zip(first.tolist(), last.tolist())))
+
+    def __len__(self):
+        return len(self.starting_floors)
+
+    def __call__(self, elevator_system: ElevatorSystem, step: int):
+        new_floors_arr = []
+        if step not in self.index:
+            return new_floors_arr
+
+        lo, hi = self.index[step]
+        for starting_floor, desired_floor in zip(self.starting_floors[lo:hi], self.desired_floors[lo:hi]):
+            if starting_floor not in new_floors_arr:
+                new_floors_arr.append(starting_floor)
+            spawn_passenger(elevator_system, step, starting_floor, desired_floor)
+        return new_floors_arr
+
+    def has_arrivals(self, step: int) -> bool:
+        return step in self.index
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: step, starting floor and desired floor of every passenger, sorted by step
+        """
+        counts = [hi - lo for lo, hi in self.index.values()]
+        return (np.repeat(np.array(self.arrival_steps, dtype=np.int64), counts),
+                np.array(self.starting_floors, dtype=np.int64), np.array(self.desired_floors, dtype=np.int64))
+
+    @classmethod
+    def for_config(cls, config: ConfigSchema, n_steps: int) -> "PresampledTraffic":
+        """
+        Vectorized sample if config.traffic.vectorized, otherwise the per-step generators' stream
+        (the same arrivals as in the tick loop).
+        """
+        if config is None:
+            config = CONFIG
+        if config.traffic.vectorized:
+            return cls.sample(config, n_steps)
+        return cls.from_generator(config, n_steps)
+
+    @classmethod
+    def from_generator(cls, config: ConfigSchema, n_steps: int) -> "PresampledTraffic":
+        arrivals = presample_arrivals(n_steps, config)
+        steps = [step for step, pairs in arrivals.items() for _ in pairs]
+        pairs = [pair for step_pairs in arrivals.values() for pair in step_pairs]
+        floors = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        return cls(np.array(steps, dtype=np.int64), floors[:, 0], floors[:, 1])
+
+    @classmethod
+    def sample(cls, config: ConfigSchema, n_steps: int, seed: int | None = None) -> "PresampledTraffic":
+        """
+        Draws the arrival process of n_steps at once with a numpy Generator, with the same distributions
+        as the per-step generators: passengers appear in a step with probability equal to the intensity,
+        their number is a rounded exponential variable with mean equal to the intensity (at least 1).
+        """
+        traffic = config.traffic
+        max_floor = config.floors
+        rng = np.random.default_rng(traffic.seed if seed is None else seed)
+
+        empty = np.empty(0, dtype=np.int64)
+        if traffic.intensity <= 0 or n_steps <= 0:
+            return cls(empty, empty, empty)
+
+        active_steps = np.flatnonzero(rng.random(n_steps) < traffic.intensity)
+        amounts = np.maximum(1, np.rint(rng.exponential(traffic.intensity, active_steps.size))).astype(np.int64)
+        steps = np.repeat(active_steps, amounts)
+        n = steps.size
+
+        match traffic.generator_type:
+            case TrafficGeneratorEnum.UP_PEAK if traffic.up_peak_params is not None:
+                params = traffic.up_peak_params
+                starting_floors = np.full(n, params.arrival_floor)
+                desired_floors = sample_floors(rng, n, params.destination_distribution, max_floor,
+                                               "destination_distribution")
+            case TrafficGeneratorEnum.DOWN_PEAK if traffic.down_peak_params is not None:
+                params = traffic.down_peak_params
+                starting_floors = sample_floors(rng, n, params.origin_distribution, max_floor,
+                                                "origin_distribution")
+                desired_floors = np.full(n, params.destination_floor)
+            case TrafficGeneratorEnum.MIXED_PEAK if traffic.mixed_peak_params is not None:
+                params = traffic.mixed_peak_params
+                ratios = np.cumsum([params.up_peak_ratio, params.down_peak_ratio, params.interfloor_ratio])
+                categories = np.minimum(np.searchsorted(ratios / ratios[-1], rng.random(n), side="right"), 2)
+                up, down, inter = (categories == 0), (categories == 1), (categories == 2)
+
+                starting_floors = np.empty(n, dtype=np.int64)
+                desired_floors = np.empty(n, dtype=np.int64)
+                starting_floors[up] = params.arrival_floor
+                desired_floors[up] = rng.integers(params.arrival_floor + 1, max_floor + 1, up.sum())
+                starting_floors[down] = rng.integers(1, max_floor + 1, down.sum())
+                desired_floors[down] = params.destination_floor
+                starting_floors[inter] = rng.integers(0, max_floor + 1, inter.sum())
+                desired_floors[inter] = rng.integers(0, max_floor + 1, inter.sum())
+            case TrafficGeneratorEnum.FROM_FILE:
+                return cls.from_generator(config, n_steps)
+            case _:
+                return cls(empty, empty, empty)
+
+        keep = starting_floors != desired_floors
+        return cls(steps[keep], starting_floors[keep], desired_floors[keep])
+
+
+def make_generator(config: ConfigSchema, n_steps: int):
+    """
+    :return: passenger generator for operator(): presampled arrays if config.traffic.vectorized,
+             the per-step generators otherwise
+    """
+    if config.traffic.vectorized:
+        return PresampledTraffic.sample(config, n_steps)
+    return partial(generate_passengers, config=config)
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+
+from simulation.core.elevator_system import ElevatorSystem
+from simulation.schema import ConfigSchema
+from simulation.enums import EngineModeEnum
+from simulation.engine.event_engine import run_event_driven
+from simulation.engine.presampled_traffic import make_generator
+from simulation.analysis.result_analyse import summarize_simulation, aggregate_results
+from simulation.analysis.schema import Results, AggregatedResults
+
+
+def simulate(config: ConfigSchema) -> ElevatorSystem:
+    """
+    Runs one headless simulation described by the config, without logging and visualisation.
+    """
+    policy = config.algorithm.get_controller(model=config.model)
+    system = config.backend.build_system(config)
+    step_operator = config.backend.get_operator()
+
+    if config.engine is EngineModeEnum.EVENT:
+        return run_event_driven(config.steps, system, policy, step_operator=step_operator, config=config)
+
+    generate = make_generator(config, config.steps)
+    for step in range(config.steps):
+        system = step_operator(policy(system), system, step, generate=generate)
+    return system
+
+
+def replication_seeds(n: int, base_seed: int | None = None) -> List[int]:
+    """
+    Independent traffic seeds for n replications. Consecutive seeds would share most of their
+    traffic (the generator reseeds with seed + step), so they are spawned from a SeedSequence.
+    """
+    return [int(seq.generate_state(1)[0]) for seq in np.random.SeedSequence(base_seed).spawn(n)]
+
+
+def run_replication(config: ConfigSchema, seed: int) -> Results:
+    config = config.model_copy(deep=True)
+    config.traffic.seed = seed
+    return summarize_simulation(simulate(config), verbose=False)
+
+
+def run_replications(config: ConfigSchema, n: int, workers: int | None = None,
+                     base_seed: int | None = None, confidence: float = 0.95) -> AggregatedResults:
+    """
+    Runs n independently seeded replications of the config in a process pool.
+    :param config: ConfigSchema of the simulation
+    :param n: number of replications
+    :param workers: number of worker processes (default: number of CPUs)
+    :param base_seed: seed the replication seeds are derived from (default: config.traffic.seed)
+    :param confidence: confidence level of the intervals
+    :return: AggregatedResults with every replication and confidence intervals of the metrics
+    """
+    if base_seed is None:
+        base_seed = config.traffic.seed
+    seeds = replication_seeds(n, base_seed)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_replication, [config] * n, seeds))
+
+    return aggregate_results(results, seeds, confidence)
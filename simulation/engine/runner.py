@@ -1,12 +1,15 @@
 from simulation import config
 
 from simulation.core.elevator_system import ElevatorSystem
-from simulation.core.elevator import Elevator
 
 from simulation.engine.step_operator import operator
+from simulation.engine.event_engine import run_event_driven
+from simulation.engine.traffic_generator import generate_passengers
+from simulation.engine.presampled_traffic import make_generator
 from simulation.analysis.logger import SimulationLogger
 
 from simulation.visualisation.renderer import Renderer
+from simulation.enums import EngineModeEnum
 
 from simulation.training.scripts.utils import *
 
@@ -15,12 +18,8 @@ from simulation.training.scripts.utils import *
 # ALGORITHM = agent.use_agent
 
 
-cfg = config.load_config()
-
-ALGORITHM = cfg.algorithm.get_controller(model=cfg.model)
-
-
-def run_simulation(steps: int, system: ElevatorSystem, policy, visualisation, renderer):
+def run_simulation(steps: int, system: ElevatorSystem, policy, visualisation, renderer, step_operator=operator,
+                   generate=generate_passengers):
     screen = None
     clock = None
     pygame = None
@@ -35,46 +34,66 @@ def run_simulation(steps: int, system: ElevatorSystem, policy, visualisation, re
     running = True
     step_count = 0
     logger = SimulationLogger()
-
-    while running and step_count < steps:
-        # --- Event Handling ---
-        if visualisation:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-        # --- Simulation Step ---
-        previous_state = get_state(system)
-
-        actions = policy(system)
-        system = operator(actions, system, step_count)
-
-        current_state = get_state(system)
-
-        reward = reward_function(decode_state(previous_state, system), decode_state(current_state, system), actions)
-
-        # print(reward)
-
-        # --- Drawing only in visualisation mode ---
+    tracer = logger.start_trace(system)
+    trips = logger.start_trips()
+    step_reward = IncrementalReward()
+    step_reward.reset(system)
+
+    try:
+        while running and step_count < steps:
+            # --- Event Handling ---
+            if visualisation:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+
+            # --- Simulation Step ---
+            actions = policy(system)
+            system = step_operator(actions, system, step_count, generate=generate)
+
+            reward = step_reward(system)
+            trips.collect(system)
+            if tracer is not None:
+                tracer.record(step_count, system, actions)
+
+            # print(reward)
+
+            # --- Drawing only in visualisation mode ---
+            if visualisation:
+                screen.fill(renderer.BLACK)
+                renderer.draw(screen, system)
+                pygame.display.flip()
+                clock.tick(15)
+
+            step_count += 1
+    except BaseException:
+        # the run is not saved, but the trip records still get their Parquet footer
+        trips.close()
+        raise
+    finally:
         if visualisation:
-            screen.fill(renderer.BLACK)
-            renderer.draw(screen, system)
-            pygame.display.flip()
-            clock.tick(15)
-
-        step_count += 1
-
-    if visualisation:
-        pygame.quit()
+            pygame.quit()
+        logger.close_trace()
 
-    logger.save_system_state(system)
+    logger.save_run(system, steps=step_count)
 
     return system
 
 
-building = ElevatorSystem(cfg.floors, cfg.max_people_floor)
-building.elevators = [Elevator(max_people_inside=elevator.max_people,
-                               max_possible_floor=cfg.floors,
-                               speed=elevator.speed) for elevator in cfg.elevators]
-renderer_obj = Renderer(cfg.floors)
-print(run_simulation(cfg.steps, building, ALGORITHM, cfg.visualisation, renderer_obj))
+if __name__ == "__main__":
+    cfg = config.load_config()
+    ALGORITHM = cfg.algorithm.get_controller(model=cfg.model)
+
+    building = cfg.backend.build_system(cfg)
+    if cfg.engine is EngineModeEnum.EVENT and not cfg.visualisation:
+        if cfg.trace is not None:
+            print("[LOG] Per-step traces are written by the tick engine only, the event-driven run is not traced")
+        building = run_event_driven(cfg.steps, building, ALGORITHM,
+                                    step_operator=cfg.backend.get_operator(), config=cfg)
+        SimulationLogger().save_run(building, steps=cfg.steps)
+        print(building)
+    else:
+        renderer_obj = Renderer(cfg.floors)
+        print(run_simulation(cfg.steps, building, ALGORITHM, cfg.visualisation, renderer_obj,
+                             step_operator=cfg.backend.get_operator(),
+                             generate=make_generator(cfg, cfg.steps)))
@@ -0,0 +1,151 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from pathlib import Path
+from typing import Dict, List
+import hashlib
+import os
+
+import numpy as np
+
+import pandas as pd
+
+from simulation.schema import ConfigSchema, ElevatorConfigSchema, SweepSchema
+from simulation.enums import AlgorithmEnum, TrafficGeneratorEnum, UpPeakParams, DownPeakParams, MixedPeakParams
+from simulation.engine.replications import replication_seeds, run_replication
+from simulation.analysis.schema import Results
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+SWEEP_DIR = REPO_DIR / "database" / "sweeps"
+
+PARAMETERS = ("n_elevators", "speed", "max_people", "intensity", "generator_type", "algorithm")
+
+DEFAULT_GENERATOR_PARAMS = {
+    TrafficGeneratorEnum.UP_PEAK: ("up_peak_params", UpPeakParams),
+    TrafficGeneratorEnum.DOWN_PEAK: ("down_peak_params", DownPeakParams),
+    TrafficGeneratorEnum.MIXED_PEAK: ("mixed_peak_params", MixedPeakParams),
+}
+
+
+def base_parameters(base: ConfigSchema) -> Dict:
+    template = base.elevators[0]
+    return {
+        "n_elevators": len(base.elevators),
+        "speed": template.speed,
+        "max_people": template.max_people,
+        "intensity": base.traffic.intensity,
+        "generator_type": base.traffic.generator_type.value,
+        "algorithm": base.algorithm.value,
+    }
+
+
+def expand_jobs(base: ConfigSchema, sweep: SweepSchema) -> List[Dict]:
+    """
+    :return: list of parameter dicts, one per combination of the grid values
+    :raises ValueError: when a job would use a traffic generator without an implementation
+    """
+    defaults = base_parameters(base)
+    if sweep.generator_type is None and not base.traffic.generator_type.has_generator:
+        raise ValueError(f"Traffic generator without an implementation: {base.traffic.generator_type.value}")
+    grids = []
+    for name in PARAMETERS:
+        values = getattr(sweep, name)
+        if values is None:
+            grids.append([defaults[name]])
+        else:
+            grids.append([v.value if isinstance(v, (TrafficGeneratorEnum, AlgorithmEnum)) else v for v in values])
+    return [dict(zip(PARAMETERS, combination)) for combination in product(*grids)]
+
+
+def job_config(base: ConfigSchema, params: Dict) -> ConfigSchema:
+    """
+    Config of a single job. Its elevators are copies of the first base elevator with speed and capacity from params.
+    """
+    config = base.model_copy(deep=True)
+    config.visualisation = False
+    config.elevators = [ElevatorConfigSchema(max_people=params["max_people"],
+                                             speed=params["speed"],
+                                             starting_floor=base.elevators[0].starting_floor)
+                        for _ in range(params["n_elevators"])]
+    config.algorithm = AlgorithmEnum(params["algorithm"])
+
+    generator_type = TrafficGeneratorEnum(params["generator_type"])
+    config.traffic.generator_type = generator_type
+    config.traffic.intensity = params["intensity"]
+    if generator_type in DEFAULT_GENERATOR_PARAMS:
+        field, params_cls = DEFAULT_GENERATOR_PARAMS[generator_type]
+        if getattr(config.traffic, field) is None:
+            setattr(config.traffic, field, params_cls())
+    return config
+
+
+def base_hash(base: ConfigSchema) -> str:
+    """Hash of the base config: rows of a sweep table are resumed only for the same base."""
+    return hashlib.sha1(base.model_dump_json().encode()).hexdigest()[:16]
+
+
+def _base_seed(base: ConfigSchema, rows: List[Dict], config_hash: str) -> int:
+    """
+    Seed the replication seeds are derived from: the seed of the base traffic or, for unseeded traffic,
+    the seed stored with the earlier rows of the same base (a new one on the first run).
+    """
+    if base.traffic.seed is not None:
+        return base.traffic.seed
+    for row in rows:
+        if row.get("base_hash") == config_hash:
+            return int(row["base_seed"])
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def _run_job(config: ConfigSchema, params: Dict, seed: int, base_info: Dict) -> Dict:
+    results: Results = run_replication(config, seed)
+    return {**params, "seed": seed, **base_info, **results.model_dump()}
+
+
+def _write_table(rows: List[Dict], path: Path):
+    tmp_path = path.with_suffix(".tmp")
+    pd.DataFrame(rows).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def run_sweep(base: ConfigSchema, sweep: SweepSchema, name: str, workers: int | None = None) -> pd.DataFrame:
+    """
+    Runs every combination of the sweep grid (times sweep.replications seeds) in a process pool.
+    Results are kept in one table database/sweeps/{name}.parquet, one row per job and seed,
+    rewritten after every finished job. Jobs already present in the table for the same base config are
+    skipped, so an interrupted sweep continues where it stopped. Every row keeps the hash of its base config
+    (base_hash) and the seed its replication seeds come from (base_seed), so an unseeded base reuses the
+    seeds of its earlier rows.
+    :param base: config the grid values are applied to
+    :param sweep: SweepSchema with the grid
+    :param name: name of the results table
+    :param workers: number of worker processes (default: number of CPUs)
+    :return: the results table
+    """
+    os.makedirs(SWEEP_DIR, exist_ok=True)
+    path = SWEEP_DIR / f"{name}.parquet"
+
+    rows = pd.read_parquet(path).to_dict("records") if path.exists() else []
+    config_hash = base_hash(base)
+    base_info = {"base_hash": config_hash, "base_seed": _base_seed(base, rows, config_hash)}
+    done = {tuple(row[k] for k in PARAMETERS + ("seed",)) for row in rows if row.get("base_hash") == config_hash}
+    if len(done) < len(rows):
+        print(f"[SWEEP] {len(rows) - len(done)} rows of the table come from another base config (see base_hash)")
+
+    # the same seeds for every job, so jobs are compared on the same traffic
+    seeds = replication_seeds(sweep.replications, base_info["base_seed"])
+    jobs = [(params, seed) for params in expand_jobs(base, sweep) for seed in seeds
+            if tuple(params.values()) + (seed,) not in done]
+    print(f"[SWEEP] {len(jobs)} jobs to run, {len(done)} already done")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_job, job_config(base, params), params, seed, base_info): (params, seed)
+                   for params, seed in jobs}
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                print(f"[SWEEP] Job {futures[future]} failed: {e}")
+                continue
+            _write_table(rows, path)
+
+    return pd.DataFrame(rows)
@@ -1,12 +1,14 @@
 import random
-import copy
 import csv
 from pathlib import Path
 import os
 from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
 from simulation.core.person import Person
 from simulation.core.elevator_system import ElevatorSystem
+from simulation.core.columnar_system import ColumnarElevatorSystem
 from simulation.config import load_config
 from simulation.schema import ConfigSchema
 from simulation.enums import TrafficGeneratorEnum
@@ -16,14 +18,21 @@ CONFIG: ConfigSchema = load_config()
 REPO_DIR = Path(__file__).resolve().parents[2]
 SCENARIO_DIR = REPO_DIR / "database" / "scenarios"
 
-if CONFIG.traffic.generator_type is TrafficGeneratorEnum('from file'):
-    filename = CONFIG.traffic.from_file_params.filename
+# Traffic has its own random stream, so other users of the random module (e.g. agents exploring)
+# don't shift it.
+RNG = random.Random()
+
+
+@lru_cache(maxsize=None)
+def load_scenario(filename: str) -> Dict[int, List[dict]]:
+    """Reads a scenario file from SCENARIO_DIR into a dict step -> rows."""
     scenario_by_step = defaultdict(list)
     with open(os.path.join(SCENARIO_DIR, filename), 'r') as file:
         reader = csv.DictReader(file)
         for row in reader:
             s = int(row['step'])
             scenario_by_step[s].append(row)
+    return scenario_by_step
 
 
 # ------------------ helper functions ------------------
@@ -31,19 +40,19 @@ if CONFIG.traffic.generator_type is TrafficGeneratorEnum('from file'):
 def should_generate_passengers(config: ConfigSchema, step: int) -> bool:
     """Decides whether to generate passengers in this simulation step."""
     if config.traffic.seed is not None:
-        random.seed(config.traffic.seed + step)
+        RNG.seed(config.traffic.seed + step)
 
     intensity = config.traffic.intensity
     if intensity <= 0:
         return False
 
     rand_threshold = 1 / intensity
-    return random.random() < (1 / rand_threshold)
+    return RNG.random() < (1 / rand_threshold)
 
 
 def generate_amount(config: ConfigSchema) -> int:
     """Determines how many passengers appear in this step."""
-    return max(1, int(round(random.expovariate(1.0 / config.traffic.intensity))))
+    return max(1, int(round(RNG.expovariate(1.0 / config.traffic.intensity))))
 
 
 def normalize_distribution(dist: list[float], expected_len: int, name: str) -> list[float]:
@@ -56,12 +65,43 @@ def normalize_distribution(dist: list[float], expected_len: int, name: str) -> l
     return [x / total for x in dist]
 
 
-def insert_person(people_array, start_floor: int, person: Person, max_people_floor: int):
-    """Inserts a person object into the first available slot on a given floor."""
-    for i in range(max_people_floor):
-        if people_array[start_floor, i] is None:
-            people_array[start_floor, i] = copy.deepcopy(person)
-            break
+class ArrivalRecorder:
+    """
+    Stands in for an empty building when only the arrivals of the generators are needed (see presample_arrivals):
+    passengers are recorded as (starting_floor, desired_floor) pairs instead of being put on floors.
+    """
+
+    def __init__(self, max_floor, max_people_floor):
+        self.max_floor = max_floor
+        self.max_people_floor = max_people_floor
+        self.arrivals = []
+
+    def take(self) -> List[Tuple[int, int]]:
+        """
+        Empties the recorder.
+        :return: the recorded pairs as an empty building would hold them: by starting floor, in order of arrival
+                 within a floor, without the passengers who would find their floor full
+        """
+        arrivals, self.arrivals = sorted(self.arrivals, key=lambda pair: pair[0]), []
+        counts = defaultdict(int)
+        kept = []
+        for starting_floor, desired_floor in arrivals:
+            if counts[starting_floor] < self.max_people_floor:
+                counts[starting_floor] += 1
+                kept.append((starting_floor, desired_floor))
+        return kept
+
+
+def spawn_passenger(elevator_system: ElevatorSystem, step: int, starting_floor: int, desired_floor: int):
+    """Adds a new passenger waiting on starting_floor, in the storage used by the system's backend."""
+    if isinstance(elevator_system, ArrivalRecorder):
+        elevator_system.arrivals.append((starting_floor, desired_floor))
+        return
+    if isinstance(elevator_system, ColumnarElevatorSystem):
+        elevator_system.passengers.add(step, starting_floor, desired_floor)
+        return
+    person = Person(step=step, starting_floor=starting_floor, desired_floor=desired_floor)
+    elevator_system.insert_person(person)
 
 
 # ------------------ main generation dispatcher ------------------
@@ -85,25 +125,32 @@ def generate_passengers(elevator_system: ElevatorSystem, step: int, config=None)
 
 # --------------- apriori generator --------------
 
-def generate_scenario_apriori(n_steps: int, scenario_name: str):
-    config: ConfigSchema = load_config()
-
-    fake_system = ElevatorSystem(config.floors, config.max_people_floor)
+def presample_arrivals(n_steps: int, config: ConfigSchema = None) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Runs the traffic generator for n_steps, every step on an empty building (an ArrivalRecorder).
+    :return: dict step -> list of (starting_floor, desired_floor) of passengers appearing in that step
+    """
+    if not config:
+        config = CONFIG
 
-    scenario = []
+    recorder = ArrivalRecorder(config.floors, config.max_people_floor)
+    arrivals = {}
 
     for step in range(n_steps):
-        generate_passengers(fake_system, step, config=config)
-        pair = 0
+        if generate_passengers(recorder, step, config=config):
+            arrivals[step] = recorder.take()
 
-        for floor in fake_system.people_array:
-            for person in floor:
-                person: Person | None
-                if person:
-                    scenario.append((step, pair, person.starting_floor, person.desired_floor))
-                    pair += 1
+    return arrivals
+
+
+def generate_scenario_apriori(n_steps: int, scenario_name: str):
+    config: ConfigSchema = load_config()
+
+    scenario = []
 
-        fake_system = ElevatorSystem(config.floors, config.max_people_floor)
+    for step, pairs in presample_arrivals(n_steps, config).items():
+        for pair, (starting_floor, desired_floor) in enumerate(pairs):
+            scenario.append((step, pair, starting_floor, desired_floor))
 
     path = os.path.join(SCENARIO_DIR, scenario_name)
     with open(path, 'w', newline='') as f:
@@ -115,9 +162,7 @@ def generate_scenario_apriori(n_steps: int, scenario_name: str):
 # ------------------ generators ------------------
 
 def generate_up_peak(elevator_system: ElevatorSystem, step: int, config: ConfigSchema):
-    people_array = elevator_system.people_array
     max_floor = elevator_system.max_floor
-    max_people_floor = elevator_system.max_people_floor
 
     params = config.traffic.up_peak_params
     if params is None or not should_generate_passengers(config, step):
@@ -132,23 +177,20 @@ def generate_up_peak(elevator_system: ElevatorSystem, step: int, config: ConfigS
         dist = normalize_distribution(params.destination_distribution, max_floor + 1, "destination_distribution")
 
     for _ in range(amount):
-        desired_floor = random.choices(range(max_floor + 1), weights=dist, k=1)[0] if dist else random.randint(0,
-                                                                                                               max_floor)
+        desired_floor = RNG.choices(range(max_floor + 1), weights=dist, k=1)[0] if dist else RNG.randint(0,
+                                                                                                         max_floor)
         if desired_floor == starting_floor:
             continue
 
-        person = Person(step=step, starting_floor=starting_floor, desired_floor=desired_floor)
         if starting_floor not in new_floors_arr:
             new_floors_arr.append(starting_floor)
-        insert_person(people_array, starting_floor, person, max_people_floor)
+        spawn_passenger(elevator_system, step, starting_floor, desired_floor)
 
     return new_floors_arr
 
 
 def generate_down_peak(elevator_system: ElevatorSystem, step: int, config: ConfigSchema):
-    people_array = elevator_system.people_array
     max_floor = elevator_system.max_floor
-    max_people_floor = elevator_system.max_people_floor
 
     params = config.traffic.down_peak_params
     if params is None or not should_generate_passengers(config, step):
@@ -163,23 +205,20 @@ def generate_down_peak(elevator_system: ElevatorSystem, step: int, config: Confi
         dist = normalize_distribution(params.origin_distribution, max_floor + 1, "origin_distribution")
 
     for _ in range(amount):
-        starting_floor = random.choices(range(max_floor + 1), weights=dist, k=1)[0] if dist else random.randint(0,
-                                                                                                                max_floor)
+        starting_floor = RNG.choices(range(max_floor + 1), weights=dist, k=1)[0] if dist else RNG.randint(0,
+                                                                                                          max_floor)
         if starting_floor == destination_floor:
             continue
 
-        person = Person(step=step, starting_floor=starting_floor, desired_floor=destination_floor)
         if starting_floor not in new_floors_arr:
             new_floors_arr.append(starting_floor)
-        insert_person(people_array, starting_floor, person, max_people_floor)
+        spawn_passenger(elevator_system, step, starting_floor, destination_floor)
 
     return new_floors_arr
 
 
 def generate_mixed_peak(elevator_system: ElevatorSystem, step: int, config: ConfigSchema):
-    people_array = elevator_system.people_array
     max_floor = elevator_system.max_floor
-    max_people_floor = elevator_system.max_people_floor
 
     params = config.traffic.mixed_peak_params
     if params is None or not should_generate_passengers(config, step):
@@ -194,7 +233,7 @@ def generate_mixed_peak(elevator_system: ElevatorSystem, step: int, config: Conf
         "inter": params.interfloor_ratio
     }
 
-    categories = random.choices(
+    categories = RNG.choices(
         population=["up", "down", "inter"],
         weights=[ratios["up"], ratios["down"], ratios["inter"]],
         k=amount
@@ -203,40 +242,39 @@ def generate_mixed_peak(elevator_system: ElevatorSystem, step: int, config: Conf
     for cat in categories:
         if cat == "up":
             starting_floor = params.arrival_floor
-            desired_floor = random.randint(starting_floor + 1, max_floor)
+            desired_floor = RNG.randint(starting_floor + 1, max_floor)
             if desired_floor == starting_floor:
                 continue
 
         elif cat == "down":
-            starting_floor = random.randint(1, max_floor)
+            starting_floor = RNG.randint(1, max_floor)
             if starting_floor == params.destination_floor:
                 continue
             desired_floor = params.destination_floor
 
         else:  # interfloor
-            start = random.randint(0, max_floor)
-            dest = random.randint(0, max_floor)
+            start = RNG.randint(0, max_floor)
+            dest = RNG.randint(0, max_floor)
             if start == dest:
                 continue
             starting_floor = start
             desired_floor = dest
 
-        person = Person(step=step, starting_floor=starting_floor, desired_floor=desired_floor)
         if starting_floor not in new_floors_arr:
             new_floors_arr.append(starting_floor)
-        insert_person(people_array, starting_floor, person, max_people_floor)
+        spawn_passenger(elevator_system, step, starting_floor, desired_floor)
 
     return new_floors_arr
 
 
 def generate_from_file(elevator_system: ElevatorSystem, step: int, config: ConfigSchema):
     new_floors_arr = []
+    scenario_by_step = load_scenario(config.traffic.from_file_params.filename)
     if step in scenario_by_step.keys():
         for pair in scenario_by_step[step]:
             starting_floor = int(pair['starting_floor'])
             desired_floor = int(pair['desired_floor'])
-            person = Person(starting_floor=starting_floor, desired_floor=desired_floor, step=step)
             if starting_floor not in new_floors_arr:
                 new_floors_arr.append(starting_floor)
-            insert_person(elevator_system.people_array, starting_floor, person, config.max_people_floor)
+            spawn_passenger(elevator_system, step, starting_floor, desired_floor)
     return new_floors_arr
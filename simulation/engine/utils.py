@@ -3,20 +3,18 @@ from simulation.core.elevator_system import ElevatorSystem
 from simulation.core.person import Person
 import numpy as np
 from typing import List, Set, Tuple
-from datetime import datetime
-import os
-import pandas as pd
 
 
-def visiting_floor(floor_int, elevator: Elevator, elevator_system: ElevatorSystem):
+def visiting_floor(floor_int, elevator: Elevator, elevator_system: ElevatorSystem, step: int):
     """
     Execute actions when stopping at a floor
     :param floor_int: Current floor
     :param elevator: Elevator class object
     :param elevator_system: ElevatorSystem class object
+    :param step: Current simulation step, stamped on passengers leaving and getting in
     :return:
     """
-    people_array, passengers_at_dest = elevator_system.people_array, elevator_system.passengers_at_dest
+    passengers_at_dest = elevator_system.passengers_at_dest
 
     # --- PASSENGERS LEAVING ---
     passengers_inside_arr = elevator.people_inside_arr
@@ -24,28 +22,16 @@ def visiting_floor(floor_int, elevator: Elevator, elevator_system: ElevatorSyste
     for passenger_inside in passengers_inside_arr:
         if passenger_inside.desired_floor == floor_int:
             passengers_leaving_arr.append(passenger_inside)
-    elevator.leave(passengers_leaving_arr)
+    elevator.leave(passengers_leaving_arr, step)
     for passenger_left in passengers_leaving_arr:
         passengers_at_dest.append(passenger_left)
 
     # --- PASSENGERS GETTING IN ---
-    floor = people_array[floor_int]
-    sorted_floor = sort_passengers(floor)
-    space_left = elevator.how_much_space_left()
-    passengers_entering_arr = []
-    for i in range(min(space_left, len(sorted_floor))):
-        if sorted_floor[i] is not None:
-            passengers_entering_arr.append(sorted_floor[i])
+    passengers_entering_arr = elevator_system.pop_waiting(floor_int, elevator.how_much_space_left())
 
     if passengers_entering_arr:
         elevator_system.remove_floor_from_requested(floor_int)
-
-    elevator.enter(passengers_entering_arr)
-
-    # deleting boarded passengers from the floor
-    for passenger in people_array[floor_int]:
-        if passenger in passengers_entering_arr:
-            people_array[people_array == passenger] = None
+        elevator.enter(passengers_entering_arr, step, elevator_system.elevators.index(elevator))
 
     elevator.delay += elevator.time_at_floor
 
@@ -64,17 +50,6 @@ def how_much_passengers_floor(floor_int, people_array):
     return count_int
 
 
-def sort_passengers(passengers_array):
-    """
-    Posortuj pasażerów od najdłużej do najkrócej czekających
-    :param passengers_array: Macierz numpy o wymiarach liczba piętra x maksymalna ilość osób w piętrze
-    :return:
-    """
-    # układ: pasażerowie czekający najdłużej od lewej strony wektora
-    return sorted(filter(lambda x: x is not None, passengers_array), key=lambda person: person.journey_time,
-                  reverse=True)
-
-
 def how_many_people(people_array, elevators: List[Elevator]):
     people = 0
     for floor in people_array:
@@ -216,41 +191,3 @@ def int_to_action(action_int):
     lift2_state = lift_states_map[lift2_state_index]
 
     return (lift1_state, lift2_state)
-
-
-simulation_log = []
-run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-
-def log_simulation_step(step_idx: int, elevator_system):
-    """Saves one simulation step to global list simulation_log"""
-    global simulation_log
-
-    for elv_id, elv in enumerate(elevator_system.elevators):
-        record = {
-            "step": step_idx,
-            "elevator_id": elv_id,
-            "floor": elv.current_floor,
-            "state": elv.state,
-            "delay": elv.delay,
-            "num_inside": len(elv.people_inside_arr),
-            "requested_floors": len(elevator_system.requested_floors),
-            "waiting_total": sum(len(f) for f in elevator_system.people_array),
-        }
-        simulation_log.append(record)
-
-
-def save_simulation_log(output_dir="logs", filename_prefix="run"):
-    """Saves logs to Parquet format"""
-    global simulation_log, run_timestamp
-
-    if not simulation_log:
-        return
-
-    os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, f"{filename_prefix}_{run_timestamp}.parquet")
-
-    df = pd.DataFrame(simulation_log)
-    df.to_parquet(filename, index=False, compression="snappy")
-
-    print(f"[LOG] Saved {len(df)} lines to file: {filename}")
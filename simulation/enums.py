@@ -55,10 +55,87 @@ class AlgorithmEnum(str, Enum):
 
         return [
             f for f in os.listdir(models_dir)
-            if f.endswith(".pkl")
+            if f.endswith((".pkl", ".qlm"))
         ]
 
 
+class SimulationBackendEnum(str, Enum):
+    OBJECT = "object"
+    COLUMNAR = "columnar"
+
+    def build_system(self, config):
+        """
+        Builds an empty building with elevators described by the config.
+        :param config: ConfigSchema object
+        :return: ElevatorSystem (or its columnar variant)
+        """
+        from simulation.core.elevator import Elevator
+        match self:
+            case SimulationBackendEnum.COLUMNAR:
+                from simulation.core.columnar_system import ColumnarElevatorSystem
+                system = ColumnarElevatorSystem(config.floors, config.max_people_floor)
+                for elevator in config.elevators:
+                    system.add_elevator(max_people_inside=elevator.max_people, speed=elevator.speed)
+                return system
+            case _:
+                from simulation.core.elevator_system import ElevatorSystem
+                system = ElevatorSystem(config.floors, config.max_people_floor)
+                system.elevators = [Elevator(max_people_inside=elevator.max_people,
+                                             max_possible_floor=config.floors,
+                                             speed=elevator.speed) for elevator in config.elevators]
+                return system
+
+    def get_operator(self):
+        match self:
+            case SimulationBackendEnum.COLUMNAR:
+                from simulation.engine.columnar_operator import columnar_operator
+                return columnar_operator
+            case _:
+                from simulation.engine.step_operator import operator
+                return operator
+
+
+class EngineModeEnum(str, Enum):
+    TICK = "tick"
+    EVENT = "event"
+
+
+class QTableEnum(str, Enum):
+    DICT = "dict"
+    DENSE = "dense"
+    HASHED = "hashed"
+
+    def create(self, n_actions: int, max_states: Optional[int] = None):
+        """
+        Builds an empty Q-table for n_actions actions.
+        :param n_actions: number of actions of the agent
+        :param max_states: (dense only) number of states interned before falling back to hashed buckets
+        :return: defaultdict, DenseQTable or HashedQTable
+        """
+        match self:
+            case QTableEnum.DENSE:
+                from simulation.training.agents.q_table import DenseQTable
+                return DenseQTable(n_actions, max_states=max_states)
+            case QTableEnum.HASHED:
+                from simulation.training.agents.q_table import HashedQTable
+                return HashedQTable(n_actions)
+            case _:
+                from collections import defaultdict
+                import numpy as np
+                return defaultdict(lambda: np.zeros(n_actions))
+
+
+class TraceFieldEnum(str, Enum):
+    """Optional columns of the per-step trace (one row per elevator and step), see analysis.trace"""
+    FLOOR = "floor"
+    STATE = "state"
+    ACTION = "action"
+    DELAY = "delay"
+    NUM_INSIDE = "num_inside"
+    REQUESTED_FLOORS = "requested_floors"
+    WAITING_TOTAL = "waiting_total"
+
+
 class TrafficGeneratorEnum(str, Enum):
     UP_PEAK = "up-peak"
     DOWN_PEAK = "down-peak"
@@ -67,6 +144,11 @@ class TrafficGeneratorEnum(str, Enum):
     UNIFORM = "uniform"
     FROM_FILE = "from file"
 
+    @property
+    def has_generator(self) -> bool:
+        """False for the types generate_passengers has no generator for yet (they spawn nobody)."""
+        return self not in (TrafficGeneratorEnum.INTERFLOOR, TrafficGeneratorEnum.UNIFORM)
+
 
 class UpPeakParams(BaseModel):
     arrival_floor: int = Field(default=0,
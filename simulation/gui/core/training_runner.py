@@ -0,0 +1,85 @@
+from multiprocessing import get_context
+from queue import Empty
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from simulation.training.schema import TrainingConfigSchema
+from simulation.training.scripts.training_session import run_training_job
+
+
+class TrainingRunner(QObject):
+    """
+    Runs a training session (run_training_job) in a separate process, so the GUI stays responsive.
+    Messages of the process are polled from a queue by a QTimer on the GUI thread and re-emitted as signals.
+    Cancelling terminates the process, the training can later be resumed from its newest checkpoint.
+    """
+    progress = Signal(dict)
+    finished = Signal(dict)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    POLL_INTERVAL_MS = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Qt keeps threads of its own, forking them is not safe
+        self.context = get_context("spawn")
+        self.process = None
+        self.messages = None
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.POLL_INTERVAL_MS)
+        self.timer.timeout.connect(self._poll)
+
+    def is_running(self) -> bool:
+        return self.process is not None
+
+    def start(self, training_cfg: TrainingConfigSchema, resume=True):
+        if self.is_running():
+            raise RuntimeError("A training is already running.")
+
+        self.messages = self.context.Queue()
+        self.process = self.context.Process(target=run_training_job,
+                                            args=(training_cfg.model_dump(mode="json"), resume, self.messages),
+                                            daemon=True)
+        self.process.start()
+        self.timer.start()
+
+    def cancel(self):
+        if not self.is_running():
+            return
+        self.process.terminate()
+        self._stop()
+        self.cancelled.emit()
+
+    def _poll(self):
+        # checked before draining: a process that has exited has already flushed its messages
+        alive = self.process.is_alive()
+        while True:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except Empty:
+                break
+            match kind:
+                case "progress":
+                    self.progress.emit(payload)
+                case "finished":
+                    self._stop()
+                    self.finished.emit(payload)
+                    return
+                case _:
+                    self._stop()
+                    self.failed.emit(payload)
+                    return
+
+        if not alive:
+            exitcode = self.process.exitcode
+            self._stop()
+            self.failed.emit(f"The training process exited unexpectedly (exit code {exitcode}).")
+
+    def _stop(self):
+        self.timer.stop()
+        self.process.join()
+        self.messages.close()
+        self.process = None
+        self.messages = None
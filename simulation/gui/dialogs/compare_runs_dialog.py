@@ -0,0 +1,119 @@
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
+                               QTableWidget, QTableWidgetItem, QDialogButtonBox, QHeaderView)
+import pandas as pd
+
+from simulation.analysis.catalog import RunCatalog
+from simulation.analysis.comparison import load_runs, compare_groups, paired_deltas, CATALOG_METRICS
+
+METRICS = [*CATALOG_METRICS, "p99_waiting_time", "p95_journey_time", "p99_journey_time", "max_waiting_time",
+           "service_level_60"]
+
+
+def fill_table(table: QTableWidget, frame: pd.DataFrame):
+    table.clear()
+    table.setColumnCount(len(frame.columns))
+    table.setRowCount(len(frame))
+    table.setHorizontalHeaderLabels([str(c) for c in frame.columns])
+    for i, row in enumerate(frame.itertuples(index=False)):
+        for j, value in enumerate(row):
+            text = f"{value:.3f}" if isinstance(value, float) else str(value)
+            table.setItem(i, j, QTableWidgetItem(text))
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+
+
+class CompareRunsDialog(QDialog):
+    def __init__(self, catalog: RunCatalog, filenames: list[str], parent=None):
+        """
+        :param catalog: run catalog of the results page
+        :param filenames: runs to compare (the runs listed on the results page)
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Compare Runs")
+        self.resize(1000, 600)
+
+        self.catalog = catalog
+        self.filenames = filenames
+        self.runs = {}  # metric -> table of load_runs(), loaded once per metric
+
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Metric:"))
+        # editable: any metric of analysis.comparison, e.g. p90_travel_time or service_level_45
+        self.metric_combo = QComboBox(self)
+        self.metric_combo.setEditable(True)
+        self.metric_combo.addItems(METRICS)
+        controls.addWidget(self.metric_combo)
+
+        controls.addWidget(QLabel("Baseline:"))
+        self.baseline_combo = QComboBox(self)
+        controls.addWidget(self.baseline_combo)
+
+        self.compare_button = QPushButton("Compare", self)
+        controls.addWidget(self.compare_button)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.status_label = QLabel(f"{len(self.filenames)} runs")
+        layout.addWidget(self.status_label)
+
+        layout.addWidget(QLabel("Algorithm, generator and building groups (mean and confidence interval):"))
+        self.groups_table = QTableWidget(self)
+        layout.addWidget(self.groups_table)
+
+        layout.addWidget(QLabel("Paired differences with the baseline on identical scenarios (algorithm - baseline):"))
+        self.deltas_table = QTableWidget(self)
+        layout.addWidget(self.deltas_table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close, parent=self)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self.compare_button.clicked.connect(self.compare)
+        self.baseline_combo.currentIndexChanged.connect(self.update_deltas)
+
+    def current_runs(self) -> pd.DataFrame:
+        metric = self.metric_combo.currentText().strip()
+        if metric not in self.runs:
+            self.runs[metric] = load_runs(self.filenames, metrics=[metric], catalog=self.catalog)
+        return self.runs[metric]
+
+    def compare(self):
+        metric = self.metric_combo.currentText().strip()
+        try:
+            runs = self.current_runs()
+        except ValueError as e:
+            self.status_label.setText(str(e))
+            return
+        if runs.empty:
+            self.status_label.setText("No runs to compare")
+            return
+
+        self.status_label.setText(f"{len(runs)} runs, {runs['scenario'].notna().sum()} with a repeatable scenario")
+        groups = compare_groups(runs, [metric]).rename(columns=lambda c: c.removeprefix(f"{metric}_"))
+        fill_table(self.groups_table, groups)
+
+        # baselines: algorithms of the loaded runs, keeping the chosen one
+        current = self.baseline_combo.currentText()
+        algorithms = sorted(runs["algorithm"].unique())
+        self.baseline_combo.blockSignals(True)
+        self.baseline_combo.clear()
+        self.baseline_combo.addItems(algorithms)
+        if current in algorithms:
+            self.baseline_combo.setCurrentText(current)
+        self.baseline_combo.blockSignals(False)
+        self.update_deltas()
+
+    def update_deltas(self):
+        metric = self.metric_combo.currentText().strip()
+        baseline = self.baseline_combo.currentText()
+        if not baseline or metric not in self.runs:
+            return
+        deltas = paired_deltas(self.runs[metric], metric, baseline)
+        if deltas.empty:
+            fill_table(self.deltas_table, pd.DataFrame({"": ["No paired scenarios"]}))
+            return
+        fill_table(self.deltas_table, deltas)
@@ -1,3 +1,4 @@
+from PySide6.QtGui import QFontDatabase
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QTextEdit, QDialogButtonBox
 
 class ShowTextDialog(QDialog):
@@ -10,6 +11,7 @@ class ShowTextDialog(QDialog):
 
         self.text_edit = QTextEdit(self)
         self.text_edit.setReadOnly(True)
+        self.text_edit.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
         self.text_edit.setPlainText(text)
         layout.addWidget(self.text_edit)
 
@@ -301,6 +301,14 @@ class ConfigPage:
             model=model,
             traffic=traffic
         )
+        # settings without widgets are kept from the config file
+        try:
+            previous = load_config()
+            configuration.backend = previous.backend
+            configuration.engine = previous.engine
+            configuration.trace = previous.trace
+        except Exception:
+            pass
 
         save_config(configuration)
         QMessageBox.information(w, "Saved", "Settings saved successfully.")
@@ -1,20 +1,22 @@
-from PySide6.QtWidgets import QMessageBox
+from PySide6.QtCore import QRect
+from PySide6.QtWidgets import QLabel, QMessageBox, QProgressBar, QPushButton
+
+from simulation.gui.core.training_runner import TrainingRunner
 
 from simulation.enums import AlgorithmEnum
 from simulation.training.schema import TrainingConfigSchema, QLearningParamsSchema, RewardMultipliersSchema
 
 from simulation.training.config import load_training_config, save_training_config
 
-from simulation.config import load_config
-
-from simulation.training.scripts.train_q_learning import train_q_learning
-from simulation.training.agents.q_learning_agent import QLearningAgent, QLearningAgentsGroup
+from simulation.training.scripts.training_session import TrainingSession
 
 
 class ReinforcementPage:
     def __init__(self, window):
         self.window = window
+        self.runner = TrainingRunner(window)
         self._setup_algorithm_combo()
+        self._setup_training_widgets()
         self._connect_logic()
         self.load_settings()
 
@@ -22,6 +24,7 @@ class ReinforcementPage:
     def connect_buttons(self):
         w = self.window
         w.startTrainingPushButton.clicked.connect(self.start_training)
+        self.cancelTrainingPushButton.clicked.connect(self.cancel_training)
         self.window.backButton_2.clicked.connect(w.show_main)
         w.saveConfigPushButton.clicked.connect(self.save_settings)
 
@@ -35,32 +38,85 @@ class ReinforcementPage:
             if alg == AlgorithmEnum.Q_LEARNING:
                 w.RlAlgorithmComboBox.addItem(alg.pretty, userData=alg)
 
+    def _setup_training_widgets(self):
+        # progress of a running training, placed under the start button of the Q-learning panel
+        page = self.window.page_7
+
+        self.cancelTrainingPushButton = QPushButton("Cancel", page)
+        self.cancelTrainingPushButton.setGeometry(QRect(120, 180, 101, 24))
+        self.cancelTrainingPushButton.setEnabled(False)
+
+        self.trainingProgressBar = QProgressBar(page)
+        self.trainingProgressBar.setGeometry(QRect(10, 210, 271, 20))
+        self.trainingProgressBar.setValue(0)
+
+        self.trainingStatusLabel = QLabel(page)
+        self.trainingStatusLabel.setGeometry(QRect(10, 232, 281, 28))
+        self.trainingStatusLabel.setWordWrap(True)
+
     def _connect_logic(self):
         self.window.RlAlgorithmComboBox.currentIndexChanged.connect(
             self.on_algorithm_changed
         )
+        self.runner.progress.connect(self.on_training_progress)
+        self.runner.finished.connect(self.on_training_finished)
+        self.runner.failed.connect(self.on_training_failed)
+        self.runner.cancelled.connect(self.on_training_cancelled)
 
     def start_training(self):
         self.save_settings()
-        general_config = load_config()
         rl_config = load_training_config()
+        session = TrainingSession.from_config(rl_config)
+
+        checkpoint = session.latest_checkpoint()
+        if checkpoint is not None:
+            answer = QMessageBox.question(self.window, "Resume training",
+                                          f"An interrupted training of {rl_config.save_name} was found "
+                                          f"({checkpoint.name}).\nResume it?")
+            if answer != QMessageBox.StandardButton.Yes:
+                session.clear_checkpoints()
+
+        self.runner.start(rl_config)
+        self._set_training_running(True)
+        self.trainingProgressBar.setRange(0, rl_config.episodes)
+        self.trainingProgressBar.setValue(0)
+        self.trainingStatusLabel.setText("Starting training...")
+
+    def cancel_training(self):
+        self.runner.cancel()
+
+    def _set_training_running(self, running: bool):
+        w = self.window
+        w.startTrainingPushButton.setEnabled(not running)
+        w.saveConfigPushButton.setEnabled(not running)
+        self.cancelTrainingPushButton.setEnabled(running)
+
+    # --- TRAINING PROGRESS ---
+    def on_training_progress(self, progress: dict):
+        self.trainingProgressBar.setValue(progress["episode"])
+        epsilon = ", ".join(f"{e:.3f}" for e in progress["epsilon"])
+        self.trainingStatusLabel.setText(
+            f"Episode {progress['episode']}/{progress['episodes']}, reward: {progress['reward']:.2f}, "
+            f"epsilon: {epsilon}, {progress['steps_per_second']:.0f} steps/s"
+        )
 
-        agents = []
-        for _ in range(len(general_config.elevators)):
-            agents.append(QLearningAgent(["UP", "DOWN", "STANDING"],
-                                         alpha=rl_config.q_learning_params.alpha,
-                                         gamma=rl_config.q_learning_params.gamma,
-                                         epsilon=rl_config.q_learning_params.starting_epsilon))
+    def on_training_finished(self, result: dict):
+        self._set_training_running(False)
+        self.trainingStatusLabel.setText(f"Finished after {result['episodes']} episodes.")
+        stopped = "\nStopped early, the reward has stopped improving." if result["stopped_early"] else ""
+        QMessageBox.information(self.window, "Training finished",
+                                f"The training has finished.\nTotal number of episodes: {result['episodes']},"
+                                f"\nMean episode reward value: {result['mean_reward']},"
+                                f"\nSaved as {result['save_path']}{stopped}")
 
-        agents_group = QLearningAgentsGroup(agents)
-        agents_group, mean_reward = train_q_learning(episodes=rl_config.episodes,
-                                                     steps=rl_config.steps_per_episode,
-                                                     agents_group=agents_group)
-        save_path = agents_group.save(rl_config.save_name)
+    def on_training_failed(self, error: str):
+        self._set_training_running(False)
+        self.trainingStatusLabel.setText("Training failed.")
+        QMessageBox.critical(self.window, "Training failed", error)
 
-        QMessageBox.information(self.window, "Training finished",
-                                f"The training has finished.\nTotal number of episodes: {rl_config.episodes},"
-                                f"\nMean episode reward value: {mean_reward},\nSaved as {save_path}")
+    def on_training_cancelled(self):
+        self._set_training_running(False)
+        self.trainingStatusLabel.setText("Training cancelled. Start it again to resume from the last checkpoint.")
 
     # --- LOAD SETTINGS ---
     def load_settings(self):
@@ -137,6 +193,12 @@ class ReinforcementPage:
         # --- steps per episode ---
         steps_per_episode = w.stepsPerEpisodeSpinBox.value()
 
+        # settings without widgets are kept from the config file
+        try:
+            previous = load_training_config()
+        except Exception:
+            previous = None
+
         # --- q-learning params ---
         q_params = None
         if alg_enum == AlgorithmEnum.Q_LEARNING:
@@ -146,6 +208,11 @@ class ReinforcementPage:
                 starting_epsilon=w.startingEpsilonSpinBox.value(),
                 epsilon_decay=w.epsilonDecaySpinBox.value()
             )
+            # Q-table storage has no widget, keep the one from the config file
+            if previous is not None and previous.q_learning_params is not None:
+                q_params.q_table = previous.q_learning_params.q_table
+                q_params.max_states = previous.q_learning_params.max_states
+                q_params.replay = previous.q_learning_params.replay
 
         # --- reward params ---
         reward_params = RewardMultipliersSchema(
@@ -164,6 +231,8 @@ class ReinforcementPage:
             q_learning_params=q_params,
             reward_params=reward_params
         )
+        if previous is not None:
+            config.session = previous.session
 
         # --- save ---
         save_training_config(config)
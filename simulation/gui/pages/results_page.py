@@ -5,15 +5,31 @@ from pprint import pformat
 
 from typing import TYPE_CHECKING
 
-from simulation.analysis.result_analyse import analyse_from_file
+from PySide6.QtCore import QRect, Qt
+from PySide6.QtWidgets import QComboBox, QLineEdit, QPushButton
+
+from simulation.analysis.analytics import analytics_report
+from simulation.analysis.catalog import RunCatalog
 from simulation.analysis.schema import ResultsInfoForGui
+from simulation.analysis.trips import run_base, run_files, TRIPS_SUFFIX
 
+from simulation.gui.dialogs.compare_runs_dialog import CompareRunsDialog
 from simulation.gui.dialogs.rename_file_dialog import RenameFileDialog
 from simulation.gui.dialogs.show_text_dialog import ShowTextDialog
 
 REPO_DIR = Path(__file__).resolve().parents[3]
 LOG_DIR = REPO_DIR / "database" / "logs"
 
+# label, catalog column, descending
+SORT_OPTIONS = [
+    ("Newest first", "mtime", True),
+    ("Oldest first", "mtime", False),
+    ("Waiting time", "mean_waiting_time", False),
+    ("Journey time", "mean_journey_time", False),
+    ("Passengers", "n_passengers", True),
+    ("Name", "filename", False),
+]
+
 if TYPE_CHECKING:
     from simulation.gui.core.window_controller import ElevatorSimWindowController
 
@@ -21,20 +37,46 @@ if TYPE_CHECKING:
 class ResultsPage:
     def __init__(self, window: "ElevatorSimWindowController"):
         self.window = window
+        self.catalog = RunCatalog(LOG_DIR)
+        self._setup_filter_widgets()
+        if not len(self.catalog):
+            # first start with the catalog: index the logs already in the directory
+            self.catalog.sync()
         self.populate_files()
 
+    def _setup_filter_widgets(self):
+        # filter and sort of the runs, next to the file combo box
+        page = self.window.page_5
+
+        self.filterLineEdit = QLineEdit(page)
+        self.filterLineEdit.setGeometry(QRect(360, 110, 141, 31))
+        self.filterLineEdit.setPlaceholderText("Filter runs")
+
+        self.sortComboBox = QComboBox(page)
+        self.sortComboBox.setGeometry(QRect(510, 110, 111, 31))
+        for label, column, descending in SORT_OPTIONS:
+            self.sortComboBox.addItem(label, userData=(column, descending))
+
+        self.compareRunsPushButton = QPushButton("Compare", page)
+        self.compareRunsPushButton.setGeometry(QRect(230, 143, 79, 24))
+
     def connect_buttons(self):
         w = self.window
         self.window.backButton.clicked.connect(w.show_main)
         w.acceptFilenameButton.clicked.connect(self.load_simulation_info_results)
-        w.reloadFilesPushButton.clicked.connect(self.populate_files)
+        w.reloadFilesPushButton.clicked.connect(self.reload_files)
         w.changeNamePushButton.clicked.connect(self.on_rename_clicked)
         w.advancedAnalysis.clicked.connect(self.show_config)
+        self.filterLineEdit.textChanged.connect(self.populate_files)
+        self.sortComboBox.currentIndexChanged.connect(self.populate_files)
+        self.compareRunsPushButton.clicked.connect(self.compare_runs)
 
     def load_simulation_info_results(self):
         w = self.window
         filename = w.resultsFileComboBox.currentText()
-        ri: ResultsInfoForGui = analyse_from_file(filename)
+        if not filename:
+            return
+        ri: ResultsInfoForGui = self.catalog.summary(filename)
 
         w.numberOfStepsAnalysis.setText(str(ri.info.steps))
         w.algorithmAnalysis.setText(ri.info.algorithm.pretty)
@@ -49,23 +91,34 @@ class ResultsPage:
         w.wTime.setText(str(round(ri.results.mean_j_time_dist, 3)))
         w.nPassengers.setText(str(ri.results.n_passengers))
 
-    def populate_files(self):
-        log_dir = LOG_DIR
-
-        files = [f for f in log_dir.iterdir() if f.is_file()]
-
-        if not files:
-            return
-
-        files_sorted = sorted(files, key=lambda f: f.stat().st_mtime, reverse=True)
+    def reload_files(self):
+        """Catalogs runs added to (or removed from) the logs directory outside of the simulation."""
+        self.catalog.sync()
+        self.populate_files()
 
-        file_names = [f.name for f in files_sorted]
+    def populate_files(self):
+        column, descending = self.sortComboBox.currentData()
+        runs = self.catalog.runs(search=self.filterLineEdit.text().strip(), order_by=column, descending=descending)
 
         combo = self.window.resultsFileComboBox
         combo.clear()
-        combo.addItems(file_names)
+        for i, run in enumerate(runs):
+            combo.addItem(run.filename)
+            combo.setItemData(i, f"{run.algorithm}, {run.generator}, {run.floors} floors, {run.elevators} cars\n"
+                                 f"waiting {run.mean_waiting_time:.2f}, journey {run.mean_journey_time:.2f}, "
+                                 f"{run.n_passengers} passengers", Qt.ToolTipRole)
 
-        combo.setCurrentIndex(0)
+        if runs:
+            combo.setCurrentIndex(0)
+
+    def compare_runs(self):
+        """Compares the runs listed (after filtering) in the file combo box."""
+        combo = self.window.resultsFileComboBox
+        filenames = [combo.itemText(i) for i in range(combo.count())]
+        if not filenames:
+            return
+        dlg = CompareRunsDialog(self.catalog, filenames, parent=self.window)
+        dlg.exec()
 
     def on_rename_clicked(self):
         cb = self.window.resultsFileComboBox
@@ -81,14 +134,25 @@ class ResultsPage:
         if new_name is None:
             return
 
-        old_path = os.path.join(LOG_DIR, old_name)
-        new_path = os.path.join(LOG_DIR, new_name)
+        if old_name.endswith(TRIPS_SUFFIX):
+            # all files of the run share the base name
+            old_base, new_base = run_base(old_name), run_base(new_name)
+            renames = [(path, LOG_DIR / (new_base + path.name[len(old_base):]))
+                       for path in run_files(LOG_DIR, old_base)]
+            new_name = new_base + TRIPS_SUFFIX
+        else:
+            # pickled older logs are listed by their .pkl extension
+            if not new_name.endswith(".pkl"):
+                new_name += ".pkl"
+            renames = [(os.path.join(LOG_DIR, old_name), os.path.join(LOG_DIR, new_name))]
 
         try:
-            os.rename(old_path, new_path)
+            for old_path, new_path in renames:
+                os.rename(old_path, new_path)
         except Exception as e:
             print(f"Rename error: {e}")
             return
+        self.catalog.rename(old_name, new_name)
 
         idx = cb.currentIndex()
         cb.setItemText(idx, new_name)
@@ -96,11 +160,15 @@ class ResultsPage:
     def show_config(self):
         w = self.window
         filename = w.resultsFileComboBox.currentText()
-        ri: ResultsInfoForGui = analyse_from_file(filename)
+        if not filename:
+            return
+        ri: ResultsInfoForGui = self.catalog.summary(filename)
 
         text = ri.info.model_dump()
 
         text = pformat(text, width=80, indent=4)
+        if ri.analytics is not None:
+            text = analytics_report(ri.analytics) + "\n\n" + text
 
         dlg = ShowTextDialog(text, parent=self.window)
         dlg.exec()
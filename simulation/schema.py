@@ -1,15 +1,16 @@
 from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 
-from simulation.enums import (AlgorithmEnum, TrafficGeneratorEnum, UpPeakParams,
+from simulation.enums import (AlgorithmEnum, SimulationBackendEnum, EngineModeEnum, TrafficGeneratorEnum, UpPeakParams,
                               DownPeakParams, InterfloorParams, MixedPeakParams,
-                              UniformParams, FromFileParams)
+                              UniformParams, FromFileParams, TraceFieldEnum)
 
 
 class TrafficConfigSchema(BaseModel):
     generator_type: TrafficGeneratorEnum
     intensity: float = Field(ge=0, description="Mean passengers number per step")
     seed: int | None
+    vectorized: bool = Field(default=False, description="Draw the arrival process of the whole run at once")
 
     # Parameters specific for generator type
     up_peak_params: Optional[UpPeakParams] = None
@@ -44,6 +45,16 @@ class ElevatorConfigSchema(BaseModel):
     starting_floor: int
 
 
+class TraceSchema(BaseModel):
+    """
+    Per-step trace of a run, written next to its log (None in ConfigSchema - no trace).
+    Only the tick engine (engine.runner.run_simulation) writes traces, event-driven runs are not traced.
+    """
+    fields: List[TraceFieldEnum] = Field(default_factory=lambda: list(TraceFieldEnum),
+                                         description="Traced columns besides step and elevator_id")
+    flush_every: int = Field(default=10_000, ge=1, description="Steps buffered in memory per Parquet row group")
+
+
 class ConfigSchema(BaseModel):
     floors: int
     max_people_floor: int
@@ -52,4 +63,25 @@ class ConfigSchema(BaseModel):
     elevators: List[ElevatorConfigSchema]
     algorithm: AlgorithmEnum
     model: str | None = None
+    backend: SimulationBackendEnum = SimulationBackendEnum.OBJECT
+    engine: EngineModeEnum = EngineModeEnum.TICK
     traffic: TrafficConfigSchema
+    trace: Optional[TraceSchema] = None
+
+
+class SweepSchema(BaseModel):
+    """Grid of parameter values for a sweep over a base ConfigSchema (None keeps the base value)"""
+    n_elevators: Optional[List[int]] = None
+    speed: Optional[List[int]] = None
+    max_people: Optional[List[int]] = None
+    intensity: Optional[List[float]] = None
+    generator_type: Optional[List[TrafficGeneratorEnum]] = None
+    algorithm: Optional[List[AlgorithmEnum]] = None
+    replications: int = Field(default=1, ge=1, description="Seeded runs of every parameter combination")
+
+    @model_validator(mode='after')
+    def validate_generator_types(self):
+        unsupported = [t.value for t in self.generator_type or [] if not t.has_generator]
+        if unsupported:
+            raise ValueError(f"Traffic generators without an implementation: {', '.join(unsupported)}")
+        return self
@@ -0,0 +1,210 @@
+"""
+Binary format of Q-learning models (.qlm).
+
+Layout:
+    magic b"QLMODEL\\0" | version (uint32) | header length (uint32) | JSON header | padding to 64 bytes
+    keys:   (n_states,) fixed-width big-endian encode_state() keys ("S{key_bytes}"), sorted
+    values: (n_agents, n_states, n_actions) float32, row i of every agent belongs to keys[i]
+
+The header holds the format version, the building shape, the actions and the hyperparameters of every agent,
+and the offsets of the arrays. Both arrays are memory-mapped on load, so a model opens instantly and
+several processes reading the same file share its pages. States are looked up by binary search.
+
+Usage:
+    python -m simulation.training.agents.model_format database/models/q_learning/model_2_5.pkl
+converts a pickled model into a .qlm file next to it.
+"""
+import json
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, Tuple
+
+import numpy as np
+
+from simulation.utils import extract_params_suffix
+
+MAGIC = b"QLMODEL\0"
+VERSION = 1
+ALIGNMENT = 64
+MODEL_EXTENSION = ".qlm"
+
+
+class MappedQTable:
+    """
+    Read-only Q-table over memory-mapped arrays of a .qlm model. Unseen states read as zeros
+    and, unlike the defaultdict q_table, are not inserted.
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray):
+        self.keys_array = keys
+        self.values = values
+        self.key_bytes = keys.dtype.itemsize
+        self.zeros = np.zeros(values.shape[1], dtype=values.dtype)
+        self.zeros.flags.writeable = False
+
+    def __len__(self):
+        return len(self.keys_array)
+
+    def row(self, state) -> int:
+        """
+        :return: row of the state or -1 if the model does not know it
+        """
+        key = state.to_bytes(self.key_bytes, "big") if state.bit_length() <= 8 * self.key_bytes else None
+        if key is None:
+            return -1
+        row = int(np.searchsorted(self.keys_array, key))
+        # NumPy returns "S" items without their trailing zero bytes
+        if row < len(self.keys_array) and self.keys_array[row] == key.rstrip(b"\0"):
+            return row
+        return -1
+
+    def __contains__(self, state):
+        return self.row(state) >= 0
+
+    def __getitem__(self, state) -> np.ndarray:
+        row = self.row(state)
+        return self.values[row] if row >= 0 else self.zeros
+
+    def keys(self) -> List[int]:
+        return [int.from_bytes(key.ljust(self.key_bytes, b"\0"), "big") for key in self.keys_array.tolist()]
+
+    def items(self) -> Iterator[Tuple[Hashable, np.ndarray]]:
+        for row, state in enumerate(self.keys()):
+            yield state, self.values[row]
+
+    def to_dict(self) -> Dict[Hashable, np.ndarray]:
+        values = np.asarray(self.values, dtype=np.float64)
+        return {state: values[row] for row, state in enumerate(self.keys())}
+
+
+def save_model(agents, path, max_floor: int, n_elevators: int) -> Path:
+    """
+    Writes the agents into a .qlm file.
+    :param agents: list of QLearningAgent with encode_state() keyed Q-tables
+    :param path: output file
+    :param max_floor: highest floor of the building the agents were trained in
+    :param n_elevators: number of elevators of the building
+    :return: path of the written file
+    """
+    path = Path(path)
+    tables = [agent.q_table_dict() for agent in agents]
+    states = sorted(set().union(*tables))
+    key_bytes = max(1, (max((state.bit_length() for state in states), default=0) + 7) // 8)
+    n_actions = len(agents[0].actions)
+
+    keys = np.array([state.to_bytes(key_bytes, "big") for state in states], dtype=f"S{key_bytes}")
+    values = np.zeros((len(agents), len(states), n_actions), dtype=np.float32)
+    rows = {state: row for row, state in enumerate(states)}
+    for i, table in enumerate(tables):
+        if table:
+            values[i, [rows[state] for state in table]] = np.array(list(table.values()), dtype=np.float32)
+
+    header = {
+        "version": VERSION,
+        "max_floor": max_floor,
+        "n_elevators": n_elevators,
+        "actions": agents[0].actions,
+        "n_states": len(states),
+        "key_bytes": key_bytes,
+        "agents": [{
+            "alpha": agent.alpha,
+            "gamma": agent.gamma,
+            "epsilon": agent.epsilon,
+            "epsilon_decay": agent.epsilon_decay,
+            "q_table_type": agent.q_table_type.value,
+            "max_states": agent.max_states,
+        } for agent in agents],
+    }
+    # offsets depend on the header length, which depends on the offsets - reserve room for them first
+    header["keys_offset"] = header["values_offset"] = 0
+    prefix_len = len(MAGIC) + 8 + len(json.dumps(header).encode()) + 64
+    header["keys_offset"] = _align(prefix_len)
+    header["values_offset"] = _align(header["keys_offset"] + keys.nbytes)
+    header_bytes = json.dumps(header).encode()
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (header["keys_offset"] - f.tell()))
+        f.write(keys.tobytes())
+        f.write(b"\0" * (header["values_offset"] - f.tell()))
+        f.write(values.tobytes())
+    return path
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def read_header(path) -> dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Q-learning model file")
+        version, header_len = struct.unpack("<II", f.read(8))
+        if version > VERSION:
+            raise ValueError(f"Model format version {version} is newer than the supported {VERSION}")
+        return json.loads(f.read(header_len))
+
+
+def load_model(path, mmap=True):
+    """
+    Reads a .qlm model.
+    :param path: model file
+    :param mmap: True - read-only MappedQTables over the file (inference),
+                 False - agents with writable Q-tables of their saved type (further training)
+    :return: QLearningAgentsGroup
+    """
+    from simulation.training.agents.q_learning_agent import QLearningAgent, QLearningAgentsGroup
+
+    header = read_header(path)
+    n_states, n_actions = header["n_states"], len(header["actions"])
+    n_agents = len(header["agents"])
+
+    if n_states:
+        keys = np.memmap(path, dtype=f"S{header['key_bytes']}", mode="r", offset=header["keys_offset"],
+                         shape=(n_states,))
+        values = np.memmap(path, dtype=np.float32, mode="r", offset=header["values_offset"],
+                           shape=(n_agents, n_states, n_actions))
+    else:
+        keys = np.empty(0, dtype=f"S{header['key_bytes']}")
+        values = np.zeros((n_agents, 0, n_actions), dtype=np.float32)
+
+    agents = []
+    for i, params in enumerate(header["agents"]):
+        agent = QLearningAgent(header["actions"],
+                               alpha=params["alpha"],
+                               gamma=params["gamma"],
+                               epsilon=params["epsilon"],
+                               epsilon_decay=params["epsilon_decay"],
+                               q_table_type=params["q_table_type"],
+                               max_states=params["max_states"])
+        table = MappedQTable(keys, values[i])
+        if mmap:
+            agent.q_table = table
+        else:
+            agent.load_q_table(table.to_dict())
+        agents.append(agent)
+
+    return QLearningAgentsGroup(agents)
+
+
+def convert_pickle(pkl_path, out_path=None) -> Path:
+    """
+    Converts a pickled model (QLearningAgentsGroup.save_pickle or QLearningAgent pickles) into a .qlm file.
+    The building shape is taken from the _{n_elevators}_{max_floor} suffix of the file name.
+    """
+    from simulation.training.agents.q_learning_agent import QLearningAgentsGroup
+
+    pkl_path = Path(pkl_path)
+    group = QLearningAgentsGroup.load_pickle(pkl_path)
+    n_elevators, max_floor = extract_params_suffix(pkl_path.name)
+    if out_path is None:
+        out_path = pkl_path.with_suffix(MODEL_EXTENSION)
+    return save_model(group.agents, out_path, max_floor=max_floor, n_elevators=n_elevators or len(group.agents))
+
+
+if __name__ == "__main__":
+    for model_path in sys.argv[1:]:
+        print(f"Converted {model_path} -> {convert_pickle(model_path)}")
@@ -7,15 +7,42 @@ from pathlib import Path
 from typing import List
 import os
 from simulation import config
+from simulation.enums import QTableEnum
+from simulation.training.scripts.utils import pack_state_tuple
+from simulation.training.agents.replay_buffer import ReplayBuffer
+from simulation.training.agents.model_format import MODEL_EXTENSION, save_model, load_model
 
 TRAINING_ROOT = Path(__file__).resolve().parents[1]
 MODELS_DATABASE = Path(__file__).resolve().parents[3] / "database" / "models" / "q_learning"
 cfg = config.load_config()
 
 
+def packed_q_table(q_table_dict: dict, n_elevators: int) -> dict:
+    """
+    Older models are keyed by get_state() tuples, converts them to encode_state() keys.
+    """
+    if not q_table_dict or not isinstance(next(iter(q_table_dict)), tuple):
+        return q_table_dict
+    return {pack_state_tuple(state, n_elevators): q_values for state, q_values in q_table_dict.items()}
+
+
 class QLearningAgent:
-    def __init__(self, actions, alpha=0.1, gamma=0.95, epsilon=0.5, epsilon_decay=0, buffer_size=0):
-        self.q_table = defaultdict(lambda: np.zeros(len(actions)))
+    def __init__(self, actions, alpha=0.1, gamma=0.95, epsilon=0.5, epsilon_decay=0, buffer_size=0,
+                 q_table_type: QTableEnum = QTableEnum.DICT, max_states=None,
+                 replay: ReplayBuffer = None, batch_size=32):
+        """
+        :param buffer_size: number of transitions collected before they are all applied (0 - update every step)
+        :param q_table_type: storage of the Q-table, see QTableEnum
+        :param max_states: number of states a dense Q-table interns before falling back to hashed buckets
+        :param replay: experience replay buffer, every update then applies a sampled mini-batch
+                       (needs a dense Q-table without max_states, the buffer stores its row ids)
+        :param batch_size: size of the replayed mini-batches
+        """
+        if replay is not None and (QTableEnum(q_table_type) is not QTableEnum.DENSE or max_states is not None):
+            raise ValueError("Experience replay needs a dense Q-table without max_states.")
+        self.q_table_type = QTableEnum(q_table_type)
+        self.max_states = max_states
+        self.q_table = self.q_table_type.create(len(actions), max_states)
         self.actions = actions
         self.alpha = alpha
         self.gamma = gamma
@@ -24,6 +51,8 @@ class QLearningAgent:
         self.buffer = deque(maxlen=buffer_size)
         self.epsilon_decay = epsilon_decay
         self.epsilon_min = 0.05
+        self.replay = replay
+        self.batch_size = batch_size
 
     def choose_action(self, state):
         self.decay_epsilon()
@@ -32,6 +61,8 @@ class QLearningAgent:
         return int(np.argmax(self.q_table[state]))
 
     def update(self, state, action, reward, next_state):
+        if self.replay is not None:
+            return self.update_with_replay(state, action, reward, next_state)
         match self.buffer_size:
             case 0:
                 return self.update_no_buffer(state, action, reward, next_state)
@@ -46,12 +77,52 @@ class QLearningAgent:
                 state, action, reward, next_state = self.buffer.pop()
                 best_next = np.max(self.q_table[next_state])
                 old_value = self.q_table[state][action]
-                self.q_table[state][action] = old_value + self.alpha * (reward + self.gamma * best_next - old_value)
+                self.set_q_value(state, action, old_value + self.alpha * (reward + self.gamma * best_next - old_value))
+
+    def update_with_replay(self, state, action, reward, next_state):
+        """
+        Stores the transition and applies one TD update of a mini-batch sampled from the replay buffer.
+        """
+        table = self.q_table
+        self.replay.add(table.row(state), action, reward, table.row(next_state))
+        if len(self.replay) < self.batch_size:
+            return
+
+        idx, states, actions, rewards, next_states, weights = self.replay.sample(self.batch_size)
+        values = table.values
+        best_next = values[next_states].max(axis=1)
+        old_values = values[states, actions]
+        td_errors = rewards + self.gamma * best_next - old_values
+        values[states, actions] = old_values + self.alpha * weights * td_errors
+        self.replay.update_priorities(idx, td_errors)
 
     def update_no_buffer(self, state, action, reward, next_state):
         best_next = np.max(self.q_table[next_state])
         old_value = self.q_table[state][action]
-        self.q_table[state][action] = old_value + self.alpha * (reward + self.gamma * best_next - old_value)
+        self.set_q_value(state, action, old_value + self.alpha * (reward + self.gamma * best_next - old_value))
+
+    def set_q_value(self, state, action, value):
+        """
+        Writes one Q-value. The array tables remember which state owns a row only on writes.
+        """
+        if self.q_table_type is QTableEnum.DICT:
+            self.q_table[state][action] = value
+        else:
+            self.q_table.write(state, action, value)
+
+    def load_q_table(self, q_table_dict):
+        """
+        Fills the Q-table of the agent with {state: q_values} (the pickled format).
+        """
+        if self.q_table_type is QTableEnum.DICT:
+            self.q_table = defaultdict(lambda: np.zeros(len(self.actions)), q_table_dict)
+        else:
+            self.q_table.update(q_table_dict)
+
+    def q_table_dict(self) -> dict:
+        if isinstance(self.q_table, dict):
+            return dict(self.q_table)
+        return self.q_table.to_dict()
 
     def decay_epsilon(self):
         if self.epsilon < self.epsilon_min:  # in case we want 0 epsilon for control
@@ -84,6 +155,24 @@ class QLearningAgent:
         wb.save(path)
         print(f"Q-table saved to {path}")
 
+    @classmethod
+    def from_params(cls, actions, params, seed=None) -> "QLearningAgent":
+        """
+        :param actions: actions of the agent
+        :param params: QLearningParamsSchema from the training config
+        :param seed: seed of the replay buffer sampling
+        """
+        replay = params.replay.create_buffer(seed) if params.replay is not None else None
+        return cls(actions,
+                   alpha=params.alpha,
+                   gamma=params.gamma,
+                   epsilon=params.starting_epsilon,
+                   epsilon_decay=params.epsilon_decay,
+                   q_table_type=params.q_table,
+                   max_states=params.max_states,
+                   replay=replay,
+                   batch_size=params.replay.batch_size if params.replay is not None else 32)
+
     @classmethod
     def load(cls, path: str, alpha=None, gamma=None, epsilon=None):
         with open(path, "rb") as f:
@@ -96,7 +185,7 @@ class QLearningAgent:
             epsilon = epsilon_load
         agent = cls(actions, alpha, gamma, epsilon)
 
-        agent.q_table = defaultdict(lambda: np.zeros(len(actions)), q_table_dict)
+        agent.load_q_table(packed_q_table(q_table_dict, n_elevators=1))
         return agent
 
 
@@ -105,17 +194,34 @@ class QLearningAgentsGroup:
         self.agents = agents
 
     def save(self, filename: str) -> str:
+        """
+        Saves the agents into a .qlm model file (see model_format) in database/models/q_learning.
+        your_name_{n_elevators}_{n_floors}.qlm
+        :param filename: Name of the model. Don't add extension here.
+        :return: path of the saved model
+        """
+        suffix = "_" + str(len(cfg.elevators)) + "_" + str(cfg.floors)
+        whole_path = os.path.join(MODELS_DATABASE, filename + suffix + MODEL_EXTENSION)
+        save_model(self.agents, whole_path, max_floor=cfg.floors, n_elevators=len(cfg.elevators))
+        return whole_path
+
+    def save_pickle(self, filename: str) -> str:
+        """
+        Saves the agents in the older pickled format (your_name_{n_elevators}_{n_floors}.pkl).
+        """
         suffix = "_" + str(len(cfg.elevators)) + "_" + str(cfg.floors)
         whole_path = os.path.join(MODELS_DATABASE, filename + suffix + ".pkl")
 
         data = []
         for agent in self.agents:
             data.append({
-                "q_table": dict(agent.q_table),
+                "q_table": agent.q_table_dict(),
                 "actions": agent.actions,
                 "alpha": agent.alpha,
                 "gamma": agent.gamma,
-                "epsilon": agent.epsilon
+                "epsilon": agent.epsilon,
+                "q_table_type": agent.q_table_type.value,
+                "max_states": agent.max_states
             })
 
         with open(whole_path, "wb") as f:
@@ -124,9 +230,22 @@ class QLearningAgentsGroup:
         return whole_path
 
     @classmethod
-    def load(cls, path: str):
+    def load(cls, path: str, mmap=False):
+        """
+        Loads a .qlm model or a pickled .pkl model.
+        :param mmap: memory-map the Q-tables of a .qlm model read-only (for evaluation, the agents cannot be
+            trained further)
+        """
+        if str(path).endswith(".pkl"):
+            return cls.load_pickle(path)
+        return load_model(path, mmap=mmap)
+
+    @classmethod
+    def load_pickle(cls, path: str):
         with open(path, "rb") as f:
             loaded = pickle.load(f)
+        if isinstance(loaded, tuple):  # pickle of a single QLearningAgent
+            return cls([QLearningAgent.load(path)])
 
         agents = []
         for entry in loaded:
@@ -134,9 +253,11 @@ class QLearningAgentsGroup:
                 actions=entry["actions"],
                 alpha=entry["alpha"],
                 gamma=entry["gamma"],
-                epsilon=entry["epsilon"]
+                epsilon=entry["epsilon"],
+                q_table_type=entry.get("q_table_type", QTableEnum.DICT),
+                max_states=entry.get("max_states")
             )
-            agent.q_table = defaultdict(lambda: np.zeros(len(entry["actions"])), entry["q_table"])
+            agent.load_q_table(packed_q_table(entry["q_table"], n_elevators=len(loaded)))
             agents.append(agent)
 
         return cls(agents)
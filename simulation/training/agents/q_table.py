@@ -0,0 +1,173 @@
+from typing import Dict, Hashable, Iterator, Tuple
+
+import numpy as np
+
+
+def hashed_row(state, n_buckets: int) -> int:
+    """
+    Bucket of a state in a hashed Q-table. Hash of an int is the int itself (mod 2**61 - 1),
+    wrapping it in a tuple mixes all its bits. The value is the same in every process.
+    """
+    return hash((state,)) % n_buckets
+
+
+class StateIndex:
+    """
+    Interning of states: every distinct state key gets a dense row id (0, 1, 2, ...) the first time it is seen.
+    """
+
+    def __init__(self):
+        self.rows: Dict[Hashable, int] = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, state):
+        return state in self.rows
+
+    def intern(self, state) -> int:
+        row = self.rows.get(state)
+        if row is None:
+            row = len(self.rows)
+            self.rows[state] = row
+        return row
+
+    def find(self, state) -> int:
+        """
+        :return: row id of the state or -1 if it was never seen (without interning it)
+        """
+        return self.rows.get(state, -1)
+
+    def keys(self):
+        return self.rows.keys()
+
+
+class DenseQTable:
+    """
+    Q-table stored as one contiguous float32 (n_states, n_actions) matrix indexed by interned state rows.
+    Behaves like the defaultdict q_table of QLearningAgent: an unseen state reads as a row of zeros
+    and q_table.write(state, action, value) writes into the matrix.
+
+    With max_states set, states seen after the first max_states ones are not interned anymore but
+    share the rows of a bounded HashedQTable, so memory stays bounded for huge state spaces.
+    """
+
+    def __init__(self, n_actions: int, capacity=1024, max_states: int | None = None, overflow_buckets=65536):
+        self.n_actions = n_actions
+        self.index = StateIndex()
+        self.values = np.zeros((capacity, n_actions), dtype=np.float32)
+
+        self.max_states = max_states
+        self.overflow = HashedQTable(n_actions, overflow_buckets) if max_states is not None else None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, state):
+        return state in self.index
+
+    def __getitem__(self, state) -> np.ndarray:
+        row = self.row(state)
+        if row < 0:
+            return self.overflow[state]
+        return self.values[row]
+
+    def __setitem__(self, state, q_values):
+        row = self.row(state)
+        if row < 0:
+            self.overflow[state] = q_values
+        else:
+            self.values[row] = q_values
+
+    def write(self, state, action: int, value):
+        row = self.row(state)
+        if row < 0:
+            self.overflow.write(state, action, value)
+        else:
+            self.values[row, action] = value
+
+    def _grow(self):
+        grown = np.zeros((2 * self.values.shape[0], self.n_actions), dtype=np.float32)
+        grown[:len(self.index)] = self.values[:len(self.index)]
+        self.values = grown
+
+    def row(self, state) -> int:
+        """
+        :return: row id of the state, interned if needed, -1 if it lives in the overflow table
+        """
+        row = self.index.find(state)
+        if row >= 0:
+            return row
+        if self.max_states is not None and len(self.index) >= self.max_states:
+            return -1
+        if len(self.index) == self.values.shape[0]:
+            self._grow()
+        return self.index.intern(state)
+
+    def keys(self):
+        return self.index.keys()
+
+    def items(self) -> Iterator[Tuple[Hashable, np.ndarray]]:
+        for state, row in self.index.rows.items():
+            yield state, self.values[row]
+
+    def update(self, q_table):
+        for state, q_values in q_table.items():
+            self[state] = q_values
+
+    def to_dict(self) -> Dict[Hashable, np.ndarray]:
+        """
+        :return: copy of the interned states as {state: q_values}, the format of pickled models
+        """
+        matrix = self.values[:len(self.index)].astype(np.float64)
+        return {state: matrix[row] for state, row in self.index.rows.items()}
+
+
+class HashedQTable:
+    """
+    Bounded Q-table: states are hashed into a fixed number of buckets, states sharing a bucket
+    share their Q-values. Only the last state written into every bucket is remembered for items(),
+    reading a state does not change the owner of its bucket.
+    """
+
+    def __init__(self, n_actions: int, n_buckets=1 << 20):
+        self.n_actions = n_actions
+        self.n_buckets = n_buckets
+        self.values = np.zeros((n_buckets, n_actions), dtype=np.float32)
+        self.states = np.full(n_buckets, None, dtype=object)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.states != None))  # noqa: E711
+
+    def __contains__(self, state):
+        return self.states[self.row(state)] == state
+
+    def __getitem__(self, state) -> np.ndarray:
+        return self.values[self.row(state)]
+
+    def __setitem__(self, state, q_values):
+        row = self.row(state)
+        self.states[row] = state
+        self.values[row] = q_values
+
+    def write(self, state, action: int, value):
+        row = self.row(state)
+        self.states[row] = state
+        self.values[row, action] = value
+
+    def row(self, state) -> int:
+        return hashed_row(state, self.n_buckets)
+
+    def keys(self):
+        return [state for state in self.states if state is not None]
+
+    def items(self) -> Iterator[Tuple[Hashable, np.ndarray]]:
+        for row in np.flatnonzero(self.states != None).tolist():  # noqa: E711
+            yield self.states[row], self.values[row]
+
+    def update(self, q_table):
+        for state, q_values in q_table.items():
+            self[state] = q_values
+
+    def to_dict(self) -> Dict[Hashable, np.ndarray]:
+        return {state: q_values.astype(np.float64) for state, q_values in self.items()}
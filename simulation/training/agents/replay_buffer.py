@@ -0,0 +1,189 @@
+import json
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of transitions (state row, action, reward, next state row) kept in NumPy arrays.
+    States are row ids of a DenseQTable. Sampling is uniform.
+    """
+
+    def __init__(self, capacity: int, seed: int | None = None):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+
+        self.position = 0  # index the next transition is written to
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state: int, action: int, reward: float, next_state: int):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def sample(self, batch_size: int) -> Tuple[np.ndarray, ...]:
+        """
+        :return: (indices, states, actions, rewards, next_states, importance weights)
+        """
+        idx = self.rng.integers(0, self.size, batch_size)
+        return idx, self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], \
+            np.ones(batch_size, dtype=np.float32)
+
+    def update_priorities(self, idx: np.ndarray, td_errors: np.ndarray):
+        """Uniform sampling does not use priorities."""
+        pass
+
+    # ------------------ checkpoints ------------------
+
+    def _arrays(self) -> dict:
+        size = self.size
+        return {
+            "states": self.states[:size],
+            "actions": self.actions[:size],
+            "rewards": self.rewards[:size],
+            "next_states": self.next_states[:size],
+        }
+
+    def _meta(self) -> dict:
+        return {
+            "type": type(self).__name__,
+            "capacity": self.capacity,
+            "position": self.position,
+            "size": self.size,
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def save(self, path) -> Path:
+        """
+        Saves the transitions, the write position and the RNG state into an .npz file.
+        """
+        path = Path(path)
+        np.savez(path, meta=np.array(json.dumps(self._meta())), **self._arrays())
+        return path if path.suffix == ".npz" else path.with_name(path.name + ".npz")
+
+    @classmethod
+    def load(cls, path) -> "ReplayBuffer":
+        """
+        Restores a buffer saved with save(), of the class it was saved from.
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            buffer_cls = {c.__name__: c for c in (ReplayBuffer, PrioritizedReplayBuffer)}[meta["type"]]
+            buffer = buffer_cls._from_meta(meta)
+            buffer._restore(meta, data)
+        return buffer
+
+    @classmethod
+    def _from_meta(cls, meta: dict) -> "ReplayBuffer":
+        return cls(meta["capacity"])
+
+    def _restore(self, meta: dict, data):
+        size = meta["size"]
+        self.states[:size] = data["states"]
+        self.actions[:size] = data["actions"]
+        self.rewards[:size] = data["rewards"]
+        self.next_states[:size] = data["next_states"]
+        self.position = meta["position"]
+        self.size = size
+        self.rng.bit_generator.state = meta["rng"]
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Proportional prioritized replay: transition i is sampled with probability p_i^alpha / sum_j p_j^alpha,
+    where p_i is its last absolute TD error. Priorities are kept in a sum-tree, so sampling
+    and updates of a batch cost O(batch * log(capacity)) NumPy operations.
+    Importance-sampling weights (N * P(i))^-beta / max are returned with every batch, beta grows to 1
+    by beta_increment per sampled batch.
+    """
+
+    def __init__(self, capacity: int, alpha=0.6, beta=0.4, beta_increment=0.0, epsilon=1e-3,
+                 seed: int | None = None):
+        super().__init__(capacity, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+
+        self.tree_size = 1 << max(0, (capacity - 1).bit_length())  # number of leaves, power of two
+        self.tree = np.zeros(2 * self.tree_size, dtype=np.float64)  # node i has children 2i and 2i+1, root is 1
+        self.max_priority = 1.0
+
+    def _set_priorities(self, idx: np.ndarray, priorities: np.ndarray):
+        nodes = np.asarray(idx, dtype=np.int64) + self.tree_size
+        self.tree[nodes] = priorities
+        nodes //= 2
+        while nodes[0] >= 1:  # all nodes are on the same level, a repeated node gets the same sum
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes //= 2
+
+    def add(self, state: int, action: int, reward: float, next_state: int):
+        i = super().add(state, action, reward, next_state)
+        # a single leaf is cheaper to propagate with plain Python
+        tree = self.tree
+        node = i + self.tree_size
+        tree[node] = self.max_priority ** self.alpha
+        node //= 2
+        while node >= 1:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+        return i
+
+    def sample(self, batch_size: int) -> Tuple[np.ndarray, ...]:
+        total = self.tree[1]
+        # one value from every of batch_size equal segments of [0, total)
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+
+        nodes = np.ones(batch_size, dtype=np.int64)
+        while nodes[0] < self.tree_size:
+            left = self.tree[2 * nodes]
+            go_right = values >= left
+            values = np.where(go_right, values - left, values)
+            nodes = 2 * nodes + go_right
+        idx = np.minimum(nodes - self.tree_size, self.size - 1)
+
+        probabilities = self.tree[idx + self.tree_size] / total
+        weights = (self.size * np.maximum(probabilities, 1e-12)) ** -self.beta
+        weights = (weights / weights.max()).astype(np.float32)
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return idx, self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], weights
+
+    def update_priorities(self, idx: np.ndarray, td_errors: np.ndarray):
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self._set_priorities(idx, priorities ** self.alpha)
+
+    # ------------------ checkpoints ------------------
+
+    def _arrays(self) -> dict:
+        return {**super()._arrays(), "tree": self.tree}
+
+    def _meta(self) -> dict:
+        return {**super()._meta(), "alpha": self.alpha, "beta": self.beta, "beta_increment": self.beta_increment,
+                "epsilon": self.epsilon, "max_priority": self.max_priority}
+
+    @classmethod
+    def _from_meta(cls, meta: dict) -> "PrioritizedReplayBuffer":
+        return cls(meta["capacity"], alpha=meta["alpha"], beta=meta["beta"], beta_increment=meta["beta_increment"],
+                   epsilon=meta["epsilon"])
+
+    def _restore(self, meta: dict, data):
+        super()._restore(meta, data)
+        self.tree[:] = data["tree"]
+        self.max_priority = meta["max_priority"]
@@ -1,12 +1,46 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
+from simulation.enums import QTableEnum
+
+
+class ReplayParamsSchema(BaseModel):
+    capacity: int = Field(100_000, ge=1)
+    batch_size: int = Field(32, ge=1)
+    prioritized: bool = False
+    alpha: float = 0.6
+    beta: float = 0.4
+    beta_increment: float = 0.0
+
+    def create_buffer(self, seed: int | None = None):
+        from simulation.training.agents.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+        if self.prioritized:
+            return PrioritizedReplayBuffer(self.capacity, alpha=self.alpha, beta=self.beta,
+                                           beta_increment=self.beta_increment, seed=seed)
+        return ReplayBuffer(self.capacity, seed=seed)
+
 
 class QLearningParamsSchema(BaseModel):
     alpha: float
     gamma: float
     starting_epsilon: float
     epsilon_decay: float
+    q_table: QTableEnum = QTableEnum.DICT
+    max_states: Optional[int] = None
+    replay: Optional[ReplayParamsSchema] = None
+
+
+class EarlyStoppingSchema(BaseModel):
+    window: int = Field(20, ge=1, description="Episodes averaged into the moving average of the reward")
+    patience: int = Field(50, ge=1, description="Episodes without improvement of the moving average before stopping")
+    min_delta: float = Field(0.0, ge=0, description="Smallest rise of the moving average counted as improvement")
+
+
+class SessionParamsSchema(BaseModel):
+    checkpoint_every: int = Field(10, ge=0, description="Episodes between checkpoints (0 - no checkpoints)")
+    keep_checkpoints: int = Field(3, ge=1, description="Number of the newest checkpoints kept on disk")
+    early_stopping: Optional[EarlyStoppingSchema] = None
+
 
 class RewardMultipliersSchema(BaseModel):
     penalty_outside: float
@@ -22,3 +56,4 @@ class TrainingConfigSchema(BaseModel):
     steps_per_episode: int
     q_learning_params: Optional[QLearningParamsSchema] = None
     reward_params: RewardMultipliersSchema
+    session: SessionParamsSchema = Field(default_factory=SessionParamsSchema)
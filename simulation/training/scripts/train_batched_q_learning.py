@@ -0,0 +1,215 @@
+from simulation import config
+from simulation.core.batched_system import BatchedElevatorSystems
+from simulation.engine.batched_operator import BatchedTraffic, batched_operator
+from simulation.engine.replications import replication_seeds
+from simulation.schema import ConfigSchema
+from simulation.training.agents.q_learning_agent import QLearningAgent, QLearningAgentsGroup
+from simulation.training.agents.q_table import StateIndex
+from simulation.training.config import load_training_config
+from simulation.training.scripts.utils import encode_batched_states, BatchedIncrementalReward, decay_epsilon
+
+from typing import List, Tuple
+import math
+import numpy as np
+
+cfg = config.load_config()
+
+ACTIONS = ["UP", "DOWN", "STANDING"]
+MOVES = {"UP": 1, "DOWN": -1, "STANDING": 0}  # actions as the moves of batched_operator
+
+
+class BatchedQTables:
+    """
+    Q-tables of a group of agents kept in one (n_agents, n_states, n_actions) float32 array.
+    States are interned by a StateIndex, a state has the same row in the tables of every agent.
+    """
+
+    def __init__(self, agents: List[QLearningAgent], capacity=4096):
+        self.n_actions = len(agents[0].actions)
+        self.index = StateIndex()
+        self.values = np.zeros((len(agents), capacity, self.n_actions), dtype=np.float32)
+
+        for i, agent in enumerate(agents):
+            for state, q_values in agent.q_table.items():
+                row = self.intern(state)  # may grow self.values
+                self.values[i, row] = q_values
+
+    def reserve(self, n_states: int):
+        """Grows the tables (doubling them) until they have rows for n_states states."""
+        capacity = self.values.shape[1]
+        if n_states <= capacity:
+            return
+        while capacity < n_states:
+            capacity *= 2
+        grown = np.zeros((self.values.shape[0], capacity, self.n_actions), dtype=np.float32)
+        grown[:, :self.values.shape[1]] = self.values
+        self.values = grown
+
+    def intern(self, state) -> int:
+        row = self.index.intern(state)
+        self.reserve(row + 1)
+        return row
+
+    def intern_all(self, states: List[int]) -> np.ndarray:
+        """Rows of a batch of states, new states are interned in batch order."""
+        index = self.index.rows
+        rows = list(map(index.get, states))
+        if None in rows:
+            for i, row in enumerate(rows):
+                if row is None:
+                    rows[i] = index.setdefault(states[i], len(index))
+            self.reserve(len(index))
+        return np.array(rows, dtype=np.int64)
+
+    def update(self, agents: np.ndarray, rows: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+               next_rows: np.ndarray, alpha: np.ndarray, gamma: np.ndarray):
+        """
+        TD updates of a batch of transitions, the targets are computed from the tables before the batch.
+        Several updates of one (agent, state, action) are applied one after another in batch order,
+        as QLearningAgent.update would apply them: with k targets t_0..t_k-1 the value becomes
+        (1 - alpha)^k * Q + sum_j alpha * (1 - alpha)^(k-1-j) * t_j.
+        :param agents: agent of every transition
+        :param alpha: learning rate of every agent
+        :param gamma: discount of every agent
+        """
+        values = self.values.reshape(-1)
+        targets = rewards + gamma[agents] * self.values[agents, next_rows].max(axis=1)
+        cells = (agents * self.values.shape[1] + rows) * self.n_actions + actions
+
+        order = np.argsort(cells, kind="stable")
+        cells, targets, rate = cells[order], targets[order], alpha[agents[order]]
+        first = np.ones(len(cells), dtype=bool)
+        first[1:] = cells[1:] != cells[:-1]
+        if first.all():
+            values[cells] += rate * (targets - values[cells])
+            return
+
+        index = np.arange(len(cells))
+        group = np.cumsum(first) - 1
+        counts = np.bincount(group)
+        rank = index - np.maximum.accumulate(np.where(first, index, 0))
+        keep = 1 - rate
+        weighted = rate * keep ** (counts[group] - 1 - rank) * targets
+        cells, keep = cells[first], keep[first]
+        values[cells] = keep ** counts * values[cells] + np.bincount(group, weights=weighted)
+
+    def write_back(self, agents: List[QLearningAgent]):
+        """Copies the learnt values into the q_tables of the agents (for saving and the controller)."""
+        n_states = len(self.index)
+        for i, agent in enumerate(agents):
+            agent.q_table.update(dict(zip(self.index.keys(), self.values[i, :n_states].astype(np.float64))))
+
+
+def environment_configs(n_envs: int, base_seed: int | None) -> List[ConfigSchema]:
+    """Copies of the simulation config with independent traffic seeds."""
+    configs = []
+    for seed in replication_seeds(n_envs, base_seed):
+        env_config = cfg.model_copy(deep=True)
+        env_config.traffic.seed = seed
+        configs.append(env_config)
+    return configs
+
+
+def train_q_learning_batched(episodes=100,
+                             steps=200,
+                             agents_group: QLearningAgentsGroup = None,
+                             n_envs=256,
+                             seed: int | None = None) -> Tuple[QLearningAgentsGroup, float]:
+    """
+    train_q_learning over n_envs independent buildings simulated in lockstep.
+
+    The buildings are BatchedElevatorSystems stepped by batched_operator, their states are encoded
+    (encode_batched_states) and rewarded (BatchedIncrementalReward) for the whole batch at once, so a step
+    costs a fixed number of NumPy calls whatever n_envs is. The states are interned into row ids of
+    BatchedQTables, epsilon-greedy selection and TD updates of every agent are done with fancy indexing.
+    Replay buffers of the agents are not used, the batch of buildings plays their role.
+    Traffic of the buildings is drawn with PresampledTraffic.sample, whatever config.traffic.vectorized is.
+    :param episodes: number of episodes, every episode starts n_envs empty buildings
+    :param steps: steps per episode
+    :param agents_group: agents to train, one per elevator
+    :param n_envs: number of buildings in the batch
+    :param seed: base seed of the traffic of the buildings and of the exploration
+    :return: trained agents and the mean reward of an episode (per building)
+    """
+    if agents_group is None:
+        raise ValueError("No agents passed.")
+
+    agents = agents_group.agents
+    if len(agents) != len(cfg.elevators):
+        raise ValueError("Number of agents must equal number of elevators.")
+
+    rng = np.random.default_rng(seed)
+    tables = BatchedQTables(agents)
+    n_actions = tables.n_actions
+    moves = np.array([MOVES[action] for action in agents[0].actions])
+
+    alpha = np.array([agent.alpha for agent in agents], dtype=np.float64)
+    gamma = np.array([agent.gamma for agent in agents], dtype=np.float64)
+    epsilon = np.array([agent.epsilon for agent in agents], dtype=np.float64)
+    epsilon_decay = np.array([agent.epsilon_decay for agent in agents], dtype=np.float64)
+    epsilon_min = np.array([agent.epsilon_min for agent in agents], dtype=np.float64)
+    agent_ids = np.arange(len(agents))
+
+    whole_reward = 0
+
+    for ep in range(episodes):
+        env_configs = environment_configs(n_envs, None if seed is None else seed + ep)
+        systems = BatchedElevatorSystems.from_config(cfg, n_envs)
+        traffic = BatchedTraffic(env_configs, steps)
+
+        step_reward = BatchedIncrementalReward()
+        step_reward.reset(systems)
+        rows = tables.intern_all(encode_batched_states(systems))
+        reward_sums = np.zeros(n_envs)
+
+        for step in range(steps):
+            flags = systems.delay == 0  # (n_envs, n_agents)
+
+            epsilon = decay_epsilon(epsilon, epsilon_decay, epsilon_min, flags.sum(axis=0))
+            greedy = tables.values[agent_ids, rows[:, None]].argmax(axis=2)
+            explore = rng.random(flags.shape) < epsilon
+            action_indices = np.where(explore, rng.integers(0, n_actions, flags.shape), greedy)
+
+            systems = batched_operator(moves[action_indices], systems, step, traffic)
+            rewards = step_reward(systems)
+            next_rows = tables.intern_all(encode_batched_states(systems))
+
+            # TD update of every (building, agent) pair that chose an action
+            env_idx, agent_idx = np.nonzero(flags)
+            tables.update(agent_idx, rows[env_idx], action_indices[env_idx, agent_idx], rewards[env_idx],
+                          next_rows[env_idx], alpha, gamma)
+
+            reward_sums += rewards
+            rows = next_rows
+
+        print(f"Episode {ep + 1}/{episodes} finished. Mean reward of {n_envs} buildings: {reward_sums.mean()}")
+        whole_reward += reward_sums.mean()
+
+    for agent, agent_epsilon in zip(agents, epsilon):
+        agent.epsilon = float(agent_epsilon)
+    tables.write_back(agents)
+
+    return QLearningAgentsGroup(agents), whole_reward / episodes
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batched Q-learning training driven by the training config.")
+    parser.add_argument("--n-envs", type=int, default=256, help="number of buildings simulated in lockstep")
+    args = parser.parse_args()
+
+    training_cfg = load_training_config()
+    params = training_cfg.q_learning_params
+
+    group = QLearningAgentsGroup([QLearningAgent.from_params(ACTIONS, params) for _ in cfg.elevators])
+
+    # the episodes of the config are building episodes, a batch runs n_envs of them
+    trained_group, reward = train_q_learning_batched(
+        episodes=math.ceil(training_cfg.episodes / args.n_envs),
+        steps=training_cfg.steps_per_episode,
+        agents_group=group,
+        n_envs=args.n_envs
+    )
+    print(f"Mean reward: {reward}")
+    print(f"Saved as {trained_group.save(training_cfg.save_name)}")
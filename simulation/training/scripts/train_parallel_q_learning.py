@@ -0,0 +1,275 @@
+from simulation import config
+from simulation.engine.presampled_traffic import make_generator
+from simulation.engine.replications import replication_seeds
+from simulation.engine.sweep import DEFAULT_GENERATOR_PARAMS
+from simulation.enums import QTableEnum, TrafficGeneratorEnum
+from simulation.schema import ConfigSchema
+from simulation.training.agents.q_learning_agent import QLearningAgent, QLearningAgentsGroup
+from simulation.training.agents.q_table import DenseQTable, hashed_row
+from simulation.training.config import load_training_config
+from simulation.training.scripts.utils import encode_state, IncrementalReward, decay_epsilon
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Set, Tuple
+import os
+import random
+import time
+import numpy as np
+
+cfg = config.load_config()
+
+ACTIONS = ["UP", "DOWN", "STANDING"]
+BUCKETS_PER_STATE = 16  # with n states in 16n buckets about n / 32 of them share a bucket
+MAX_BUCKETS = 1 << 22
+
+
+def buckets_for(expected_states: int) -> int:
+    """
+    :return: power of two number of buckets for the expected number of distinct states, at most MAX_BUCKETS
+    """
+    return min(MAX_BUCKETS, 1 << max(10, (BUCKETS_PER_STATE * expected_states - 1).bit_length()))
+
+
+class SharedQTables:
+    """
+    Q-tables of a group of agents as one (n_agents, n_buckets, n_actions) float32 array in shared memory.
+    States are hashed into buckets as in HashedQTable, so every process finds the same row without
+    a shared index. No keys are stored: states hashed into the same bucket share (alias) their Q-values,
+    see collect_agents. The process that creates the block (name=None) owns it and unlinks it on close().
+    """
+
+    def __init__(self, shape, name: str | None = None):
+        self.shape = tuple(shape)
+        self.owner = name is None
+        size = int(np.prod(self.shape)) * np.dtype(np.float32).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.values = np.ndarray(self.shape, dtype=np.float32, buffer=self.shm.buf)
+        if self.owner:
+            self.values[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def row(self, state) -> int:
+        return hashed_row(state, self.shape[1])
+
+    def close(self):
+        self.values = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+_TABLES: SharedQTables | None = None  # Q-tables attached by a worker process
+
+
+def _attach(name: str, shape):
+    global _TABLES
+    _TABLES = SharedQTables(shape, name=name)
+
+
+def _run_episode(env_config: ConfigSchema, steps: int, epsilon: List[float], alpha: List[float],
+                 gamma: List[float], seed: int) -> dict:
+    """
+    One training episode of a worker. TD updates are written straight into the shared Q-tables,
+    without locks (Hogwild): concurrent updates of the same entry may overwrite each other.
+    """
+    values = _TABLES.values
+    n_agents, _, n_actions = values.shape
+    rng = random.Random(seed)
+
+    system = env_config.backend.build_system(env_config)
+    step_operator = env_config.backend.get_operator()
+    generate = make_generator(env_config, steps)
+    step_reward = IncrementalReward()
+    step_reward.reset(system)
+
+    state = encode_state(system)
+    row = _TABLES.row(state)
+    seen = {state}
+    calls = [0] * n_agents
+    reward_sum = 0.0
+
+    for step in range(steps):
+        action_indices = []
+        for i, elevator in enumerate(system.elevators):
+            if elevator.delay != 0:
+                action_indices.append(-1)
+                continue
+            calls[i] += 1
+            if rng.random() < epsilon[i]:
+                action_indices.append(rng.randrange(n_actions))
+            else:
+                action_indices.append(int(values[i, row].argmax()))
+
+        actions = [ACTIONS[a] if a >= 0 else "STANDING" for a in action_indices]
+        system = step_operator(actions, system, step, generate=generate)
+
+        reward = step_reward(system)
+        next_state = encode_state(system)
+        next_row = _TABLES.row(next_state)
+        seen.add(next_state)
+
+        for i, action in enumerate(action_indices):
+            if action >= 0:
+                old_value = values[i, row, action]
+                values[i, row, action] = old_value + alpha[i] * (reward + gamma[i] * values[i, next_row].max()
+                                                                 - old_value)
+
+        row = next_row
+        reward_sum += reward
+
+    return {"reward": reward_sum, "calls": calls, "states": seen}
+
+
+def worker_config(seed: int, generator_type: TrafficGeneratorEnum | None = None) -> ConfigSchema:
+    """Copy of the simulation config with its own traffic seed and (optionally) traffic generator."""
+    env_config = cfg.model_copy(deep=True)
+    env_config.traffic.seed = seed
+    if generator_type is not None:
+        generator_type = TrafficGeneratorEnum(generator_type)
+        env_config.traffic.generator_type = generator_type
+        if generator_type in DEFAULT_GENERATOR_PARAMS:
+            field, params_cls = DEFAULT_GENERATOR_PARAMS[generator_type]
+            if getattr(env_config.traffic, field) is None:
+                setattr(env_config.traffic, field, params_cls())
+    return env_config
+
+
+def collect_agents(agents: List[QLearningAgent], tables: SharedQTables, states: Set[int],
+                   epsilon: np.ndarray) -> QLearningAgentsGroup:
+    """
+    Copies the shared Q-values of every visited state into dense Q-tables of the agents.
+    States that shared a bucket during training get the same (aliased) Q-values, their number is reported.
+    """
+    states = sorted(states)
+    rows = [tables.row(state) for state in states]
+    aliased = len(states) - len(set(rows))
+    if aliased:
+        print(f"[PARALLEL] {aliased} of {len(states)} visited states share their bucket (and Q-values) "
+              f"with another state, raise n_buckets (now {tables.shape[1]})")
+    for i, agent in enumerate(agents):
+        table = DenseQTable(len(agent.actions), capacity=max(1, len(states)))
+        for state in states:
+            table.index.intern(state)
+        table.values[:len(states)] = tables.values[i, rows]
+
+        agent.q_table_type = QTableEnum.DENSE
+        agent.max_states = None
+        agent.q_table = table
+        agent.epsilon = float(epsilon[i])
+    return QLearningAgentsGroup(agents)
+
+
+def train_q_learning_parallel(episodes=100,
+                              steps=200,
+                              agents_group: QLearningAgentsGroup = None,
+                              n_workers: int | None = None,
+                              n_buckets: int | None = None,
+                              generator_types: List[TrafficGeneratorEnum] | None = None,
+                              seed: int | None = None,
+                              checkpoint_every=0,
+                              checkpoint_name="parallel") -> Tuple[QLearningAgentsGroup, float]:
+    """
+    Hogwild-style train_q_learning: n_workers processes simulate their own buildings (own traffic seeds,
+    generators assigned round-robin from generator_types) and update one Q-table per agent placed in shared memory.
+
+    The coordinator runs the episodes in rounds of n_workers. Between rounds it decays epsilon by the number
+    of actions the agents chose (within an episode epsilon is constant), prints progress and every
+    checkpoint_every rounds saves the agents as {checkpoint_name}_checkpoint.
+    :param episodes: number of episodes in total
+    :param steps: steps per episode
+    :param agents_group: agents to train, one per elevator; their Q-values are the starting point
+    :param n_workers: number of worker processes (default: number of CPUs)
+    :param n_buckets: rows of the shared hashed Q-table of every agent (default: buckets_for the number of
+                      states that can be visited, episodes * steps plus the states the agents already know).
+                      States hashed into the same row share their Q-values.
+    :param generator_types: traffic generators of the workers (default: the one from the config)
+    :param seed: base seed of the traffic and of the exploration
+    :param checkpoint_every: rounds between checkpoints (0 - no checkpoints)
+    :param checkpoint_name: model name of the checkpoints
+    :return: trained agents (with dense Q-tables of the visited states) and the mean reward of an episode
+    """
+    if agents_group is None:
+        raise ValueError("No agents passed.")
+
+    agents = agents_group.agents
+    if len(agents) != len(cfg.elevators):
+        raise ValueError("Number of agents must equal number of elevators.")
+    unsupported = [TrafficGeneratorEnum(t).value for t in generator_types or [cfg.traffic.generator_type]
+                   if not TrafficGeneratorEnum(t).has_generator]
+    if unsupported:
+        raise ValueError(f"Traffic generators without an implementation: {', '.join(unsupported)}")
+
+    n_workers = n_workers or os.cpu_count()
+    if n_buckets is None:
+        n_buckets = buckets_for(episodes * steps + max(len(agent.q_table) for agent in agents))
+    tables = SharedQTables((len(agents), n_buckets, len(agents[0].actions)))
+
+    seen = set()
+    for i, agent in enumerate(agents):
+        for state, q_values in agent.q_table.items():
+            tables.values[i, tables.row(state)] = q_values
+            seen.add(state)
+
+    alpha = [agent.alpha for agent in agents]
+    gamma = [agent.gamma for agent in agents]
+    epsilon = np.array([agent.epsilon for agent in agents], dtype=np.float64)
+    epsilon_decay = np.array([agent.epsilon_decay for agent in agents], dtype=np.float64)
+    epsilon_min = np.array([agent.epsilon_min for agent in agents], dtype=np.float64)
+
+    rewards = []
+    try:
+        with ProcessPoolExecutor(n_workers, initializer=_attach, initargs=(tables.name, tables.shape)) as pool:
+            round_idx = 0
+            while len(rewards) < episodes:
+                batch = min(n_workers, episodes - len(rewards))
+                seeds = replication_seeds(batch, None if seed is None else seed + round_idx)
+                types = [generator_types[(len(rewards) + j) % len(generator_types)] if generator_types else None
+                         for j in range(batch)]
+
+                start = time.perf_counter()
+                futures = [pool.submit(_run_episode, worker_config(s, t), steps, epsilon.tolist(), alpha, gamma, s)
+                           for s, t in zip(seeds, types)]
+                results = [future.result() for future in futures]
+                elapsed = time.perf_counter() - start
+
+                calls = np.zeros(len(agents), dtype=np.int64)
+                for result in results:
+                    rewards.append(result["reward"])
+                    calls += result["calls"]
+                    seen |= result["states"]
+                epsilon = decay_epsilon(epsilon, epsilon_decay, epsilon_min, calls)
+                round_idx += 1
+
+                print(f"Episodes {len(rewards)}/{episodes} finished. "
+                      f"Mean reward: {np.mean([r['reward'] for r in results])}, "
+                      f"epsilon: {epsilon.round(4).tolist()}, steps/s: {batch * steps / elapsed:.0f}")
+
+                if checkpoint_every and round_idx % checkpoint_every == 0:
+                    path = collect_agents(agents, tables, seen, epsilon).save(f"{checkpoint_name}_checkpoint")
+                    print(f"Checkpoint saved as {path}")
+
+        group = collect_agents(agents, tables, seen, epsilon)
+    finally:
+        tables.close()
+
+    return group, float(np.mean(rewards))
+
+
+if __name__ == "__main__":
+    training_cfg = load_training_config()
+    params = training_cfg.q_learning_params
+
+    group = QLearningAgentsGroup([QLearningAgent.from_params(ACTIONS, params) for _ in cfg.elevators])
+    trained_group, reward = train_q_learning_parallel(
+        episodes=training_cfg.episodes,
+        steps=training_cfg.steps_per_episode,
+        agents_group=group,
+        checkpoint_every=10,
+        checkpoint_name=training_cfg.save_name
+    )
+    print(f"Mean reward: {reward}")
+    trained_group.save(training_cfg.save_name)
@@ -2,7 +2,7 @@ from simulation import config
 from simulation.core.elevator import Elevator
 from simulation.core.elevator import ElevatorSystem
 from simulation.engine.step_operator import operator
-from simulation.training.agents.q_learning_agent import QLearningAgent, QLearningAgentsGroup
+from simulation.training.agents.q_learning_agent import QLearningAgentsGroup
 from simulation.training.scripts.utils import *
 
 from typing import Tuple
@@ -35,7 +35,9 @@ def train_q_learning(episodes=100,
         if len(agents) != len(system.elevators):
             raise ValueError("Number of agents must equal number of elevators.")
 
-        state = get_state(system)
+        state = encode_state(system)
+        step_reward = IncrementalReward()
+        step_reward.reset(system)
         reward_sum = 0
 
         for step in range(steps):
@@ -51,15 +53,10 @@ def train_q_learning(episodes=100,
                 for i in range(len(agents))
             ]
 
-            state_before = get_state(system)
             system = operator(actions, system, step=step)
-            state_after = get_state(system)
+            state_after = encode_state(system)
 
-            reward = reward_function(
-                decode_state(state_before, system),
-                decode_state(state_after, system),
-                actions
-            )
+            reward = step_reward(system)
 
             reward_sum += reward
 
@@ -70,74 +67,40 @@ def train_q_learning(episodes=100,
             state = state_after
 
         print(f"Episode {ep + 1}/{episodes} finished. Reward: {reward_sum}")
-        print(agents_group.agents[0].epsilon, agents_group.agents[1].epsilon, )
+        print([agent.epsilon for agent in agents])
         whole_reward += reward_sum
 
     return QLearningAgentsGroup(agents), whole_reward / episodes
 
 
 if __name__ == "__main__":
+    import argparse
+    from simulation.training.config import load_training_config
+    from simulation.training.scripts.training_session import TrainingSession
 
-    rewards = []
-    buffer_size = 25
-    agt1 = QLearningAgent(ACTIONS, gamma=0.96, alpha=0.5, buffer_size=buffer_size)
-    agt2 = QLearningAgent(ACTIONS, gamma=0.96, alpha=0.5, buffer_size=buffer_size)
-
-    group = QLearningAgentsGroup([agt1, agt2])
-
-    # group = QLearningAgentsGroup.load(
-    #     r"C:\Users\Mateusz\projects\elevator-project\database\models\q_learning\third_validation_scenario_2_5.pkl")
-    group.agents[0].epsilon_decay = 0.999998
-    group.agents[1].epsilon_decay = 0.999998
-    group.agents[0].epsilon = 0.6
-    group.agents[1].epsilon = 0.6
-    group.agents[0].gamma = 0.95
-    group.agents[1].gamma = 0.95
-    group.agents[0].alpha = 0.5
-    group.agents[1].alpha = 0.5
-    group.agents[0].epsilon_min = 0.35
-    group.agents[1].epsilon_min = 0.35
-
-    trained_group, reward = train_q_learning(
-        episodes=20,
-        steps=2500,
-        agents_group=group
-    )
-    rewards.append(reward)
-
-    n = 30
-
-    for i in range(n):
-        trained_group, reward = train_q_learning(
-            episodes=20,
-            steps=2500,
-            agents_group=trained_group
-        )
-        rewards.append(reward)
-        # if i % 500 == 0:
-        #     trained_group.save(f"checkpoints/with_buffer{i / 1000}")
-        #
-        #     trained_group.save("experiment_no_buffer")
-
-    trained_group.save("third_validation_scenario")
-
-    # if i % 1000 == 0:
-    #     trained_agent.save(f"checkpoints/with_buffer{i / 1000}")
-
-    # trained_agent[0].save("experiment_no_buffer")
-    # trained_agent.save_to_xlsx("q_matrix1.xlsx")
-
-    x = np.linspace(0, n + 1, n + 1)
-    y = np.array(rewards)
+    parser = argparse.ArgumentParser(description="Q-learning training driven by the training config.")
+    parser.add_argument("--fresh", action="store_true", help="discard checkpoints of an interrupted training")
+    args = parser.parse_args()
+
+    session = TrainingSession.from_config(load_training_config())
+    if args.fresh:
+        session.clear_checkpoints()
+
+    trained_group, reward = session.run()
+    print(f"Mean reward: {reward}")
+    print(f"Saved as {trained_group.save(session.name)}")
+    session.clear_checkpoints()
+
+    x = np.arange(1, session.episode + 1)
+    y = np.array(session.rewards)
 
     a, b = np.polyfit(x, y, 1)  # y = a*x + b
     y_pred = a * x + b
 
     plt.scatter(x, y, label="Epizody")
     plt.plot(x, y_pred, color="red", label=f"Trend (a={a:.3f})")
-    plt.xlabel("Iteracja treningu")
-    plt.ylabel("Suma nagród na epizod (1000 kroków)")
+    plt.xlabel("Epizod")
+    plt.ylabel(f"Suma nagród na epizod ({session.steps} kroków)")
     plt.title("Postęp uczenia")
-    plt.suptitle(f"buffer size = {buffer_size}")
     plt.legend()
     plt.show()
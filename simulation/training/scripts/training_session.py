@@ -0,0 +1,295 @@
+from simulation import config
+from simulation.engine import traffic_generator
+from simulation.training.agents.model_format import MODEL_EXTENSION, load_model, save_model
+from simulation.training.agents.q_learning_agent import QLearningAgent, QLearningAgentsGroup, MODELS_DATABASE
+from simulation.training.agents.replay_buffer import ReplayBuffer
+from simulation.training.schema import EarlyStoppingSchema, TrainingConfigSchema
+from simulation.training.scripts.train_q_learning import train_q_learning, ACTIONS
+
+from collections import deque
+from pathlib import Path
+from typing import Callable, List, Tuple
+import copy
+import json
+import os
+import random
+import re
+import shutil
+import time
+import traceback
+import numpy as np
+
+cfg = config.load_config()
+
+CHECKPOINTS_DIR = MODELS_DATABASE / "checkpoints"
+CHECKPOINT_PATTERN = re.compile(r"episode_(\d+)$")
+
+
+class TrainingSession:
+    """
+    Runs a training episode by episode and keeps what is needed to continue it after a crash.
+
+    Every checkpoint_every episodes a checkpoint directory episode_{n} is written into checkpoint_dir:
+        agents.qlm      - Q-tables and hyperparameters of the agents (model_format)
+        replay_{i}.npz  - replay buffer of agent i, if it has one
+        session.json    - episode counter, episode rewards, early stopping state, epsilon_min and pending
+                          update buffers of the agents, states of the python `random` and traffic generator RNGs
+    It is first written as episode_{n}.tmp and renamed when complete, so a crash while saving never leaves
+    a broken checkpoint. run() continues from the newest checkpoint, if there is one.
+
+    With early_stopping set, the training stops when the moving average of the last `window` episode rewards
+    has not risen by more than min_delta for `patience` episodes.
+    Q-values are stored as float32, so dict Q-tables (float64) continue from rounded values.
+    """
+
+    def __init__(self, name: str, agents_group: QLearningAgentsGroup, episodes: int, steps: int,
+                 checkpoint_every=10, keep_checkpoints=3, early_stopping: EarlyStoppingSchema | None = None,
+                 trainer: Callable[..., Tuple[QLearningAgentsGroup, float]] = train_q_learning,
+                 checkpoint_dir=None):
+        """
+        :param name: name of the session, also the default name of its checkpoint directory
+        :param agents_group: agents to train, replaced by the checkpointed ones on resume
+        :param episodes: number of episodes in total (including the ones before a resume)
+        :param steps: steps per episode
+        :param checkpoint_every: episodes between checkpoints (0 - no checkpoints)
+        :param keep_checkpoints: number of the newest checkpoints kept on disk
+        :param early_stopping: EarlyStoppingSchema or None (train all episodes)
+        :param trainer: function with the signature of train_q_learning, called for one episode at a time
+        :param checkpoint_dir: directory of the checkpoints (default: database/models/q_learning/checkpoints/name)
+        """
+        self.name = name
+        self.agents_group = agents_group
+        self.episodes = episodes
+        self.steps = steps
+        self.checkpoint_every = checkpoint_every
+        self.keep_checkpoints = keep_checkpoints
+        self.early_stopping = early_stopping
+        self.trainer = trainer
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir is not None else CHECKPOINTS_DIR / name
+
+        self.rewards: List[float] = []
+        self.best_average: float | None = None
+        self.stale_episodes = 0  # episodes since the moving average last improved
+        self.stopped_early = False
+
+    @classmethod
+    def from_config(cls, training_cfg: TrainingConfigSchema,
+                    agents_group: QLearningAgentsGroup | None = None) -> "TrainingSession":
+        """
+        Session of the training config. Without agents_group, new agents are built from its q_learning_params.
+        """
+        if agents_group is None:
+            agents_group = QLearningAgentsGroup([QLearningAgent.from_params(ACTIONS, training_cfg.q_learning_params)
+                                                 for _ in cfg.elevators])
+        session = training_cfg.session
+        return cls(training_cfg.save_name, agents_group,
+                   episodes=training_cfg.episodes,
+                   steps=training_cfg.steps_per_episode,
+                   checkpoint_every=session.checkpoint_every,
+                   keep_checkpoints=session.keep_checkpoints,
+                   early_stopping=session.early_stopping)
+
+    @property
+    def episode(self) -> int:
+        """Number of finished episodes."""
+        return len(self.rewards)
+
+    @property
+    def moving_average(self) -> float | None:
+        window = self.early_stopping.window if self.early_stopping is not None else len(self.rewards)
+        if not self.rewards:
+            return None
+        return float(np.mean(self.rewards[-window:]))
+
+    def run(self, resume=True,
+            on_episode: Callable[["TrainingSession", float], None] | None = None) -> Tuple[QLearningAgentsGroup, float]:
+        """
+        Trains the remaining episodes.
+        :param resume: continue from the newest checkpoint (if there is none, start from the beginning)
+        :param on_episode: called after every episode with the session and the duration of the episode in seconds
+        :return: trained agents and the mean reward of an episode (over the whole session)
+        """
+        if resume and self.latest_checkpoint() is not None:
+            self.restore()
+            print(f"Resumed {self.name} at episode {self.episode}/{self.episodes}")
+
+        while self.episode < self.episodes and not self.stopped_early:
+            start = time.perf_counter()
+            self.agents_group, reward = self.trainer(episodes=1, steps=self.steps, agents_group=self.agents_group)
+            elapsed = time.perf_counter() - start
+            self.rewards.append(float(reward))
+
+            if self._plateaued():
+                self.stopped_early = True
+                print(f"Early stopping at episode {self.episode}: moving average of the reward "
+                      f"({self.moving_average}) has not improved for {self.stale_episodes} episodes")
+
+            if self.checkpoint_every and (self.episode % self.checkpoint_every == 0 or self.stopped_early):
+                self.save_checkpoint()
+
+            if on_episode is not None:
+                on_episode(self, elapsed)
+
+        return self.agents_group, float(np.mean(self.rewards)) if self.rewards else 0.0
+
+    def _plateaued(self) -> bool:
+        stopping = self.early_stopping
+        if stopping is None or len(self.rewards) < stopping.window:
+            return False
+        average = self.moving_average
+        if self.best_average is None or average > self.best_average + stopping.min_delta:
+            self.best_average = average
+            self.stale_episodes = 0
+        else:
+            self.stale_episodes += 1
+        return self.stale_episodes >= stopping.patience
+
+    # ------------------ checkpoints ------------------
+
+    def checkpoints(self) -> List[Path]:
+        """
+        :return: complete checkpoints of the session, oldest first
+        """
+        if not self.checkpoint_dir.exists():
+            return []
+        found = [(int(match.group(1)), path) for path in self.checkpoint_dir.iterdir()
+                 if path.is_dir() and (match := CHECKPOINT_PATTERN.match(path.name))]
+        return [path for _, path in sorted(found)]
+
+    def latest_checkpoint(self) -> Path | None:
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    def save_checkpoint(self) -> Path:
+        agents = self.agents_group.agents
+        path = self.checkpoint_dir / f"episode_{self.episode:06d}"
+        tmp_path = path.with_name(path.name + ".tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        save_model(agents, tmp_path / ("agents" + MODEL_EXTENSION), max_floor=cfg.floors, n_elevators=len(agents))
+        for i, agent in enumerate(agents):
+            if agent.replay is not None:
+                _replay_snapshot(agent, agents).save(tmp_path / f"replay_{i}.npz")
+
+        state = {
+            "name": self.name,
+            "episode": self.episode,
+            "rewards": self.rewards,
+            "best_average": self.best_average,
+            "stale_episodes": self.stale_episodes,
+            "stopped_early": self.stopped_early,
+            "agents": [{
+                "epsilon_min": agent.epsilon_min,
+                "buffer_size": agent.buffer_size,
+                "buffer": list(agent.buffer),
+                "batch_size": agent.batch_size,
+            } for agent in agents],
+            "random_state": random.getstate(),
+            "traffic_rng_state": traffic_generator.RNG.getstate(),
+        }
+        with open(tmp_path / "session.json", "w") as f:
+            json.dump(state, f)
+
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        for old in self.checkpoints()[:-self.keep_checkpoints]:
+            shutil.rmtree(old)
+
+        print(f"Checkpoint saved as {path}")
+        return path
+
+    def restore(self, path=None):
+        """
+        Restores the agents, RNG states and progress of the session from a checkpoint (default: the newest one).
+        """
+        path = Path(path) if path is not None else self.latest_checkpoint()
+        if path is None:
+            raise FileNotFoundError(f"No checkpoints in {self.checkpoint_dir}")
+
+        with open(path / "session.json") as f:
+            state = json.load(f)
+
+        group = load_model(path / ("agents" + MODEL_EXTENSION), mmap=False)
+        if len(group.agents) != len(cfg.elevators):
+            raise ValueError(f"Checkpoint {path} has {len(group.agents)} agents, "
+                             f"the building has {len(cfg.elevators)} elevators.")
+        for i, (agent, params) in enumerate(zip(group.agents, state["agents"])):
+            agent.epsilon_min = params["epsilon_min"]
+            agent.buffer_size = params["buffer_size"]
+            agent.buffer = deque((tuple(t) for t in params["buffer"]), maxlen=params["buffer_size"])
+            agent.batch_size = params["batch_size"]
+            replay_path = path / f"replay_{i}.npz"
+            if replay_path.exists():
+                agent.replay = ReplayBuffer.load(replay_path)
+        self.agents_group = group
+
+        self.rewards = state["rewards"]
+        self.best_average = state["best_average"]
+        self.stale_episodes = state["stale_episodes"]
+        self.stopped_early = state["stopped_early"]
+        random.setstate(_rng_state(state["random_state"]))
+        traffic_generator.RNG.setstate(_rng_state(state["traffic_rng_state"]))
+
+    def clear_checkpoints(self):
+        """Removes all checkpoints of the session, the next run() starts from the beginning."""
+        if self.checkpoint_dir.exists():
+            shutil.rmtree(self.checkpoint_dir)
+
+
+def run_training_job(training_cfg: dict, resume: bool, messages):
+    """
+    Target of the training process started by the GUI. Runs the session of the training config, saves the model
+    and reports through the `messages` queue:
+        ("progress", {episode, episodes, reward, moving_average, epsilon, steps_per_second}) after every episode
+        ("finished", {save_path, episodes, mean_reward, stopped_early}) or ("failed", traceback) at the end
+    """
+    try:
+        training_cfg = TrainingConfigSchema(**training_cfg)
+        session = TrainingSession.from_config(training_cfg)
+
+        def report(session: TrainingSession, elapsed: float):
+            messages.put(("progress", {
+                "episode": session.episode,
+                "episodes": session.episodes,
+                "reward": session.rewards[-1],
+                "moving_average": session.moving_average,
+                "epsilon": [agent.epsilon for agent in session.agents_group.agents],
+                "steps_per_second": session.steps / elapsed if elapsed > 0 else 0.0,
+            }))
+
+        agents_group, mean_reward = session.run(resume=resume, on_episode=report)
+        save_path = agents_group.save(session.name)
+        session.clear_checkpoints()
+        messages.put(("finished", {
+            "save_path": str(save_path),
+            "episodes": session.episode,
+            "mean_reward": mean_reward,
+            "stopped_early": session.stopped_early,
+        }))
+    except Exception:
+        messages.put(("failed", traceback.format_exc()))
+
+
+def _rng_state(state) -> tuple:
+    """random.Random state read back from JSON (lists instead of tuples)."""
+    version, internal_state, gauss_next = state
+    return version, tuple(internal_state), gauss_next
+
+
+def _replay_snapshot(agent: QLearningAgent, agents: List[QLearningAgent]) -> ReplayBuffer:
+    """
+    Copy of the replay buffer of the agent with row ids of its dense Q-table translated to the rows
+    the table gets when the checkpoint is loaded: load_model interns the states of all agents in sorted order.
+    """
+    states = sorted(set().union(*(agent.q_table.keys() for agent in agents)))
+    rows = {state: row for row, state in enumerate(states)}
+    new_rows = np.array([rows[state] for state in agent.q_table.keys()], dtype=np.int64)
+
+    replay = agent.replay
+    snapshot = copy.copy(replay)
+    snapshot.states = new_rows[replay.states[:replay.size]]
+    snapshot.next_states = new_rows[replay.next_states[:replay.size]]
+    return snapshot
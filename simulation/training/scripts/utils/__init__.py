@@ -1,8 +1,16 @@
-from .utils import get_state, decode_state, reward_function
+from .utils import (get_state, decode_state, reward_function, encode_state, decode_state_key, pack_state_tuple,
+                    IncrementalReward, encode_batched_states, BatchedIncrementalReward, decay_epsilon)
 from .schema import *
 
 _all__ = [
     "get_state",
     "decode_state",
-    "reward_function"
+    "reward_function",
+    "encode_state",
+    "decode_state_key",
+    "pack_state_tuple",
+    "IncrementalReward",
+    "encode_batched_states",
+    "BatchedIncrementalReward",
+    "decay_epsilon"
 ]
\ No newline at end of file
@@ -1,7 +1,11 @@
+from typing import List
+
 import numpy as np
 
+from simulation.core.batched_system import BatchedElevatorSystems
 from simulation.core.elevator_system import ElevatorSystem
 from .schema import ElevatorSystemState, ElevatorState
+from simulation.training.schema import RewardMultipliersSchema
 
 from simulation.training.config import load_training_config
 
@@ -25,11 +29,7 @@ def get_state(system: ElevatorSystem):
         floors[elevator.current_floor] = 1
         state.extend(floors.tolist())
 
-        chosen = np.zeros(system.max_floor + 1, dtype=int)
-        for f in elevator.chosen_floors:
-            if 0 <= f <= system.max_floor:
-                chosen[f] = 1
-        state.extend(chosen.tolist())
+        state.extend((elevator.chosen_mask >> f) & 1 for f in range(system.max_floor + 1))
 
         if elevator.state == "UP":
             direction = 1
@@ -39,20 +39,150 @@ def get_state(system: ElevatorSystem):
             direction = 0
         state.append(direction)
 
-    external_calls = np.zeros(system.max_floor + 1, dtype=int)
-    for f in system.requested_floors:
-        if 0 <= f <= system.max_floor:
-            external_calls[f] = 1
-    state.extend(external_calls.tolist())
+    state.extend((system.requested_mask >> f) & 1 for f in range(system.max_floor + 1))
 
     return tuple(state)
 
 
+DIRECTION_CODES = {"DOWN": 0, "STANDING": 1, "UP": 2}  # direction + 1
+
+
+def state_layout(max_floor: int):
+    """
+    Bit widths of the packed state of a building with floors 0..max_floor.
+    :return: (floor index width, elevator field width)
+    """
+    floor_bits = max(1, max_floor.bit_length())
+    return floor_bits, floor_bits + max_floor + 1 + 2
+
+
+def encode_state(system: ElevatorSystem) -> int:
+    """
+    Ten sam stan co get_state(), spakowany bitowo do jednej liczby całkowitej.
+    Dla każdej windy (od najmłodszych bitów):
+        [numer piętra windy] (floor_bits bitów)
+        [wybrane piętra w środku windy] (max_floor + 1 bitów)
+        [kierunek windy + 1] (2 bity)
+    po wszystkich windach:
+        [przyciski wezwań z zewnątrz] (max_floor + 1 bitów)
+    """
+    floor_bits, elevator_bits = state_layout(system.max_floor)
+    direction_shift = floor_bits + system.max_floor + 1
+
+    key = 0
+    shift = 0
+    for elevator in system.elevators:
+        code = DIRECTION_CODES.get(elevator.state, 1)
+        key |= (elevator.current_floor | elevator.chosen_mask << floor_bits | code << direction_shift) << shift
+        shift += elevator_bits
+    return key | system.requested_mask << shift
+
+
+def encode_batched_states(systems: BatchedElevatorSystems) -> List[int]:
+    """
+    encode_state() of every building of the batch: the same keys, computed for all buildings at once.
+    """
+    max_floor = systems.max_floor
+    floor_bits, elevator_bits = state_layout(max_floor)
+    direction_shift = floor_bits + max_floor + 1
+    requested_shift = systems.n_cars * elevator_bits
+
+    if requested_shift + max_floor + 1 < 64:
+        # the whole key fits in int64, its fields don't overlap
+        fields = (systems.current_floor | systems.chosen_mask << floor_bits
+                  | (systems.direction + 1) << direction_shift) << np.arange(0, requested_shift, elevator_bits)
+        return (fields.sum(axis=1) | systems.requested_mask << requested_shift).tolist()
+
+    keys = []
+    for floors, chosen_masks, directions, requested_mask in zip(systems.current_floor.tolist(),
+                                                                systems.chosen_mask.tolist(),
+                                                                systems.direction.tolist(),
+                                                                systems.requested_mask.tolist()):
+        key = requested_mask << requested_shift
+        for i, (floor, chosen_mask, direction) in enumerate(zip(floors, chosen_masks, directions)):
+            key |= (floor | chosen_mask << floor_bits | (direction + 1) << direction_shift) << (i * elevator_bits)
+        keys.append(key)
+    return keys
+
+
+def decode_state_key(key: int, max_floor: int, n_elevators: int) -> tuple:
+    """
+    Odwrotność encode_state(): zwraca krotkę w formacie get_state().
+    """
+    floor_bits, elevator_bits = state_layout(max_floor)
+    n_floors = max_floor + 1
+    floor_mask = (1 << floor_bits) - 1
+    chosen_mask = (1 << n_floors) - 1
+
+    state = []
+    for i in range(n_elevators):
+        field = key >> (i * elevator_bits)
+        position = [0] * n_floors
+        position[field & floor_mask] = 1
+        state.extend(position)
+        chosen = (field >> floor_bits) & chosen_mask
+        state.extend((chosen >> f) & 1 for f in range(n_floors))
+        state.append(((field >> (floor_bits + n_floors)) & 3) - 1)
+
+    requested = key >> (n_elevators * elevator_bits)
+    state.extend((requested >> f) & 1 for f in range(n_floors))
+    return tuple(state)
+
+
+def pack_state_tuple(state: tuple, n_elevators: int) -> int:
+    """
+    Converts a get_state() tuple (the keys of older models) to the encode_state() key.
+    The number of floors follows from the tuple length: n_elevators * (2F + 1) + F.
+    """
+    n_floors = (len(state) - n_elevators) // (2 * n_elevators + 1)
+    max_floor = n_floors - 1
+    floor_bits, elevator_bits = state_layout(max_floor)
+
+    key = 0
+    idx = 0
+    for i in range(n_elevators):
+        floor = state.index(1, idx, idx + n_floors) - idx
+        chosen = sum(bit << f for f, bit in enumerate(state[idx + n_floors: idx + 2 * n_floors]))
+        code = state[idx + 2 * n_floors] + 1
+        key |= (floor | chosen << floor_bits | code << (floor_bits + n_floors)) << (i * elevator_bits)
+        idx += 2 * n_floors + 1
+
+    requested = sum(bit << f for f, bit in enumerate(state[idx: idx + n_floors]))
+    return key | requested << (n_elevators * elevator_bits)
+
+
+def _decode_packed(key: int, system: ElevatorSystem) -> ElevatorSystemState:
+    max_floor = system.max_floor
+    n_floors = max_floor + 1
+    floor_bits, elevator_bits = state_layout(max_floor)
+    floor_mask = (1 << floor_bits) - 1
+    chosen_mask = (1 << n_floors) - 1
+
+    elevators = []
+    for i in range(len(system.elevators)):
+        field = key >> (i * elevator_bits)
+        chosen = (field >> floor_bits) & chosen_mask
+        elevators.append(ElevatorState(
+            current_floor=field & floor_mask,
+            chosen_floors=[f for f in range(n_floors) if (chosen >> f) & 1],
+            direction=((field >> (floor_bits + n_floors)) & 3) - 1
+        ))
+
+    requested = key >> (len(system.elevators) * elevator_bits)
+    return ElevatorSystemState(
+        elevators=elevators,
+        external_calls=[f for f in range(n_floors) if (requested >> f) & 1]
+    )
+
+
 def decode_state(state, system: ElevatorSystem) -> ElevatorSystemState:
     """
-    Odszyfrowuje stan zwrócony przez get_state().
+    Odszyfrowuje stan zwrócony przez get_state() lub encode_state().
     Zwraca obiekt ElevatorSystemState.
     """
+    if isinstance(state, int):
+        return _decode_packed(state, system)
+
     max_floor = system.max_floor
     n_floors = max_floor + 1
     n_elevators = len(system.elevators)
@@ -121,3 +251,84 @@ def reward_function(prev_state: ElevatorSystemState,
     reward -= n_inside * reward_params.penalty_inside
 
     return reward
+
+
+class IncrementalReward:
+    """
+    reward_function() computed straight from the bitmasks kept by the building
+    (Elevator.chosen_mask, ElevatorSystem.requested_mask), without encoding and decoding the states.
+
+    Usage:
+        reward = IncrementalReward()
+        reward.reset(system)
+        for step in ...:
+            system = operator(actions, system, step)
+            r = reward(system)  # reward of the transition since the previous call
+    """
+
+    def __init__(self, reward_params: RewardMultipliersSchema = None):
+        self.reward_params = reward_params if reward_params is not None else TRAINING_CONFIG.reward_params
+        self.chosen_masks = []
+        self.requested_mask = 0
+
+    def reset(self, system: ElevatorSystem):
+        self.chosen_masks = [elevator.chosen_mask for elevator in system.elevators]
+        self.requested_mask = system.requested_mask
+
+    def __call__(self, system: ElevatorSystem) -> float:
+        reward_params = self.reward_params
+        reward = 0.0
+
+        # the same terms, in the same order, as reward_function()
+        requested_mask = system.requested_mask
+        reward += (self.requested_mask & ~requested_mask).bit_count() * 10 * reward_params.reward_pick_up
+
+        chosen_masks = [elevator.chosen_mask for elevator in system.elevators]
+        for prev_mask, next_mask in zip(self.chosen_masks, chosen_masks):
+            reward += (prev_mask & ~next_mask).bit_count() * 10 * reward_params.reward_delivery
+
+        reward -= requested_mask.bit_count() * reward_params.penalty_outside
+        reward -= sum(mask.bit_count() for mask in chosen_masks) * reward_params.penalty_inside
+
+        self.chosen_masks = chosen_masks
+        self.requested_mask = requested_mask
+        return reward
+
+
+class BatchedIncrementalReward:
+    """
+    IncrementalReward of every building of a batch (BatchedElevatorSystems), as one array.
+    """
+
+    def __init__(self, reward_params: RewardMultipliersSchema = None):
+        self.reward_params = reward_params if reward_params is not None else TRAINING_CONFIG.reward_params
+        self.chosen_mask = None
+        self.requested_mask = None
+
+    def reset(self, systems: BatchedElevatorSystems):
+        self.chosen_mask = systems.chosen_mask.copy()
+        self.requested_mask = systems.requested_mask.copy()
+
+    def __call__(self, systems: BatchedElevatorSystems) -> np.ndarray:
+        reward_params = self.reward_params
+        chosen_mask, requested_mask = systems.chosen_mask.copy(), systems.requested_mask.copy()
+
+        # the same terms as IncrementalReward
+        picked_up = np.bitwise_count(self.requested_mask & ~requested_mask)
+        delivered = np.bitwise_count(self.chosen_mask & ~chosen_mask).sum(axis=1)
+        reward = (picked_up * 10 * reward_params.reward_pick_up
+                  + delivered * 10 * reward_params.reward_delivery
+                  - np.bitwise_count(requested_mask) * reward_params.penalty_outside
+                  - np.bitwise_count(chosen_mask).sum(axis=1) * reward_params.penalty_inside)
+
+        self.chosen_mask = chosen_mask
+        self.requested_mask = requested_mask
+        return reward.astype(np.float64)
+
+
+def decay_epsilon(epsilon: np.ndarray, decay: np.ndarray, epsilon_min: np.ndarray, calls: np.ndarray):
+    """
+    QLearningAgent.decay_epsilon applied `calls` times to every agent at once.
+    """
+    decayed = np.maximum(epsilon_min, epsilon * decay ** calls)
+    return np.where((calls > 0) & (epsilon >= epsilon_min), decayed, epsilon)
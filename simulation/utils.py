@@ -3,7 +3,7 @@ from typing import Tuple
 
 def extract_params_suffix(filename: str) -> Tuple[int, int]:
     """
-    :param filename: whole filename (with .pkl extension).
+    :param filename: whole filename (with .pkl or .qlm extension).
     :return: number of elevators, number of floors
     """
     n_floors_str = ""
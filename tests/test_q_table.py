@@ -0,0 +1,54 @@
+import numpy as np
+
+from simulation.enums import QTableEnum
+from simulation.training.agents.q_learning_agent import QLearningAgent
+from simulation.training.agents.q_table import DenseQTable, HashedQTable, hashed_row
+
+
+def colliding_state(state, n_buckets):
+    other = state + 1
+    while hashed_row(other, n_buckets) != hashed_row(state, n_buckets):
+        other += 1
+    return other
+
+
+def test_hashed_read_keeps_owner_of_bucket():
+    table = HashedQTable(3, n_buckets=8)
+    table[1] = [1, 2, 3]
+    other = colliding_state(1, 8)
+
+    np.testing.assert_array_equal(table[other], [1, 2, 3])
+    table[9]  # unseen state in another bucket
+
+    assert 1 in table
+    assert other not in table
+    assert len(table) == 1
+    assert list(table.to_dict()) == [1]
+    np.testing.assert_array_equal(table.to_dict()[1], [1, 2, 3])
+
+
+def test_hashed_write_records_owner():
+    table = HashedQTable(3, n_buckets=8)
+    table.write(5, 2, 1.5)
+
+    assert 5 in table
+    np.testing.assert_array_equal(table[5], [0, 0, 1.5])
+
+
+def test_dense_overflow_reads_do_not_relabel():
+    table = DenseQTable(3, max_states=1, overflow_buckets=8)
+    table.write(0, 0, 1.0)
+    table.write(1, 1, 2.0)  # past max_states, lands in the overflow table
+    other = colliding_state(1, 8)
+    table[other]
+
+    assert list(table.overflow.keys()) == [1]
+
+
+def test_agent_update_writes_hashed_owner():
+    agent = QLearningAgent(actions=["UP", "DOWN", "STANDING"], q_table_type=QTableEnum.HASHED)
+    agent.update(state=4, action=1, reward=1.0, next_state=7)
+
+    assert 4 in agent.q_table
+    assert 7 not in agent.q_table
+    assert agent.q_table[4][1] > 0